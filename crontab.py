@@ -5,16 +5,27 @@
 import configparser
 import os
 import sys
+from datetime import datetime
 
 # 添加项目根目录到Python路径
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
-from qka.data import download_stock_history_data, get_stock_list_in_main_board
+from qka.data import get_stock_list_in_main_board, sync_stock_history_data
+from qka.tradecalendar import get_calendar
+
+# 每次检查的最近交易日数量
+LOOKBACK_DAYS = 20
 
 if __name__ == "__main__":
     print("定时任务:每日15:30下载历史数据")
+    calendar = get_calendar()
+    if not calendar.is_trading_day(datetime.now()):
+        print(f"今天不是交易日，下一个交易日为 {calendar.next_trading_day(datetime.now())}")
+        sys.exit(0)
     stock_list = get_stock_list_in_main_board()
-    current_date = datetime.now().strftime("%Y%m%d")
-    download_stock_history_data(stock_list, start_time=current_date, end_time=current_date, period="1d")
-    download_stock_history_data(stock_list, start_time=current_date, end_time=current_date, period="1m")
\ No newline at end of file
+    # 检查最近的交易日，补齐此前漏下载的日期，已下载的区间不再重复下载
+    start_date = str(calendar.shift(datetime.now(), -LOOKBACK_DAYS))
+    for period in ["1d", "1m"]:
+        result = sync_stock_history_data(stock_list, start_time=start_date, period=period)
+        print(f"{period}: 下载批次 {result['batches']}，全部成功: {result['ok']}")
\ No newline at end of file
@@ -1,52 +1,145 @@
 """
 初始化数据库，将1分钟数据 CSV 文件导入数据库
+
+多个工作进程并行读取和清洗CSV文件，清洗后的数据块以Arrow表的形式经有界队列交给主进程，
+由主进程单独写入DuckDB。队列已满时工作进程等待写入，内存占用不超过队列容量。
 """
 
 import configparser
+import multiprocessing as mp
 import os
-import gc
+import queue
+import time
 import pandas as pd
+import pyarrow as pa
 from utils.clean import clean_data, get_all_csv_files
 from utils.duckdb import DuckDBHelper
 from tqdm import tqdm
 
-# 读取配置文件
-config = configparser.ConfigParser()
-with open('config.ini', 'r', encoding='utf-8') as f:
-    config.read_file(f)
-
-# 读取源路径
-source_path = config.get('SOURCE', 'path')
-
-# 读取目标地址
-target_path = config.get('TARGET', 'path')
-
 # 分块读取大小（可根据内存情况调整，单位：行数）
 CHUNK_SIZE = 50000  # 每次读取5万行
 
-# 获取所有CSV文件
-source_files = get_all_csv_files(source_path)
+# 等待写入的数据块上限，内存中最多约有 QUEUE_SIZE * CHUNK_SIZE 行待写入的数据
+QUEUE_SIZE = 8
+
+# 工作进程数，保留一个核给写入进程
+WORKERS = max(1, (os.cpu_count() or 2) - 1)
 
-# 初始化DuckDBHelper
-duckdb_helper = DuckDBHelper(target_path)
 
-# 遍历源文件，插入指定库表中（1min数据），添加进度条
-for file_path in tqdm(source_files, desc="导入CSV文件进度"):
-    # 使用分块读取大文件，避免一次性加载到内存
+def read_file(file_path: str, results) -> None:
+    """
+    分块读取并清洗单个CSV文件，依次放入结果队列
+    队列已满时阻塞，等待写入进程消费
+    """
     try:
         for chunk in pd.read_csv(file_path, chunksize=CHUNK_SIZE):
-            # 清洗数据块
-            chunk = clean_data(chunk)
-            # 插入数据块到DuckDB
-            duckdb_helper.insert_df_to_duckdb(chunk, config.get('TARGET', 'min_table'))
-            # 显式删除chunk以释放内存
-            del chunk
-            # 强制垃圾回收
-            gc.collect()
+            table = pa.Table.from_pandas(clean_data(chunk), preserve_index=False)
+            results.put(('batch', file_path, table))
+        results.put(('file', file_path, None))
     except Exception as e:
-        print(f"处理文件 {file_path} 时出错: {e}")
-        continue
+        results.put(('error', file_path, str(e)))
+
+
+def worker(tasks, results) -> None:
+    """工作进程：从任务队列取文件路径，直到收到None"""
+    while True:
+        file_path = tasks.get()
+        if file_path is None:
+            results.put(('done', None, None))
+            return
+        read_file(file_path, results)
+
+
+def import_files(source_files: list, target_path: str, table_name: str,
+                 workers: int = WORKERS, queue_size: int = QUEUE_SIZE) -> int:
+    """
+    并行导入CSV文件
+    Args:
+        source_files: CSV文件路径列表
+        target_path: DuckDB数据库路径
+        table_name: 目标表名
+        workers: 工作进程数
+        queue_size: 等待写入的数据块上限
+    Returns:
+        int: 导入的行数
+    """
+    workers = max(1, min(workers, len(source_files)))
+    tasks = mp.Queue()
+    for file_path in source_files:
+        tasks.put(file_path)
+    for _ in range(workers):
+        tasks.put(None)
+    results = mp.Queue(maxsize=queue_size)
+
+    processes = [mp.Process(target=worker, args=(tasks, results), daemon=True) for _ in range(workers)]
+    for process in processes:
+        process.start()
+
+    duckdb_helper = DuckDBHelper(target_path)
+    rows = 0
+    failed = set()  # 出错的文件，其余数据块不再写入
+    finished = 0
+    start = time.perf_counter()
+    progress = tqdm(total=len(source_files), desc="导入CSV文件进度")
+    try:
+        while finished < workers:
+            try:
+                kind, file_path, payload = results.get(timeout=1.0)
+            except queue.Empty:
+                # 工作进程异常退出时不再等待
+                if not any(process.is_alive() for process in processes):
+                    print("工作进程已全部退出，部分文件可能未导入")
+                    break
+                continue
+
+            if kind == 'batch':
+                if file_path in failed:
+                    continue
+                # 只有主进程写入DuckDB，单个文件写入出错时跳过该文件，继续导入其他文件
+                try:
+                    duckdb_helper.insert_arrow_to_duckdb(payload, table_name)
+                except Exception as e:
+                    print(f"处理文件 {file_path} 时出错: {e}")
+                    failed.add(file_path)
+                    continue
+                rows += payload.num_rows
+                progress.set_postfix(rows=f"{rows:,}", rows_per_sec=f"{rows / (time.perf_counter() - start):,.0f}")
+            elif kind == 'file':
+                progress.update(1)
+            elif kind == 'error':
+                if file_path not in failed:
+                    print(f"处理文件 {file_path} 时出错: {payload}")
+                    failed.add(file_path)
+                progress.update(1)
+            else:
+                finished += 1
+    finally:
+        progress.close()
+        for process in processes:
+            process.join(timeout=5)
+        # 关闭DuckDB连接
+        duckdb_helper.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"导入完成: {rows} 行，耗时 {elapsed:.1f} 秒，{rows / max(elapsed, 1e-9):,.0f} 行/秒，"
+          f"失败文件 {len(failed)} 个")
+    return rows
+
+
+if __name__ == "__main__":
+    # 读取配置文件
+    config = configparser.ConfigParser()
+    with open('config.ini', 'r', encoding='utf-8') as f:
+        config.read_file(f)
+
+    # 读取源路径
+    source_path = config.get('SOURCE', 'path')
+
+    # 读取目标地址
+    target_path = config.get('TARGET', 'path')
+
+    # 获取所有CSV文件
+    source_files = get_all_csv_files(source_path)
 
-# 关闭DuckDB连接
-duckdb_helper.close()
-        
+    # 遍历源文件，插入指定库表中（1min数据）
+    import_files(source_files, target_path, config.get('TARGET', 'min_table'))
@@ -0,0 +1,150 @@
+"""
+准入控制模块
+按优先级通道限制并发数和排队时间，过载时尽早拒绝请求，避免排队时间无限增长
+"""
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+
+
+class AdmissionRejected(Exception):
+    """通道排队已满或排队超时时抛出的异常"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Lane:
+    """单个优先级通道
+
+    最多同时执行 max_concurrency 个请求，另有最多 max_queue 个请求按到达顺序排队，
+    排队超过 queue_timeout 秒的请求被拒绝。只在事件循环线程中使用。
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        """初始化通道
+        Args:
+            name: 通道名称
+            max_concurrency: 最大并发数
+            max_queue: 最大排队数
+            queue_timeout: 最长排队时间(秒)
+        """
+        if max_concurrency < 1:
+            raise ValueError("最大并发数必须大于0")
+        if max_queue < 0:
+            raise ValueError("最大排队数不能小于0")
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiters: deque = deque()
+        self.admitted = 0
+        self.rejected = 0
+
+    @property
+    def saturated(self) -> bool:
+        """并发和排队都已占满，新的请求会被直接拒绝"""
+        return self.active >= self.max_concurrency and len(self.waiters) >= self.max_queue
+
+    def _reject(self, reason: str):
+        self.rejected += 1
+        raise AdmissionRejected(f"{self.name} 通道{reason}，请稍后重试", retry_after=max(self.queue_timeout, 1.0))
+
+    def check(self):
+        """通道已满时直接拒绝，不占用名额"""
+        if self.saturated:
+            self._reject("排队已满")
+
+    async def acquire(self):
+        """获取执行名额，必要时排队等待
+        Raises:
+            AdmissionRejected: 排队已满或排队超时
+        """
+        if self.active < self.max_concurrency and not self.waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self.waiters) >= self.max_queue:
+            self._reject("排队已满")
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done():
+                # 超时的同时已被分配名额，把名额交给下一个请求
+                self.release()
+            else:
+                waiter.cancel()
+                self.waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject("排队超时")
+            raise
+        self.admitted += 1
+
+    def release(self):
+        """释放执行名额，有排队的请求时直接转交给最早排队的请求"""
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionController:
+    """按优先级通道进行准入控制
+
+    请求所属的通道按以下顺序确定：token绑定的通道、请求头指定的通道、接口默认的通道、默认通道。
+    绑定了通道的token不能通过请求头切换到其他通道。
+    """
+
+    def __init__(self, lanes: Dict[str, Tuple[int, int, float]], default_lane: str,
+                 function_lanes: Optional[Dict[str, str]] = None, token_lanes: Optional[Dict[str, str]] = None):
+        """初始化准入控制
+        Args:
+            lanes: {通道名: (最大并发数, 最大排队数, 最长排队时间)}
+            default_lane: 默认通道
+            function_lanes: {接口名: 通道名}，接口的默认通道
+            token_lanes: {token: 通道名}，token绑定的通道
+        """
+        self.lanes = {name: Lane(name, *config) for name, config in lanes.items()}
+        self.default_lane = default_lane
+        self.function_lanes = dict(function_lanes or {})
+        self.token_lanes = dict(token_lanes or {})
+        for lane in [default_lane, *self.function_lanes.values(), *self.token_lanes.values()]:
+            if lane not in self.lanes:
+                raise ValueError(f"未定义的通道: {lane}")
+
+    def select(self, func_name: str, token: Optional[str] = None, requested: Optional[str] = None) -> Lane:
+        """
+        确定请求所属的通道
+        Args:
+            func_name: 接口名称
+            token: 请求的token
+            requested: 请求头指定的通道
+        Returns:
+            Lane: 通道
+        Raises:
+            KeyError: 请求头指定的通道不存在
+        """
+        if token in self.token_lanes:
+            return self.lanes[self.token_lanes[token]]
+        if requested:
+            if requested not in self.lanes:
+                raise KeyError(f"通道不存在: {requested}")
+            return self.lanes[requested]
+        return self.lanes[self.function_lanes.get(func_name, self.default_lane)]
+
+    @asynccontextmanager
+    async def admit(self, lane: Lane):
+        """在通道中占用一个执行名额"""
+        await lane.acquire()
+        try:
+            yield lane
+        finally:
+            lane.release()
@@ -0,0 +1,157 @@
+"""
+多服务器负载均衡模块
+按观测到的延迟在多个服务器之间分配请求，计算对冲请求的等待时间，并用熔断器暂时剔除不可用的服务器
+"""
+
+import math
+import random
+import threading
+import time
+from collections import deque
+from typing import Iterable, List, Optional
+
+# 熔断器状态
+CLOSED = 'closed'
+OPEN = 'open'
+
+# 连续失败多少次后熔断
+FAILURE_THRESHOLD = 3
+# 熔断后多久(秒)允许一个探测请求
+COOLDOWN = 10.0
+# 每个服务器保留的最近延迟样本数，用于计算p95
+LATENCY_WINDOW = 64
+# 延迟样本不足时的对冲等待时间(秒)
+DEFAULT_HEDGE_DELAY = 1.0
+# 对冲等待时间的下限(秒)，避免对很快的请求也发出对冲
+MIN_HEDGE_DELAY = 0.05
+# 计算p95至少需要的样本数
+MIN_SAMPLES = 10
+# 延迟指数移动平均中新样本的权重
+SMOOTHING = 0.2
+
+
+class ServerState:
+    """单个服务器的延迟统计和熔断状态"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.latency: Optional[float] = None
+        self.samples = deque(maxlen=LATENCY_WINDOW)
+        self.inflight = 0
+        self.failures = 0
+        self.state = CLOSED
+        self.open_until = 0.0
+
+    def score(self) -> float:
+        """负载评分，越小越优先：平均延迟乘以正在处理的请求数"""
+        return (self.latency or 0.0) * (1 + self.inflight)
+
+
+class LoadBalancer:
+    """多服务器负载均衡和熔断
+
+    选择服务器时优先使用平均延迟低、正在处理请求少的服务器。
+    连续失败达到阈值的服务器被熔断，每个冷却期只放行一个探测请求，探测成功后恢复。
+    所有服务器都被熔断时仍选择最早恢复的服务器，而不是直接失败。
+    可以在多个线程中同时使用。
+    """
+
+    def __init__(self, urls: List[str], failure_threshold: int = FAILURE_THRESHOLD,
+                 cooldown: float = COOLDOWN):
+        """初始化负载均衡
+        Args:
+            urls: 服务器地址列表
+            failure_threshold: 连续失败多少次后熔断
+            cooldown: 熔断的冷却时间(秒)
+        """
+        if not urls:
+            raise ValueError("服务器列表为空")
+        self.servers = {url: ServerState(url) for url in urls}
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+
+    @property
+    def urls(self) -> List[str]:
+        return list(self.servers)
+
+    @staticmethod
+    def _available(server: ServerState, now: float) -> bool:
+        """服务器当前是否可以接收请求，熔断的服务器在冷却期结束后可以接收一个探测请求"""
+        return server.state == CLOSED or now >= server.open_until
+
+    def pick(self, exclude: Iterable[str] = ()) -> str:
+        """
+        选择一个服务器
+        Args:
+            exclude: 不希望使用的服务器(如刚失败的服务器)，没有其他服务器时仍可能被选择
+        Returns:
+            str: 服务器地址
+        """
+        exclude = set(exclude)
+        now = time.monotonic()
+        with self._lock:
+            candidates = [server for server in self.servers.values()
+                          if server.url not in exclude and self._available(server, now)]
+            if not candidates:
+                candidates = [server for server in self.servers.values() if self._available(server, now)]
+            if not candidates:
+                # 全部熔断时选择最早恢复的服务器
+                chosen = min(self.servers.values(), key=lambda server: server.open_until)
+            else:
+                chosen = min(candidates, key=lambda server: (server.score(), random.random()))
+            if chosen.state == OPEN:
+                # 探测请求发出后重新开始冷却，探测结果未知前不再放行其他请求
+                chosen.open_until = now + self.cooldown
+            return chosen.url
+
+    def start(self, url: str):
+        """请求开始"""
+        with self._lock:
+            self.servers[url].inflight += 1
+
+    def success(self, url: str, seconds: float):
+        """请求成功，记录延迟并关闭熔断"""
+        with self._lock:
+            server = self.servers[url]
+            server.inflight -= 1
+            server.latency = seconds if server.latency is None else server.latency + SMOOTHING * (seconds - server.latency)
+            server.samples.append(seconds)
+            server.failures = 0
+            server.state = CLOSED
+
+    def failure(self, url: str):
+        """请求失败(连接失败、超时或服务器错误)，连续失败达到阈值时熔断"""
+        with self._lock:
+            server = self.servers[url]
+            server.inflight -= 1
+            server.failures += 1
+            if server.failures >= self.failure_threshold:
+                server.state = OPEN
+                server.open_until = time.monotonic() + self.cooldown
+
+    def cancelled(self, url: str):
+        """请求被放弃(如对冲请求中较慢的一个)，不计入成功或失败"""
+        with self._lock:
+            self.servers[url].inflight -= 1
+
+    def hedge_delay(self, url: str) -> float:
+        """
+        发出对冲请求前的等待时间：该服务器最近延迟的p95
+        Args:
+            url: 首个请求使用的服务器
+        Returns:
+            float: 等待时间(秒)
+        """
+        with self._lock:
+            samples = sorted(self.servers[url].samples)
+        if len(samples) < MIN_SAMPLES:
+            return DEFAULT_HEDGE_DELAY
+        # 最近秩法：不小于95%样本的最小样本
+        return max(MIN_HEDGE_DELAY, samples[min(len(samples) - 1, math.ceil(0.95 * len(samples)) - 1)])
+
+    def stats(self) -> dict:
+        """各服务器的状态"""
+        with self._lock:
+            return {url: {'state': server.state, 'latency': server.latency, 'inflight': server.inflight,
+                          'failures': server.failures} for url, server in self.servers.items()}
@@ -0,0 +1,325 @@
+"""
+客户端行情缓存模块
+把已获取的历史K线保存在本地DuckDB中，并记录每只股票已缓存的时间区间，
+再次查询时只向服务器请求缺失的区间
+"""
+
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import duckdb
+import pandas as pd
+from qka.codes import add_stock_suffix_list
+from qka.store import parse_time
+from qka.tradecalendar import TradeCalendar, get_calendar, to_date_number
+
+# 可缓存的周期及其索引时间格式，与xtdata一致
+CACHE_INDEX_FORMATS = {
+    '1m': '%Y%m%d%H%M%S',
+    '5m': '%Y%m%d%H%M%S',
+    '15m': '%Y%m%d%H%M%S',
+    '30m': '%Y%m%d%H%M%S',
+    '1h': '%Y%m%d%H%M%S',
+    '1d': '%Y%m%d',
+}
+
+# 时间区间的最小间隔，相差不超过该值的区间视为相连
+_STEP = timedelta(seconds=1)
+
+
+def _merge_intervals(intervals: List[Tuple[datetime, datetime]]) -> List[Tuple[datetime, datetime]]:
+    """合并重叠或相连的时间区间"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + _STEP:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _find_gaps(intervals: List[Tuple[datetime, datetime]], start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+    """计算[start, end]中未被已缓存区间覆盖的部分"""
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in intervals:
+        if covered_end < cursor:
+            continue
+        if covered_start > end:
+            break
+        if covered_start > cursor:
+            gaps.append((cursor, min(covered_start - _STEP, end)))
+        cursor = max(cursor, covered_end + _STEP)
+        if cursor > end:
+            break
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+class CacheGap:
+    """一次需要向服务器请求的缺失区间"""
+
+    def __init__(self, codes: List[str], start: datetime, end: datetime, fmt: str, open_ended: bool):
+        self.codes = codes
+        self.start = start
+        self.end = end
+        self.start_time = start.strftime(fmt)
+        # 区间延续到最新时不指定结束时间
+        self.end_time = '' if open_ended else end.strftime(fmt)
+
+
+class CachePlan:
+    """一次查询的缓存计划：需要请求的缺失区间，以及从服务器获取的当日数据"""
+
+    def __init__(self, codes: List[str], period: str, start: datetime, end: datetime, stable_until: datetime):
+        self.codes = codes
+        self.period = period
+        self.start = start
+        self.end = end
+        self.stable_until = stable_until
+        self.gaps: List[CacheGap] = []
+        self.recent: Dict[str, List[pd.DataFrame]] = defaultdict(list)
+
+
+class BarCache:
+    """客户端K线缓存
+
+    K线按(股票代码, 周期)保存，同时记录每只股票已缓存的时间区间(包括没有K线的停牌日等)。
+    一次请求中服务器返回的最新K线所在的交易日之前视为服务器已有数据，请求的股票都记录为已缓存至该日，
+    其中没有K线的股票视为停牌；之后直到区间结束都没有交易日时，整个区间记录为已缓存。
+    服务器没有返回任何数据的区间(如服务器尚未下载)不记录，下次查询时重新请求。
+    当日及之后的数据仍在变化，不写入缓存，每次都从服务器获取。
+    """
+
+    def __init__(self, db_path: str, calendar: Optional[TradeCalendar] = None):
+        """初始化缓存
+        Args:
+            db_path: DuckDB数据库路径，不存在时自动创建
+            calendar: 交易日历，用于判断区间内是否没有交易日，默认为进程内共享的日历
+        """
+        parent_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(parent_dir, exist_ok=True)
+        self.db_path = db_path
+        self.calendar = calendar
+        self.conn = duckdb.connect(db_path)
+        self._lock = threading.Lock()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS bar_coverage "
+            "(code VARCHAR, period VARCHAR, start_time TIMESTAMP, end_time TIMESTAMP)"
+        )
+
+    @staticmethod
+    def supports(period: str) -> bool:
+        """该周期是否可以缓存"""
+        return period in CACHE_INDEX_FORMATS
+
+    @staticmethod
+    def _table(period: str) -> str:
+        return f'bars_{period}'
+
+    def _table_columns(self, period: str) -> List[str]:
+        """缓存表的列名，表不存在时返回空列表"""
+        rows = self.conn.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = ? ORDER BY ordinal_position",
+            [self._table(period)]
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def coverage(self, codes: List[str], period: str) -> Dict[str, List[Tuple[datetime, datetime]]]:
+        """查询各股票已缓存的时间区间"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT code, start_time, end_time FROM bar_coverage "
+                "WHERE period = ? AND code IN (SELECT UNNEST(?)) ORDER BY code, start_time",
+                [period, list(codes)]
+            ).fetchall()
+        result = defaultdict(list)
+        for code, start, end in rows:
+            result[code].append((start, end))
+        return result
+
+    def plan(self, stock_list: List[str], period: str, start_time: str, end_time: str = '',
+             now: Optional[datetime] = None) -> CachePlan:
+        """
+        计算一次查询需要向服务器请求的缺失区间
+        缺失区间相同的股票合并为一次请求
+        Args:
+            stock_list: 股票列表
+            period: 周期
+            start_time: 开始时间
+            end_time: 结束时间，为空表示截至最新
+            now: 当前时间，默认为本机时间
+        Returns:
+            CachePlan: 缓存计划
+        """
+        now = now or datetime.now()
+        codes = add_stock_suffix_list(list(stock_list))
+        start = parse_time(start_time)
+        open_ended = not end_time
+        end = parse_time(end_time, end=True) if end_time else now.replace(hour=23, minute=59, second=59, microsecond=0)
+        # 当日之前的数据不再变化，可以缓存
+        stable_until = now.replace(hour=0, minute=0, second=0, microsecond=0) - _STEP
+        plan = CachePlan(codes, period, start, end, stable_until)
+        fmt = CACHE_INDEX_FORMATS[period]
+
+        coverage = self.coverage(codes, period)
+        grouped = defaultdict(list)
+        for code in codes:
+            for gap in _find_gaps(coverage.get(code, []), start, end):
+                grouped[gap].append(code)
+        for (gap_start, gap_end), gap_codes in sorted(grouped.items()):
+            plan.gaps.append(CacheGap(gap_codes, gap_start, gap_end, fmt, open_ended and gap_end == end))
+        return plan
+
+    def _no_trading_days(self, start: datetime, end: datetime) -> bool:
+        """区间内是否确定没有交易日，交易日历不可用或未覆盖该区间时返回False"""
+        try:
+            calendar = self.calendar or get_calendar()
+            dates = calendar.dates
+        except RuntimeError:
+            return False
+        if len(dates) == 0 or dates[0] > to_date_number(start) or dates[-1] < to_date_number(end):
+            return False
+        return len(calendar.range(start, end)) == 0
+
+    def _covered_end(self, start: datetime, end: datetime, last_index: Optional[str], fmt: str) -> Optional[datetime]:
+        """
+        计算区间[start, end]中可以记录为已缓存的结束时间
+        Args:
+            start: 区间开始时间
+            end: 区间结束时间
+            last_index: 服务器返回的最新K线时间，没有返回数据时为None
+            fmt: K线时间格式
+        Returns:
+            datetime: 已缓存区间的结束时间，不能记录为已缓存时返回None
+        """
+        if last_index is None:
+            return end if self._no_trading_days(start, end) else None
+        # 已过去的交易日数据不再变化，返回了K线的交易日按全天记录
+        next_day = datetime.strptime(last_index, fmt).replace(hour=0, minute=0, second=0) + timedelta(days=1)
+        if next_day > end or self._no_trading_days(next_day, end):
+            return end
+        return next_day - _STEP
+
+    def fill(self, plan: CachePlan, gap: CacheGap, frames: Dict[str, pd.DataFrame]):
+        """
+        保存一个缺失区间的查询结果
+        返回的数据先裁剪到缺失区间内，已不再变化的部分写入缓存，当日的部分只保留在本次查询的结果中。
+        区间内的股票记录为已缓存至返回的最新K线所在日，该日之后没有交易日时记录至区间结束
+        Args:
+            plan: 缓存计划
+            gap: 缺失区间
+            frames: 服务器返回的{股票代码: DataFrame}
+        """
+        fmt = CACHE_INDEX_FORMATS[plan.period]
+        stable_index = plan.stable_until.strftime(fmt)
+        stable_end = min(gap.end, plan.stable_until)
+        gap_start, gap_end = gap.start.strftime(fmt), gap.end.strftime(fmt)
+
+        parts = []
+        last_index = None
+        for code, frame in frames.items():
+            if frame is None or frame.empty:
+                continue
+            # 只保留请求的区间，服务器多返回的数据不写入缓存，避免与已缓存的区间重复
+            index = frame.index.astype(str)
+            inside = (index >= gap_start) & (index <= gap_end)
+            frame, index = frame[inside], index[inside]
+            stable = index <= stable_index
+            if (~stable).any():
+                plan.recent[code].append(frame[~stable])
+            if stable.any():
+                part = frame[stable].copy()
+                part.insert(0, 'idx', index[stable])
+                part.insert(0, 'code', code)
+                parts.append(part)
+                last_index = max(last_index or '', index[stable].max())
+
+        if stable_end < gap.start:
+            return
+        covered_end = self._covered_end(gap.start, stable_end, last_index, fmt)
+        with self._lock:
+            self.conn.execute("BEGIN TRANSACTION")
+            try:
+                table = self._table(plan.period)
+                columns = self._table_columns(plan.period)
+                if parts:
+                    rows = pd.concat(parts, ignore_index=True)
+                    rows.columns = [str(column) for column in rows.columns]
+                    self.conn.register('cache_rows', rows)
+                    if not columns:
+                        self.conn.execute(f"CREATE TABLE {table} AS SELECT * FROM cache_rows")
+                    else:
+                        # 先删除区间内的旧数据，重复写入同一区间不会产生重复行
+                        self.conn.execute(
+                            f"DELETE FROM {table} WHERE code IN (SELECT UNNEST(?)) AND idx BETWEEN ? AND ?",
+                            [gap.codes, gap.start.strftime(fmt), stable_end.strftime(fmt)]
+                        )
+                        shared = [column for column in rows.columns if column in columns]
+                        names = ', '.join(f'"{column}"' for column in shared)
+                        self.conn.execute(f"INSERT INTO {table} ({names}) SELECT {names} FROM cache_rows")
+                    self.conn.unregister('cache_rows')
+                if covered_end is not None:
+                    self._add_coverage(gap.codes, plan.period, gap.start, covered_end)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def _add_coverage(self, codes: List[str], period: str, start: datetime, end: datetime):
+        """记录已缓存区间并与原有区间合并，需在持有锁时调用"""
+        rows = self.conn.execute(
+            "SELECT code, start_time, end_time FROM bar_coverage WHERE period = ? AND code IN (SELECT UNNEST(?))",
+            [period, list(codes)]
+        ).fetchall()
+        intervals = defaultdict(list)
+        for code, covered_start, covered_end in rows:
+            intervals[code].append((covered_start, covered_end))
+        records = []
+        for code in codes:
+            for merged_start, merged_end in _merge_intervals(intervals[code] + [(start, end)]):
+                records.append((code, period, merged_start, merged_end))
+        self.conn.execute("DELETE FROM bar_coverage WHERE period = ? AND code IN (SELECT UNNEST(?))",
+                          [period, list(codes)])
+        self.conn.executemany("INSERT INTO bar_coverage VALUES (?, ?, ?, ?)", records)
+
+    def load(self, plan: CachePlan) -> Dict[str, pd.DataFrame]:
+        """
+        按缓存计划组装查询结果：缓存中的历史数据加上本次获取的当日数据
+        Returns:
+            dict: 与get_daily_bars相同结构的{股票代码: DataFrame}
+        """
+        fmt = CACHE_INDEX_FORMATS[plan.period]
+        table = self._table(plan.period)
+        result = {}
+        with self._lock:
+            if self._table_columns(plan.period):
+                frame = self.conn.execute(
+                    f"SELECT * FROM {table} WHERE code IN (SELECT UNNEST(?)) AND idx BETWEEN ? AND ? "
+                    f"ORDER BY code, idx",
+                    [plan.codes, plan.start.strftime(fmt), min(plan.end, plan.stable_until).strftime(fmt)]
+                ).df()
+                for code, group in frame.groupby('code', sort=False):
+                    result[code] = group.drop(columns='code').set_index('idx').rename_axis(None)
+        for code, recent in plan.recent.items():
+            recent = pd.concat(recent)
+            recent = recent[~recent.index.duplicated(keep='last')].sort_index()
+            result[code] = pd.concat([result[code], recent]) if code in result else recent
+        # 按请求的顺序返回
+        return {code: result[code] for code in plan.codes if code in result}
+
+    def clear(self, period: Optional[str] = None):
+        """清空缓存，指定周期时只清空该周期"""
+        with self._lock:
+            periods = [period] if period else list(CACHE_INDEX_FORMATS)
+            for item in periods:
+                if self._table_columns(item):
+                    self.conn.execute(f"DROP TABLE {self._table(item)}")
+                self.conn.execute("DELETE FROM bar_coverage WHERE period = ?", [item])
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
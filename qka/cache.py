@@ -0,0 +1,158 @@
+"""
+结果缓存模块
+缓存接口序列化后的响应内容，命中时跳过xtdata调用和序列化
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Iterable, Optional
+
+
+def make_key(func_name: str, params: dict, variant: str = '') -> str:
+    """
+    根据接口名称和参数生成规范化的缓存键
+    Args:
+        func_name: 接口名称
+        params: 接口参数(应包含默认值，保证同一请求的键一致)
+        variant: 响应变体，如响应格式
+    Returns:
+        str: 缓存键
+    """
+    canonical = json.dumps([func_name, params, variant], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+def touches_today(start_time: str = '', end_time: str = '', now: Optional[datetime] = None) -> bool:
+    """
+    判断查询区间是否包含当前交易日
+    Args:
+        start_time: 开始时间，格式为YYYYMMDD或YYYYMMDDhhmmss
+        end_time: 结束时间，为空表示截至最新
+        now: 当前时间，默认为本机时间
+    Returns:
+        bool: 区间是否可能包含当日仍在变化的数据
+    """
+    today = (now or datetime.now()).strftime('%Y%m%d')
+    end_date = str(end_time or '')[:8]
+    # 结束时间为空或无法解析时按包含当日处理
+    if len(end_date) != 8 or not end_date.isdigit():
+        return True
+    return end_date >= today
+
+
+class _CacheEntry:
+    """缓存条目"""
+    __slots__ = ('body', 'media_type', 'headers', 'expires_at', 'period', 'codes')
+
+    def __init__(self, body: bytes, media_type: str, headers: dict, expires_at: Optional[float],
+                 period: str, codes: frozenset):
+        self.body = body
+        self.media_type = media_type
+        self.headers = headers
+        self.expires_at = expires_at
+        self.period = period
+        self.codes = codes
+
+
+class ResultCache:
+    """带内存上限的LRU结果缓存
+
+    条目按响应内容字节数计入内存占用，超过上限时淘汰最久未使用的条目。
+    包含当日的条目在ttl秒后过期；完全位于历史区间的条目在history_ttl秒后过期。
+    本进程内的下载会主动失效相关条目，而定时任务、导入脚本等其他进程写入的数据只能等条目过期后生效。
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, ttl: float = 5.0,
+                 history_ttl: Optional[float] = 600.0):
+        """初始化缓存
+        Args:
+            max_bytes: 缓存内容的最大总字节数
+            ttl: 包含当日数据的条目的有效期(秒)
+            history_ttl: 历史区间条目的有效期(秒)，为None时永不过期
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.history_ttl = history_ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[str, _CacheEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[_CacheEntry]:
+        """查询缓存，命中时返回缓存条目并标记为最近使用"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at is not None and entry.expires_at <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, body: bytes, media_type: str, volatile: bool,
+            period: str = '', codes: Iterable[str] = (), headers: Optional[dict] = None):
+        """写入缓存
+        Args:
+            key: 缓存键
+            body: 序列化(及压缩)后的响应内容
+            media_type: 响应的媒体类型
+            volatile: 是否包含当日数据，是则按ttl过期，否则按history_ttl过期
+            period: 数据周期，用于按周期失效
+            codes: 涉及的股票代码，用于按股票失效
+            headers: 需要随缓存内容返回的响应头，如Content-Encoding
+        """
+        nbytes = len(body)
+        if nbytes > self.max_bytes:
+            return
+        ttl = self.ttl if volatile else self.history_ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        entry = _CacheEntry(body, media_type, dict(headers or {}), expires_at, period, frozenset(codes))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self.size += nbytes
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, period: str, codes: Iterable[str]) -> int:
+        """使指定周期下涉及给定股票的条目失效
+        Args:
+            period: 数据周期
+            codes: 股票代码
+        Returns:
+            int: 失效的条目数
+        """
+        codes = set(codes)
+        with self._lock:
+            keys = [key for key, entry in self._entries.items()
+                    if entry.period == period and not codes.isdisjoint(entry.codes)]
+            for key in keys:
+                self._remove(key)
+        return len(keys)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _remove(self, key: str):
+        """删除条目，调用方需持有锁"""
+        entry = self._entries.pop(key)
+        self.size -= len(entry.body)
+
+    def stats(self) -> dict:
+        """返回缓存统计信息"""
+        return {'entries': len(self._entries), 'bytes': self.size, 'hits': self.hits, 'misses': self.misses}
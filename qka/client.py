@@ -1,26 +1,266 @@
+import asyncio
 import requests
-from typing import Any, Dict, List, Optional
+import aiohttp
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 import logging
+import pandas as pd
+from qka import codec
+from qka.sharding import AdaptiveShardSizer, split_shards, merge_results
+from qka.frames import LAYOUTS, BarFormat, materialize, to_layout, type_frame
+from qka.balancer import LoadBalancer
+
+if TYPE_CHECKING:
+    from qka.barcache import BarCache
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
+# 有副作用或开销很大的接口，不发送对冲请求，也不拆分为分片(分片重试会重复提交下载任务)
+NON_IDEMPOTENT_METHODS = {'download_stock_history_data', 'sync_stock_history_data'}
+# 服务器不可用的状态码，计入熔断器的失败次数
+UNAVAILABLE_STATUS = {502, 503, 504}
+# 可以重试的状态码：服务器不可用或过载；500等接口本身的错误重试也不会成功
+RETRYABLE_STATUS = UNAVAILABLE_STATUS | {429}
+
+
+class _BaseClient:
+    """同步和异步客户端共用的配置、请求头、ETag缓存和结果解码"""
+
+    def __init__(self, base_url: Union[str, List[str]] = "http://localhost:8000", token: str = None,
+                 response_format: str = 'json', lane: Optional[str] = None,
+                 etag_cache_size: int = 32, servers: Optional[List[str]] = None,
+                 shard_size: int = 200, shard_workers: int = 4, shard_retries: int = 2,
+                 adaptive_shard: bool = True, cache: Optional['BarCache'] = None,
+                 bar_format: Optional[BarFormat] = None, hedge: bool = True):
+        """初始化客户端配置，参数说明见QMTDataClient"""
+        urls = [base_url] if isinstance(base_url, str) else list(base_url)
+        urls = [url.rstrip('/') for url in urls + list(servers or [])]
+        if not urls:
+            raise ValueError("服务器列表为空")
+        self.base_url = urls[0]
+        if not token:
+            raise ValueError("必须提供访问令牌(token)")
+        if response_format not in ('json', 'arrow'):
+            raise ValueError(f"无效的响应格式: {response_format}")
+        if response_format == 'arrow' and not codec.arrow_available():
+            raise ValueError("使用arrow响应格式需要安装pyarrow")
+        self.token = token
+        self.response_format = response_format
+        # 声明本机可解压的编码，服务器对较大的响应进行压缩
+        self.headers = {"X-Token": self.token, "Accept-Encoding": ", ".join(codec.supported_encodings())}
+        if response_format == 'arrow':
+            self.headers["Accept"] = f"{codec.ARROW_STREAM_MEDIA_TYPE}, application/json;q=0.9"
+        if lane:
+            self.headers["X-Lane"] = lane
+        self.etag_cache_size = etag_cache_size
+        self._etags: 'OrderedDict[str, Tuple[str, Any]]' = OrderedDict()  # {调用键: (ETag, 结果)}
+        self._etag_lock = threading.Lock()
+        # 请求按延迟分配到各个服务器，不可用的服务器被熔断
+        self.servers = list(dict.fromkeys(urls))
+        self.balancer = LoadBalancer(self.servers)
+        self.hedge = hedge
+        if shard_size < 0 or shard_workers < 1 or shard_retries < 0:
+            raise ValueError("无效的分片配置")
+        self.shard_size = shard_size
+        self.shard_workers = shard_workers
+        self.shard_retries = shard_retries
+        self.adaptive_shard = adaptive_shard
+        # 各接口的耗时差别很大，每个接口单独调整分片大小
+        self.shard_sizers: Dict[str, AdaptiveShardSizer] = {}
+        self._sizer_lock = threading.Lock()
+        self.cache = cache
+        self.bar_format = bar_format
+
+    def _typed(self, data: Any) -> Any:
+        """按bar_format转换{股票代码: DataFrame}"""
+        return materialize(data, self.bar_format)
+
+    def _check_layout(self, layout: str):
+        """在请求前检查输出结构"""
+        if layout not in LAYOUTS:
+            raise ValueError(f"无效的输出结构: {layout}，可选 {', '.join(LAYOUTS)}")
+        if layout != 'dict' and self.bar_format is not None and self.bar_format.structured:
+            raise ValueError("结构化数组只能以dict结构输出")
+
+    def _typed_since(self, result: dict) -> dict:
+        """转换增量行情中的数据部分，不修改可能被ETag缓存复用的原结果"""
+        if self.bar_format is None:
+            return result
+        return {**result, 'data': self._typed(result.get('data') or {})}
+
+    def _typed_item(self, code: str, frame: Any) -> Tuple[str, Any]:
+        """转换流式接口中的单只股票"""
+        if self.bar_format is None or not isinstance(frame, pd.DataFrame):
+            return code, frame
+        return code, type_frame(frame, self.bar_format)
+
+    def _use_cache(self, period: str, start_time: str, count: int) -> bool:
+        """按时间区间查询且周期可缓存时使用本地缓存"""
+        return self.cache is not None and count == -1 and bool(start_time) and self.cache.supports(period)
+
+    def _shard_sizer(self, method_name: str) -> Optional[AdaptiveShardSizer]:
+        """接口的分片大小调整器，未启用自动调整时为None"""
+        if not self.shard_size or not self.adaptive_shard:
+            return None
+        with self._sizer_lock:
+            sizer = self.shard_sizers.get(method_name)
+            if sizer is None:
+                sizer = self.shard_sizers[method_name] = AdaptiveShardSizer(
+                    initial=self.shard_size, min_size=min(20, self.shard_size), max_size=max(1000, self.shard_size))
+            return sizer
+
+    def _current_shard_size(self, method_name: str) -> int:
+        """接口当前使用的分片大小，为0时不分片"""
+        if not self.shard_size or method_name in NON_IDEMPOTENT_METHODS:
+            return 0
+        sizer = self._shard_sizer(method_name)
+        return sizer.size if sizer is not None else self.shard_size
+
+    def _should_hedge(self, method_name: str) -> bool:
+        """有多个服务器且接口无副作用时发送对冲请求"""
+        return self.hedge and len(self.servers) > 1 and method_name not in NON_IDEMPOTENT_METHODS
+
+    def _observe_shard(self, method_name: str, stock_count: int, seconds: Optional[float]):
+        """记录分片请求的耗时，失败时seconds为None"""
+        sizer = self._shard_sizer(method_name)
+        if sizer is None:
+            return
+        if seconds is None:
+            sizer.failed()
+        else:
+            sizer.observe(stock_count, seconds)
+
+    @staticmethod
+    def _call_key(method_name: str, params: dict) -> str:
+        """调用的规范化键，用于ETag缓存"""
+        return json.dumps([method_name, params], sort_keys=True, ensure_ascii=False, default=str)
+
+    def _cached_etag(self, key: str) -> Optional[Tuple[str, Any]]:
+        """上次调用的(ETag, 结果)，没有时返回None"""
+        if self.etag_cache_size <= 0:
+            return None
+        with self._etag_lock:
+            cached = self._etags.get(key)
+            if cached is not None:
+                self._etags.move_to_end(key)
+            return cached
+
+    def _remember_etag(self, key: str, etag: Optional[str], data: Any):
+        """记录调用结果及其ETag，超出数量时淘汰最久未使用的结果"""
+        if self.etag_cache_size <= 0 or not etag:
+            return
+        with self._etag_lock:
+            self._etags[key] = (etag, data)
+            self._etags.move_to_end(key)
+            while len(self._etags) > self.etag_cache_size:
+                self._etags.popitem(last=False)
+
+    @staticmethod
+    def _decode_result(content: bytes, content_type: str) -> Any:
+        """解码接口响应内容
+        Raises:
+            Exception: 接口在服务器端执行失败
+        """
+        # 服务器返回Arrow流时直接解码为DataFrame
+        if content_type.startswith(codec.ARROW_STREAM_MEDIA_TYPE):
+            return codec.decode_arrow(content)
+
+        result = codec.loads(content)
+
+        if not result.get('success'):
+            raise Exception(f"API调用失败: {result.get('detail')}")
+
+        # DataFrame/Series等按列编码的结果还原为pandas对象
+        return codec.from_jsonable(result.get('data'))
+
+
+class QMTDataClient(_BaseClient):
+    """QMT数据服务客户端，用于调用远程数据服务API
+
+    用完后调用close()释放连接池和对冲线程，也可以作为上下文管理器使用:
+        with QMTDataClient(base_url, token) as client:
+            data = client.get_daily_bars(['000001'], start_time='20250101')
+    """
 
-class QMTDataClient:
-    """QMT数据服务客户端，用于调用远程数据服务API"""
-    
-    def __init__(self, base_url: str = "http://localhost:8000", token: str = None):
+    def __init__(self, base_url: Union[str, List[str]] = "http://localhost:8000", token: str = None,
+                 response_format: str = 'json', lane: Optional[str] = None,
+                 etag_cache_size: int = 32, servers: Optional[List[str]] = None,
+                 shard_size: int = 200, shard_workers: int = 4, shard_retries: int = 2,
+                 adaptive_shard: bool = True, cache: Optional['BarCache'] = None,
+                 bar_format: Optional[BarFormat] = None, hedge: bool = True,
+                 connect_timeout: float = 5.0, timeout: Optional[float] = 300.0):
         """初始化数据服务客户端
         Args:
-            base_url: API服务器地址，默认为本地8000端口
+            base_url: API服务器地址，默认为本地8000端口，也可以是多个服务器地址的列表
             token: 访问令牌，必须与服务器的token一致
+            response_format: 响应格式
+                'json': JSON格式(默认)
+                'arrow': Arrow IPC流，pandas结果直接解码为DataFrame，需要安装pyarrow
+            lane: 可选的服务器优先级通道，如'trading'/'bulk'，通过X-Lane请求头传递
+            etag_cache_size: 按ETag缓存的最近调用结果数量，重复调用内容未变化时服务器只返回304，
+                为0时不缓存。缓存的结果会被重复返回，调用方不应修改
+            servers: 可选的其他服务器地址。有多个服务器时，请求优先发往平均延迟低、负载轻的服务器，
+                连续失败的服务器被暂时熔断，冷却后再用单个请求探测
+            shard_size: 股票列表超过该数量时拆分为多个分片并发请求，为0时不分片；下载接口不分片
+            shard_workers: 同时请求的分片数
+            shard_retries: 单个分片失败后的重试次数
+            adaptive_shard: 是否根据请求延迟自动调整分片大小(以shard_size为初始值，每个接口单独调整)
+            cache: 可选的本地K线缓存(qka.barcache.BarCache)，按时间区间查询行情时只请求缓存中缺失的区间
+            bar_format: 可选的行情类型化选项(qka.frames.BarFormat)，如datetime64索引、float32精度、
+                NumPy结构化数组，为None时返回与服务器一致的DataFrame
+            hedge: 有多个服务器时，请求超过该服务器最近延迟的p95仍未返回，是否向另一个服务器发送对冲请求，
+                采用先返回的结果。download_stock_history_data等有副作用的接口不发送对冲请求
+            connect_timeout: 建立连接的超时时间(秒)
+            timeout: 等待响应数据的超时时间(秒)，为None时不限制
         """
-        self.base_url = base_url.rstrip('/')
+        super().__init__(base_url, token, response_format, lane, etag_cache_size, servers,
+                         shard_size, shard_workers, shard_retries, adaptive_shard, cache, bar_format, hedge)
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
         self.session = requests.Session()
-        if not token:
-            raise ValueError("必须提供访问令牌(token)")
-        self.token = token
-        self.headers = {"X-Token": self.token}
+        # 对冲请求在线程池中并发执行，只有多个服务器时才在首次对冲时创建
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        self._hedge_pool_lock = threading.Lock()
+
+    def _get_hedge_pool(self) -> ThreadPoolExecutor:
+        """对冲请求使用的线程池"""
+        with self._hedge_pool_lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix='qka-hedge')
+            return self._hedge_pool
+
+    def _post(self, path: str, payload: Any, params: Optional[dict] = None,
+              headers: Optional[dict] = None, base_url: Optional[str] = None) -> requests.Response:
+        """发送POST请求，base_url为空时由负载均衡选择服务器
+        响应以流方式返回且不由requests自动解压，统一由codec按Content-Encoding解压
+        """
+        response = self.session.post(
+            f"{base_url or self.balancer.pick()}{path}",
+            params=params,
+            json=payload,
+            headers={**self.headers, **headers} if headers else self.headers,
+            stream=True,
+            timeout=(self.connect_timeout, self.timeout)
+        )
+        try:
+            response.raise_for_status()
+        except requests.exceptions.RequestException:
+            response.close()
+            raise
+        return response
+
+    @staticmethod
+    def _read_content(response: requests.Response) -> bytes:
+        """读取并解压完整的响应内容"""
+        with response:
+            body = response.raw.read(decode_content=False)
+        return codec.decompress(body, response.headers.get('Content-Encoding'))
 
     def api(self, method_name: str, **params) -> Any:
         """通用调用接口方法
@@ -30,25 +270,147 @@ class QMTDataClient:
         Returns:
             接口返回的数据
         """
+        return self._call(method_name, params)
+
+    def _call(self, method_name: str, params: dict, exclude: Iterable[str] = (),
+              attempted: Optional[Set[str]] = None) -> Any:
+        """调用接口，由负载均衡选择服务器，必要时发送对冲请求
+        Args:
+            exclude: 尽量不使用的服务器
+            attempted: 可选的集合，记录本次调用请求过的服务器
+        """
         try:
-            response = self.session.post(
-                f"{self.base_url}/api/{method_name}",
-                json=params or {},
-                headers=self.headers
-            )
-            response.raise_for_status()
-            result = response.json()
-            
-            if not result.get('success'):
-                raise Exception(f"API调用失败: {result.get('detail')}")
-            
-            return result.get('data')
-        except requests.exceptions.RequestException as e:
+            if not self._should_hedge(method_name):
+                return self._call_at(self.balancer.pick(exclude), method_name, params, attempted)
+            return self._hedged_call(method_name, params, exclude, attempted)
+        except Exception as e:
             logger.error(f"调用 {method_name} 失败: {str(e)}")
             raise
+
+    def _hedged_call(self, method_name: str, params: dict, exclude: Iterable[str],
+                     attempted: Optional[Set[str]]) -> Any:
+        """先向一个服务器发送请求，超过其最近延迟的p95仍未返回(或很快失败)时再向另一个服务器发送请求，
+        采用先成功返回的结果"""
+        exclude = set(exclude)
+        primary = self.balancer.pick(exclude)
+        pool = self._get_hedge_pool()
+        first = pool.submit(self._call_at, primary, method_name, params, attempted)
+        done, _ = wait([first], timeout=self.balancer.hedge_delay(primary))
+        if done and (first.exception() is None or not self._is_retryable(first.exception())):
+            return first.result()
+
+        secondary = self.balancer.pick(exclude | {primary})
+        if secondary == primary:
+            return first.result()
+        second = pool.submit(self._call_at, secondary, method_name, params, attempted)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # 较慢的请求在后台完成，结果被丢弃
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _call_at(self, url: str, method_name: str, params: dict, attempted: Optional[Set[str]] = None) -> Any:
+        """向指定服务器发送一次调用，并把结果反馈给负载均衡"""
+        if attempted is not None:
+            attempted.add(url)
+        self.balancer.start(url)
+        start = time.perf_counter()
+        try:
+            key = self._call_key(method_name, params)
+            cached = self._cached_etag(key)
+            headers = {"If-None-Match": cached[0]} if cached else None
+            response = self._post(f"/api/{method_name}", params or {}, headers=headers, base_url=url)
+            # 内容未变化，直接使用上次的结果
+            if response.status_code == 304 and cached:
+                response.close()
+                data = cached[1]
+            else:
+                content = self._read_content(response)
+                data = self._decode_result(content, response.headers.get('Content-Type', ''))
+                self._remember_etag(key, response.headers.get('ETag'), data)
         except Exception as e:
-            logger.error(f"调用 {method_name} 失败: {str(e)}")
+            if self._is_unavailable(e):
+                self.balancer.failure(url)
+            else:
+                self.balancer.cancelled(url)
             raise
+        self.balancer.success(url, time.perf_counter() - start)
+        return data
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """连接失败、超时、网关错误和过载(429/503)可以重试，其他错误(包括500)重试也不会成功"""
+        if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return True
+        if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+            return error.response.status_code in RETRYABLE_STATUS
+        return False
+
+    @staticmethod
+    def _is_unavailable(error: Exception) -> bool:
+        """连接失败、超时和网关错误说明服务器不可用，计入熔断；接口本身的错误不影响服务器状态"""
+        if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return True
+        if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+            return error.response.status_code in UNAVAILABLE_STATUS
+        return False
+
+    def _call_shard(self, method_name: str, shard: list, params: dict) -> Any:
+        """请求单个分片，失败时换服务器重试"""
+        tried: Set[str] = set()
+        for attempt in range(self.shard_retries + 1):
+            start = time.perf_counter()
+            try:
+                result = self._call(method_name, {**params, 'stock_list': shard}, exclude=tried, attempted=tried)
+            except Exception as e:
+                self._observe_shard(method_name, len(shard), None)
+                if attempt == self.shard_retries or not self._is_retryable(e):
+                    raise
+                time.sleep(0.5 * 2 ** attempt)
+                continue
+            self._observe_shard(method_name, len(shard), time.perf_counter() - start)
+            return result
+
+    def _sharded_api(self, method_name: str, stock_list: List[str], **params) -> Any:
+        """股票列表较大时拆分为多个分片并发请求，合并为与单次调用相同结构的结果"""
+        shard_size = self._current_shard_size(method_name)
+        stock_list = list(stock_list)
+        if not shard_size or len(stock_list) <= shard_size:
+            return self.api(method_name, stock_list=stock_list, **params)
+
+        shards = split_shards(stock_list, shard_size)
+        with ThreadPoolExecutor(max_workers=min(self.shard_workers, len(shards))) as pool:
+            results = list(pool.map(lambda shard: self._call_shard(method_name, shard, params), shards))
+        return merge_results(results)
+
+    def batch(self) -> 'QMTBatch':
+        """创建批量调用，在一次HTTP请求中执行多个接口调用
+        用法:
+            with client.batch() as batch:
+                sector = batch.get_stock_list_in_sector('沪深A股')
+                main_board = batch.get_stock_list_in_main_board()
+            print(sector.result(), main_board.result())
+        Returns:
+            QMTBatch: 批量调用对象，退出with语句块时统一发送
+        """
+        return QMTBatch(self)
+
+    def quote_subscriber(self) -> 'QMTQuoteSubscriber':
+        """创建异步行情订阅客户端，接收服务器转发的xtdata实时行情
+        用法:
+            async with client.quote_subscriber() as subscriber:
+                await subscriber.subscribe(['000001.SZ'], period='tick')
+                async for code, period, data in subscriber:
+                    print(code, data)
+        Returns:
+            QMTQuoteSubscriber: 异步行情订阅客户端
+        """
+        return QMTQuoteSubscriber(self.base_url, self.token)
 
     def get_stock_list_in_sector(self, sector_name: str) -> List[str]:
         """获取板块成分股
@@ -66,10 +428,25 @@ class QMTDataClient:
         """
         return self.api('get_stock_list_in_main_board')
 
+    def get_stock_list_in_chinext(self) -> List[str]:
+        """获取沪深A股创业板成分股
+        Returns:
+            list: 创业板成分股代码列表
+        """
+        return self.api('get_stock_list_in_chinext')
+
+    def get_stock_list_in_star_market(self) -> List[str]:
+        """获取沪深A股科创板成分股
+        Returns:
+            list: 科创板成分股代码列表
+        """
+        return self.api('get_stock_list_in_star_market')
+
     # 便捷方法：数据下载和获取
     def download_stock_history_data(self, stock_list: List[str], start_time: str, 
                                     end_time: str = '', period: str = '1d', 
-                                    process_bar: bool = True) -> bool:
+                                    process_bar: bool = True, chunk_size: int = 500,
+                                    workers: int = 1, retries: int = 2, report: bool = False) -> Any:
         """下载股票历史K线数据
         Args:
             stock_list: 股票代码列表
@@ -77,32 +454,695 @@ class QMTDataClient:
             end_time: 结束时间，默认为空
             period: 周期，'1d'为日线(默认)，'1m'为1分钟线
             process_bar: 进度条显示，默认显示
+            chunk_size: 服务器每次调用download_history_data2的股票数量，默认500
+            workers: 服务器同时下载的分块数，默认1(xtdata的并发下载尚未验证)
+            retries: 单个分块失败后的重试次数，默认2
+            report: 为True时返回各股票的下载报告
         Returns:
-            bool: 是否成功
+            bool: 是否没有失败的股票；report为True时返回{股票代码: 下载报告}，结构见qka.data.download_stock_history_data
         """
-        return self.api('download_stock_history_data', 
-                       stock_list=stock_list, 
-                       start_time=start_time, 
-                       end_time=end_time, 
-                       period=period, 
-                       process_bar=process_bar)
+        return self.api('download_stock_history_data',
+                        stock_list=stock_list,
+                        start_time=start_time,
+                        end_time=end_time,
+                        period=period,
+                        process_bar=process_bar,
+                        chunk_size=chunk_size,
+                        workers=workers,
+                        retries=retries,
+                        report=report)
+
+    def sync_stock_history_data(self, stock_list: List[str], start_time: str, end_time: str = '',
+                                period: str = '1d', process_bar: bool = True, chunk_size: int = 500,
+                                workers: int = 1, retries: int = 2) -> Dict:
+        """增量下载股票历史K线数据，服务器只下载其索引中缺失的交易日区间
+        Args:
+            stock_list: 股票代码列表
+            start_time: 需要覆盖的开始日期
+            end_time: 需要覆盖的结束日期，默认为当日
+            period: 周期，'1d'为日线(默认)，'1m'为1分钟线
+            process_bar: 服务器端进度条显示，默认显示
+            chunk_size, workers, retries: 分块下载配置，说明见download_stock_history_data
+        Returns:
+            dict: {'ok', 'batches', 'report'}，结构见qka.data.sync_stock_history_data
+        """
+        return self.api('sync_stock_history_data',
+                        stock_list=stock_list,
+                        start_time=start_time,
+                        end_time=end_time,
+                        period=period,
+                        process_bar=process_bar,
+                        chunk_size=chunk_size,
+                        workers=workers,
+                        retries=retries)
 
     def get_daily_bars(self, stock_list: List[str], period: str = '1d', 
                        start_time: str = '', end_time: str = '', 
-                       count: int = -1) -> Dict:
+                       count: int = -1, layout: str = 'dict') -> Any:
         """获取行情数据
+        股票数量超过分片大小时自动拆分为多个分片并发请求，失败的分片单独重试。
+        设置了本地缓存时，按时间区间的查询只请求缓存中缺失的区间
+        Args:
+            stock_list: 股票列表
+            period: 周期，默认为'1d'
+            start_time: 开始时间，默认为空
+            end_time: 结束时间，默认为空
+            count: 数量，默认为-1
+            layout: 输出结构，'dict'(默认)、'long'、'multiindex'或'panel'，说明见qka.frames.to_layout。
+                服务器始终按dict返回，在客户端合并分片和缓存后再整理
+        Returns:
+            行情数据，结构由layout决定
+        """
+        self._check_layout(layout)
+        if self._use_cache(period, start_time, count):
+            plan = self.cache.plan(stock_list, period, start_time, end_time)
+            for gap in plan.gaps:
+                frames = self._sharded_api('get_daily_bars', gap.codes, period=period,
+                                           start_time=gap.start_time, end_time=gap.end_time, count=-1)
+                self.cache.fill(plan, gap, frames)
+            return to_layout(self._typed(self.cache.load(plan)), layout)
+        return to_layout(self._typed(self._sharded_api('get_daily_bars',
+                                                       stock_list,
+                                                       period=period,
+                                                       start_time=start_time,
+                                                       end_time=end_time,
+                                                       count=count)), layout)
+
+    def get_daily_bars_since(self, stock_list: List[str], period: str = '1d', cursor: str = '',
+                             start_time: str = '', count: int = -1) -> Dict:
+        """增量获取行情数据，适用于定时轮询
+        用法:
+            result = client.get_daily_bars_since(stock_list, '1m', start_time='20250101')
+            while True:
+                result = client.get_daily_bars_since(stock_list, '1m', cursor=result['cursor'])
+                # result['data']中只有新增和被修订的K线，按索引覆盖本地数据即可
+        Args:
+            stock_list: 股票列表
+            period: 周期，默认为'1d'
+            cursor: 上次调用返回的游标，为空时按start_time/count返回全部数据
+            start_time: 首次调用的开始时间
+            count: 首次调用的数量
+        Returns:
+            dict: {'cursor': 新的游标, 'data': {股票代码: 新增或修订的K线}}
+        """
+        return self._typed_since(self.api('get_daily_bars_since',
+                                          stock_list=stock_list,
+                                          period=period,
+                                          cursor=cursor,
+                                          start_time=start_time,
+                                          count=count))
+
+    def iter_daily_bars(self, stock_list: List[str], period: str = '1d',
+                        start_time: str = '', end_time: str = '',
+                        count: int = -1, shard_size: int = 100) -> Iterator[Tuple[str, Any]]:
+        """流式获取行情数据，服务器按分片获取并逐只股票返回
+        适用于股票数量较多的查询，服务器和客户端都不需要一次性持有全部数据
         Args:
             stock_list: 股票列表
             period: 周期，默认为'1d'
             start_time: 开始时间，默认为空
             end_time: 结束时间，默认为空
             count: 数量，默认为-1
+            shard_size: 服务器每个分片的股票数量，默认100
         Returns:
-            dict: 行情数据
+            迭代器，依次产生(股票代码, 行情数据)
+        """
+        params = {
+            'stock_list': stock_list,
+            'period': period,
+            'start_time': start_time,
+            'end_time': end_time,
+            'count': count,
+        }
+        try:
+            response = self._post("/api/stream/get_daily_bars", params, params={'shard_size': shard_size})
+        except requests.exceptions.RequestException as e:
+            logger.error(f"调用 iter_daily_bars 失败: {str(e)}")
+            raise
+
+        with response:
+            stream = codec.open_decompressed(response.raw, response.headers.get('Content-Encoding'))
+            content_type = response.headers.get('Content-Type', '')
+            if content_type.startswith(codec.ARROW_STREAM_MEDIA_TYPE):
+                for code, frame in codec.iter_arrow_stream(stream):
+                    yield self._typed_item(code, frame)
+                return
+
+            for line in stream:
+                line = line.strip()
+                if not line:
+                    continue
+                item = codec.loads(line)
+                if 'error' in item:
+                    raise Exception(f"API调用失败: {item['error']}")
+                yield self._typed_item(item['code'], codec.from_jsonable(item['data']))
+
+    def close(self):
+        """关闭连接池，并取消尚未开始的对冲请求"""
+        with self._hedge_pool_lock:
+            if self._hedge_pool is not None:
+                self._hedge_pool.shutdown(wait=False, cancel_futures=True)
+                self._hedge_pool = None
+        self.session.close()
+
+    def __enter__(self) -> 'QMTDataClient':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class AsyncQMTDataClient(_BaseClient):
+    """基于aiohttp的异步数据服务客户端
+
+    方法与QMTDataClient一致(均为协程)，多个调用可以并发执行。
+    所有请求共享一个连接池，并受全局并发数限制，避免一次提交大量请求压垮服务器。
+    用法:
+        async with AsyncQMTDataClient(base_url, token, max_concurrency=8) as client:
+            results = await client.gather(client.get_daily_bars(group, '1d', start_time='20250101')
+                                          for group in stock_groups)
+    """
+
+    def __init__(self, base_url: Union[str, List[str]] = "http://localhost:8000", token: str = None,
+                 response_format: str = 'json', lane: Optional[str] = None,
+                 etag_cache_size: int = 32, max_concurrency: int = 16,
+                 max_connections: int = 100, max_connections_per_host: int = 0,
+                 timeout: Optional[float] = 300.0, servers: Optional[List[str]] = None,
+                 shard_size: int = 200, shard_workers: int = 4, shard_retries: int = 2,
+                 adaptive_shard: bool = True, cache: Optional['BarCache'] = None,
+                 bar_format: Optional[BarFormat] = None, hedge: bool = True,
+                 connect_timeout: float = 5.0):
+        """初始化异步数据服务客户端
+        Args:
+            base_url: API服务器地址，默认为本地8000端口，也可以是多个服务器地址的列表
+            token: 访问令牌，必须与服务器的token一致
+            response_format: 响应格式，'json'(默认)或'arrow'
+            lane: 可选的服务器优先级通道，通过X-Lane请求头传递
+            etag_cache_size: 按ETag缓存的最近调用结果数量，为0时不缓存
+            max_concurrency: 全局最大并发请求数
+            max_connections: 连接池的最大连接数
+            max_connections_per_host: 每个主机的最大连接数，0表示不限制
+            timeout: 单个请求的总超时时间(秒)，为None时不限制
+            servers: 可选的其他服务器地址，负载均衡和熔断说明见QMTDataClient
+            shard_size, shard_workers, shard_retries, adaptive_shard: 股票列表分片配置，
+                说明见QMTDataClient
+            cache: 可选的本地K线缓存，说明见QMTDataClient
+            bar_format: 可选的行情类型化选项，说明见QMTDataClient
+            hedge: 是否发送对冲请求，说明见QMTDataClient
+            connect_timeout: 建立连接的超时时间(秒)
         """
-        return self.api('get_daily_bars', 
-                       stock_list=stock_list, 
-                       period=period, 
-                       start_time=start_time, 
-                       end_time=end_time, 
-                       count=count)
+        super().__init__(base_url, token, response_format, lane, etag_cache_size, servers,
+                         shard_size, shard_workers, shard_retries, adaptive_shard, cache, bar_format, hedge)
+        if max_concurrency < 1:
+            raise ValueError("最大并发数必须大于0")
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        """在首次请求时创建连接池，需要在事件循环中调用"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections,
+                                             limit_per_host=self.max_connections_per_host)
+            # 响应不由aiohttp自动解压，统一由codec按Content-Encoding解压
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                auto_decompress=False,
+                timeout=aiohttp.ClientTimeout(total=self.timeout, connect=self.connect_timeout),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def _post(self, path: str, payload: Any, headers: Optional[dict] = None,
+                    base_url: Optional[str] = None) -> Tuple[int, Any, bytes]:
+        """发送POST请求并读取完整的响应，base_url为空时由负载均衡选择服务器
+        Returns:
+            tuple: (状态码, 响应头, 解压后的响应内容)
+        """
+        session = self._ensure_session()
+        async with self._semaphore:
+            async with session.post(f"{base_url or self.balancer.pick()}{path}", json=payload,
+                                    headers={**self.headers, **headers} if headers else self.headers) as response:
+                response.raise_for_status()
+                body = await response.read()
+        return response.status, response.headers, codec.decompress(body, response.headers.get('Content-Encoding'))
+
+    async def api(self, method_name: str, **params) -> Any:
+        """通用调用接口方法
+        Args:
+            method_name: 要调用的接口名称
+            **params: 接口参数，作为关键字参数传入
+        Returns:
+            接口返回的数据
+        """
+        return await self._call(method_name, params)
+
+    async def _call(self, method_name: str, params: dict, exclude: Iterable[str] = (),
+                    attempted: Optional[Set[str]] = None) -> Any:
+        """调用接口，参数说明见QMTDataClient._call"""
+        try:
+            if not self._should_hedge(method_name):
+                return await self._call_at(self.balancer.pick(exclude), method_name, params, attempted)
+            return await self._hedged_call(method_name, params, exclude, attempted)
+        except Exception as e:
+            logger.error(f"调用 {method_name} 失败: {str(e)}")
+            raise
+
+    async def _hedged_call(self, method_name: str, params: dict, exclude: Iterable[str],
+                           attempted: Optional[Set[str]]) -> Any:
+        """发送对冲请求，采用先成功返回的结果并取消另一个请求"""
+        exclude = set(exclude)
+        primary = self.balancer.pick(exclude)
+        first = asyncio.ensure_future(self._call_at(primary, method_name, params, attempted))
+        done, _ = await asyncio.wait({first}, timeout=self.balancer.hedge_delay(primary))
+        if done and (first.exception() is None or not self._is_retryable(first.exception())):
+            return first.result()
+
+        secondary = self.balancer.pick(exclude | {primary})
+        if secondary == primary:
+            return await first
+        second = asyncio.ensure_future(self._call_at(secondary, method_name, params, attempted))
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _call_at(self, url: str, method_name: str, params: dict,
+                       attempted: Optional[Set[str]] = None) -> Any:
+        """向指定服务器发送一次调用，并把结果反馈给负载均衡"""
+        if attempted is not None:
+            attempted.add(url)
+        self.balancer.start(url)
+        start = time.perf_counter()
+        try:
+            key = self._call_key(method_name, params)
+            cached = self._cached_etag(key)
+            headers = {"If-None-Match": cached[0]} if cached else None
+            status, response_headers, content = await self._post(f"/api/{method_name}", params or {},
+                                                                 headers, url)
+            # 内容未变化，直接使用上次的结果
+            if status == 304 and cached:
+                data = cached[1]
+            else:
+                data = self._decode_result(content, response_headers.get('Content-Type', ''))
+                self._remember_etag(key, response_headers.get('ETag'), data)
+        except BaseException as e:
+            # 被取消的对冲请求不计入失败
+            if isinstance(e, Exception) and self._is_unavailable(e):
+                self.balancer.failure(url)
+            else:
+                self.balancer.cancelled(url)
+            raise
+        self.balancer.success(url, time.perf_counter() - start)
+        return data
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """连接失败、超时、网关错误和过载(429/503)可以重试，500等接口本身的错误不重试"""
+        if isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError)):
+            return True
+        if isinstance(error, aiohttp.ClientResponseError):
+            return error.status in RETRYABLE_STATUS
+        return False
+
+    @staticmethod
+    def _is_unavailable(error: Exception) -> bool:
+        """连接失败、超时和网关错误说明服务器不可用，计入熔断"""
+        if isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError)):
+            return True
+        if isinstance(error, aiohttp.ClientResponseError):
+            return error.status in UNAVAILABLE_STATUS
+        return False
+
+    async def _call_shard(self, method_name: str, shard: list, params: dict,
+                          limiter: asyncio.Semaphore) -> Any:
+        """请求单个分片，失败时换服务器重试"""
+        tried: Set[str] = set()
+        async with limiter:
+            for attempt in range(self.shard_retries + 1):
+                start = time.perf_counter()
+                try:
+                    result = await self._call(method_name, {**params, 'stock_list': shard},
+                                              exclude=tried, attempted=tried)
+                except Exception as e:
+                    self._observe_shard(method_name, len(shard), None)
+                    if attempt == self.shard_retries or not self._is_retryable(e):
+                        raise
+                    await asyncio.sleep(0.5 * 2 ** attempt)
+                    continue
+                self._observe_shard(method_name, len(shard), time.perf_counter() - start)
+                return result
+
+    async def _sharded_api(self, method_name: str, stock_list: List[str], **params) -> Any:
+        """股票列表较大时拆分为多个分片并发请求，合并为与单次调用相同结构的结果"""
+        shard_size = self._current_shard_size(method_name)
+        stock_list = list(stock_list)
+        if not shard_size or len(stock_list) <= shard_size:
+            return await self.api(method_name, stock_list=stock_list, **params)
+
+        limiter = asyncio.Semaphore(self.shard_workers)
+        results = await asyncio.gather(*(self._call_shard(method_name, shard, params, limiter)
+                                         for shard in split_shards(stock_list, shard_size)))
+        return merge_results(list(results))
+
+    async def gather(self, calls: Iterable[Any], return_exceptions: bool = False) -> List[Any]:
+        """并发执行多个调用，实际并发数受max_concurrency限制
+        Args:
+            calls: 调用列表，元素为客户端方法返回的协程，或(接口名称, 参数字典)
+            return_exceptions: 为True时失败的调用返回异常对象，否则第一个异常直接抛出
+        Returns:
+            list: 按调用顺序排列的结果
+        """
+        tasks = [call if inspect.isawaitable(call) else self.api(call[0], **call[1]) for call in calls]
+        return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+
+    def quote_subscriber(self) -> 'QMTQuoteSubscriber':
+        """创建异步行情订阅客户端，用法见QMTDataClient.quote_subscriber"""
+        return QMTQuoteSubscriber(self.base_url, self.token)
+
+    async def get_stock_list_in_sector(self, sector_name: str) -> List[str]:
+        """获取板块成分股
+        Args:
+            sector_name: 板块名称(如: '沪深A股')
+        Returns:
+            list: 板块成分股代码列表
+        """
+        return await self.api('get_stock_list_in_sector', sector_name=sector_name)
+
+    async def get_stock_list_in_main_board(self) -> List[str]:
+        """获取沪深A股主板成分股
+        Returns:
+            list: 沪深A股主板成分股代码列表
+        """
+        return await self.api('get_stock_list_in_main_board')
+
+    async def get_stock_list_in_chinext(self) -> List[str]:
+        """获取沪深A股创业板成分股"""
+        return await self.api('get_stock_list_in_chinext')
+
+    async def get_stock_list_in_star_market(self) -> List[str]:
+        """获取沪深A股科创板成分股"""
+        return await self.api('get_stock_list_in_star_market')
+
+    async def download_stock_history_data(self, stock_list: List[str], start_time: str,
+                                          end_time: str = '', period: str = '1d',
+                                          process_bar: bool = True, chunk_size: int = 500,
+                                          workers: int = 1, retries: int = 2, report: bool = False) -> Any:
+        """下载股票历史K线数据，参数说明见QMTDataClient.download_stock_history_data"""
+        return await self.api('download_stock_history_data',
+                              stock_list=stock_list,
+                              start_time=start_time,
+                              end_time=end_time,
+                              period=period,
+                              process_bar=process_bar,
+                              chunk_size=chunk_size,
+                              workers=workers,
+                              retries=retries,
+                              report=report)
+
+    async def sync_stock_history_data(self, stock_list: List[str], start_time: str, end_time: str = '',
+                                      period: str = '1d', process_bar: bool = True, chunk_size: int = 500,
+                                      workers: int = 1, retries: int = 2) -> Dict:
+        """增量下载股票历史K线数据，参数说明见QMTDataClient.sync_stock_history_data"""
+        return await self.api('sync_stock_history_data',
+                              stock_list=stock_list,
+                              start_time=start_time,
+                              end_time=end_time,
+                              period=period,
+                              process_bar=process_bar,
+                              chunk_size=chunk_size,
+                              workers=workers,
+                              retries=retries)
+
+    async def get_daily_bars(self, stock_list: List[str], period: str = '1d',
+                             start_time: str = '', end_time: str = '',
+                             count: int = -1, layout: str = 'dict') -> Any:
+        """获取行情数据，股票数量较多时自动分片，设置了本地缓存时只请求缺失的区间，
+        参数说明见QMTDataClient.get_daily_bars
+        """
+        self._check_layout(layout)
+        if self._use_cache(period, start_time, count):
+            # 本地数据库操作在线程中执行，不阻塞事件循环
+            plan = await asyncio.to_thread(self.cache.plan, stock_list, period, start_time, end_time)
+            results = await asyncio.gather(*(
+                self._sharded_api('get_daily_bars', gap.codes, period=period,
+                                  start_time=gap.start_time, end_time=gap.end_time, count=-1)
+                for gap in plan.gaps))
+            for gap, frames in zip(plan.gaps, results):
+                await asyncio.to_thread(self.cache.fill, plan, gap, frames)
+            return to_layout(self._typed(await asyncio.to_thread(self.cache.load, plan)), layout)
+        return to_layout(self._typed(await self._sharded_api('get_daily_bars',
+                                                             stock_list,
+                                                             period=period,
+                                                             start_time=start_time,
+                                                             end_time=end_time,
+                                                             count=count)), layout)
+
+    async def get_daily_bars_since(self, stock_list: List[str], period: str = '1d', cursor: str = '',
+                                   start_time: str = '', count: int = -1) -> Dict:
+        """增量获取行情数据，参数说明见QMTDataClient.get_daily_bars_since"""
+        return self._typed_since(await self.api('get_daily_bars_since',
+                                                stock_list=stock_list,
+                                                period=period,
+                                                cursor=cursor,
+                                                start_time=start_time,
+                                                count=count))
+
+    async def iter_daily_bars(self, stock_list: List[str], period: str = '1d',
+                              start_time: str = '', end_time: str = '',
+                              count: int = -1, shard_size: int = 100) -> AsyncIterator[Tuple[str, Any]]:
+        """流式获取行情数据，依次产生(股票代码, 行情数据)，参数说明见QMTDataClient.iter_daily_bars
+        异步流式接口固定使用NDJSON格式，整个流占用一个并发名额
+        """
+        params = {
+            'stock_list': stock_list,
+            'period': period,
+            'start_time': start_time,
+            'end_time': end_time,
+            'count': count,
+        }
+        session = self._ensure_session()
+        headers = {**self.headers, "Accept": "application/json"}
+        async with self._semaphore:
+            async with session.post(f"{self.balancer.pick()}/api/stream/get_daily_bars", json=params,
+                                    params={'shard_size': shard_size}, headers=headers) as response:
+                response.raise_for_status()
+                decompressor = codec.StreamDecompressor(response.headers.get('Content-Encoding'))
+                buffer = b''
+                async for chunk in response.content.iter_any():
+                    buffer += decompressor.decompress(chunk)
+                    *lines, buffer = buffer.split(b'\n')
+                    for line in lines:
+                        if not line.strip():
+                            continue
+                        item = codec.loads(line)
+                        if 'error' in item:
+                            raise Exception(f"API调用失败: {item['error']}")
+                        yield self._typed_item(item['code'], codec.from_jsonable(item['data']))
+
+    async def close(self):
+        """关闭连接池"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self) -> 'AsyncQMTDataClient':
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
+class BatchResult:
+    """批量调用中单个调用的结果"""
+
+    def __init__(self, method_name: str):
+        self.method_name = method_name
+        self.done = False
+        self.success = False
+        self.data = None
+        self.detail = None
+
+    def result(self) -> Any:
+        """获取调用结果
+        Returns:
+            接口返回的数据
+        Raises:
+            RuntimeError: 批量调用尚未执行
+            Exception: 该调用在服务器端执行失败
+        """
+        if not self.done:
+            raise RuntimeError(f"{self.method_name} 尚未执行，请在批量调用结束后获取结果")
+        if not self.success:
+            raise Exception(f"API调用失败: {self.detail}")
+        return self.data
+
+
+class QMTBatch:
+    """批量调用，收集多个接口调用后通过 /api/_batch 一次发送
+
+    支持与客户端相同的便捷方法(参数按客户端方法签名解析)，
+    也可以通过 api(method_name, **params) 调用任意接口。
+    各调用在服务器端并发执行，互不影响。
+    """
+
+    def __init__(self, client: QMTDataClient):
+        self.client = client
+        self.calls: List[Tuple[str, dict, BatchResult]] = []
+
+    def api(self, method_name: str, **params) -> BatchResult:
+        """添加一个接口调用
+        Args:
+            method_name: 要调用的接口名称
+            **params: 接口参数
+        Returns:
+            BatchResult: 调用结果，批量调用执行后可用
+        """
+        result = BatchResult(method_name)
+        self.calls.append((method_name, params, result))
+        return result
+
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        method = getattr(self.client, name, None)
+        signature = inspect.signature(method) if callable(method) else None
+
+        def call(*args, **kwargs) -> BatchResult:
+            # 按客户端方法签名把位置参数转换为关键字参数
+            if signature is None and args:
+                raise TypeError(f"{name} 不是客户端方法，请使用关键字参数")
+            params = signature.bind(*args, **kwargs).arguments if signature else kwargs
+            return self.api(name, **params)
+
+        return call
+
+    def execute(self) -> List[BatchResult]:
+        """发送所有收集的调用
+        Returns:
+            list: 按添加顺序排列的调用结果
+        """
+        if not self.calls:
+            return []
+        payload = [{'method': method_name, 'params': params} for method_name, params, _ in self.calls]
+        try:
+            response = self.client._post("/api/_batch", payload)
+            result = codec.loads(self.client._read_content(response))
+        except requests.exceptions.RequestException as e:
+            logger.error(f"批量调用失败: {str(e)}")
+            raise
+        if not result.get('success'):
+            raise Exception(f"API调用失败: {result.get('detail')}")
+
+        for (_, _, batch_result), item in zip(self.calls, result.get('data')):
+            batch_result.done = True
+            batch_result.success = item.get('success', False)
+            batch_result.data = codec.from_jsonable(item.get('data'))
+            batch_result.detail = item.get('detail')
+        results = [batch_result for _, _, batch_result in self.calls]
+        self.calls = []
+        return results
+
+    def __enter__(self) -> 'QMTBatch':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # with语句块内出现异常时不发送
+        if exc_type is None:
+            self.execute()
+
+
+class QMTQuoteSubscriber:
+    """异步行情订阅客户端，通过WebSocket连接服务器的 /ws/quote 端点
+
+    服务器对同一代码只向xtdata订阅一次，客户端处理不及时时只保留每个代码的最新行情。
+    """
+
+    def __init__(self, base_url: str, token: str, heartbeat: float = 30.0):
+        """初始化订阅客户端
+        Args:
+            base_url: API服务器地址
+            token: 访问令牌
+            heartbeat: WebSocket心跳间隔(秒)
+        """
+        if base_url.startswith('http'):
+            base_url = 'ws' + base_url[len('http'):]
+        self.url = f"{base_url.rstrip('/')}/ws/quote"
+        self.token = token
+        self.heartbeat = heartbeat
+        self._session = None
+        self._ws = None
+
+    async def connect(self):
+        """建立WebSocket连接"""
+        self._session = aiohttp.ClientSession()
+        try:
+            self._ws = await self._session.ws_connect(
+                self.url, headers={"X-Token": self.token}, heartbeat=self.heartbeat)
+        except Exception:
+            await self._session.close()
+            raise
+
+    async def _send(self, action: str, codes: List[str], period: str):
+        if self._ws is None:
+            raise RuntimeError("尚未连接，请先调用connect()")
+        await self._ws.send_str(codec.dumps({'action': action, 'codes': codes, 'period': period}).decode('utf-8'))
+
+    async def subscribe(self, codes: List[str], period: str = 'tick'):
+        """订阅行情
+        Args:
+            codes: 股票代码列表，全推行情还可以是市场代码如['SH', 'SZ']
+            period: 周期，如'tick'/'1m'/'1d'，或'whole'表示全推行情
+        """
+        await self._send('subscribe', codes, period)
+
+    async def unsubscribe(self, codes: List[str], period: str = 'tick'):
+        """取消订阅
+        Args:
+            codes: 股票代码列表
+            period: 周期
+        """
+        await self._send('unsubscribe', codes, period)
+
+    async def __aiter__(self):
+        """依次产生(股票代码, 周期, 行情数据)，连接关闭时结束"""
+        async for message in self._ws:
+            if message.type != aiohttp.WSMsgType.TEXT:
+                if message.type == aiohttp.WSMsgType.ERROR:
+                    raise self._ws.exception()
+                continue
+            payload = codec.loads(message.data)
+            event = payload.get('event')
+            if event == 'quote':
+                yield payload['code'], payload['period'], codec.from_jsonable(payload['data'])
+            elif event == 'error':
+                logger.error(f"行情订阅失败: {payload.get('detail')}")
+
+    async def close(self):
+        """关闭连接"""
+        if self._ws is not None:
+            await self._ws.close()
+            self._ws = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self) -> 'QMTQuoteSubscriber':
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
@@ -0,0 +1,546 @@
+"""
+数据编解码模块
+提供服务端与客户端共用的JSON和Arrow IPC编解码，以及响应压缩功能
+"""
+
+import gzip
+import io
+import json
+import math
+import zlib
+from datetime import date, datetime
+from typing import Any, Iterator, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow为可选依赖，未安装时只能使用JSON格式
+    pa = None
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖，未安装时使用标准库json
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard为可选依赖，未安装时只使用gzip压缩
+    zstandard = None
+
+# Arrow IPC流格式的媒体类型
+ARROW_STREAM_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+# 逐行JSON(NDJSON)的媒体类型，用于流式响应
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+# 字典结果拼接为单表时，用于区分原字典键的索引层名称
+KEY_LEVEL = '__key__'
+# Series结果转换为单列表时使用的默认列名
+SERIES_COLUMN = '__value__'
+
+# schema元数据中记录原始结构的键
+_META_SHAPE = b'qka.shape'
+_META_KEYS = b'qka.keys'
+# 流式响应中每个record batch附带的元数据键
+_BATCH_KEY = 'qka.key'
+_BATCH_ERROR = 'qka.error'
+
+# 每个record batch的最大行数
+ARROW_BATCH_SIZE = 65536
+
+# 压缩级别，兼顾压缩率和速度
+GZIP_LEVEL = 5
+ZSTD_LEVEL = 3
+
+# JSON中pandas/numpy对象的类型标记键
+TYPE_KEY = '__type__'
+# orjson可直接按列序列化的numpy数据类型
+_NATIVE_KINDS = 'biuf'
+
+
+def _encode_default(obj: Any) -> Any:
+    """JSON编码器无法直接处理的标量类型"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (datetime, date, pd.Timestamp)):
+        return obj.isoformat()
+    return str(obj)
+
+
+def _encode_values(values: np.ndarray) -> Any:
+    """
+    将一列numpy数据转换为可序列化的形式
+    数值列交给orjson整列序列化(NaN输出为null)，时间列转换为毫秒时间戳
+    """
+    kind = values.dtype.kind
+    if kind == 'M':
+        mask = np.isnat(values)
+        millis = values.astype('datetime64[ms]').astype('int64')
+        if not mask.any():
+            return millis if orjson is not None else millis.tolist()
+        encoded = millis.astype(object)
+        encoded[mask] = None
+        return encoded.tolist()
+    if kind in _NATIVE_KINDS:
+        if kind == 'f' and values.dtype.itemsize < 4:
+            values = values.astype('float32')
+        if orjson is not None:
+            return np.ascontiguousarray(values)
+        if kind == 'f':
+            mask = np.isnan(values)
+            if mask.any():
+                encoded = values.astype(object)
+                encoded[mask] = None
+                return encoded.tolist()
+        return values.tolist()
+    # 对象列(如字符串)只对缺失值逐个替换为None，其余标量交给编码器的default处理
+    encoded = values.tolist()
+    for i in np.flatnonzero(pd.isna(values)):
+        encoded[i] = None
+    return encoded
+
+
+def _encode_index(index: pd.Index) -> dict:
+    """编码索引，时间索引额外标记类型"""
+    if isinstance(index, pd.MultiIndex):
+        return {'index': [_encode_values(np.asarray(index.get_level_values(i)))
+                          for i in range(index.nlevels)],
+                'index_names': list(index.names), 'multi_index': True}
+    encoded = {'index': _encode_values(np.asarray(index))}
+    if index.dtype.kind == 'M':
+        encoded['index_datetime'] = True
+    if index.name is not None:
+        encoded['index_name'] = index.name
+    return encoded
+
+
+def to_jsonable(obj: Any) -> Any:
+    """
+    将结果转换为可JSON序列化的结构
+    DataFrame按列编码为{columns, index, data}紧凑格式，Series和ndarray整列编码，
+    时间类型编码为毫秒时间戳，缺失值编码为null
+    Args:
+        obj: 接口函数的返回值
+    Returns:
+        可序列化的结构，配合dumps使用时数值列保持为numpy数组
+    """
+    if obj is None or isinstance(obj, (bool, int, str)):
+        return obj
+    if isinstance(obj, float):
+        return None if math.isnan(obj) else obj
+    if isinstance(obj, dict):
+        return {k: to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_jsonable(item) for item in obj]
+    if isinstance(obj, pd.DataFrame):
+        encoded = {
+            TYPE_KEY: 'DataFrame',
+            'columns': [str(column) for column in obj.columns],
+            'data': [_encode_values(obj.iloc[:, i].to_numpy()) for i in range(obj.shape[1])],
+        }
+        datetimes = [str(column) for column, dtype in obj.dtypes.items() if dtype.kind == 'M']
+        if datetimes:
+            encoded['datetimes'] = datetimes
+        encoded.update(_encode_index(obj.index))
+        return encoded
+    if isinstance(obj, pd.Series):
+        encoded = {
+            TYPE_KEY: 'Series',
+            'name': None if obj.name is None else str(obj.name),
+            'data': _encode_values(obj.to_numpy()),
+            'datetime': obj.dtype.kind == 'M',
+        }
+        encoded.update(_encode_index(obj.index))
+        return encoded
+    if isinstance(obj, np.ndarray):
+        return {
+            TYPE_KEY: 'ndarray',
+            'dtype': str(obj.dtype),
+            'shape': list(obj.shape),
+            'data': _encode_values(obj.ravel()),
+        }
+    if isinstance(obj, (np.generic, datetime, date, pd.Timestamp)):
+        return _encode_default(obj)
+    # 如果是自定义对象，获取所有公开属性，每个属性只取值一次
+    if hasattr(obj, '__dir__'):
+        public_attrs = {}
+        for attr in obj.__dir__():
+            if attr.startswith('_'):
+                continue
+            value = getattr(obj, attr)
+            if not callable(value):
+                public_attrs[attr] = to_jsonable(value)
+        return public_attrs
+    return str(obj)
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    将to_jsonable的结果编码为JSON字节
+    优先使用orjson，数值列直接从numpy数组写出
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_encode_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_encode_default, ensure_ascii=False).encode('utf-8')
+
+
+def loads(payload) -> Any:
+    """解析JSON字节"""
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+def _decode_values(values: list, is_datetime: bool = False) -> Any:
+    """解码一列数据"""
+    if is_datetime:
+        return pd.to_datetime(pd.Series(values, dtype='float64'), unit='ms').to_numpy()
+    return values
+
+
+def _decode_index(obj: dict) -> pd.Index:
+    """解码索引"""
+    if obj.get('multi_index'):
+        return pd.MultiIndex.from_arrays(obj['index'], names=obj.get('index_names'))
+    index = pd.Index(_decode_values(obj['index'], obj.get('index_datetime', False)))
+    index.name = obj.get('index_name')
+    return index
+
+
+def from_jsonable(obj: Any) -> Any:
+    """
+    将to_jsonable编码的结构还原为pandas/numpy对象
+    DataFrame按列构造，不逐行创建对象
+    """
+    if isinstance(obj, dict):
+        kind = obj.get(TYPE_KEY)
+        if kind == 'DataFrame':
+            datetimes = set(obj.get('datetimes', ()))
+            columns = {column: _decode_values(values, column in datetimes)
+                       for column, values in zip(obj['columns'], obj['data'])}
+            return pd.DataFrame(columns, index=_decode_index(obj), columns=obj['columns'])
+        if kind == 'Series':
+            return pd.Series(_decode_values(obj['data'], obj.get('datetime', False)),
+                             index=_decode_index(obj), name=obj.get('name'))
+        if kind == 'ndarray':
+            dtype = np.dtype(obj['dtype'])
+            values = _decode_values(obj['data'], dtype.kind == 'M')
+            return np.asarray(values).astype(dtype).reshape(obj['shape'])
+        return {k: from_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        if any(isinstance(item, (dict, list)) for item in obj):
+            return [from_jsonable(item) for item in obj]
+    return obj
+
+
+def arrow_available() -> bool:
+    """判断是否安装了pyarrow"""
+    return pa is not None
+
+
+def accepts_arrow(accept: Optional[str]) -> bool:
+    """
+    根据请求的Accept头判断客户端是否接受Arrow IPC流
+    Args:
+        accept: 请求头中的Accept值
+    Returns:
+        bool: 是否可以返回Arrow格式
+    """
+    if not accept or pa is None:
+        return False
+    media_types = [item.split(';')[0].strip().lower() for item in accept.split(',')]
+    return ARROW_STREAM_MEDIA_TYPE in media_types
+
+
+def is_arrow_encodable(obj: Any) -> bool:
+    """
+    判断结果是否可以编码为Arrow表
+    支持DataFrame、Series，以及值全部为DataFrame的非空字典(如get_daily_bars的返回值)
+    """
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return True
+    if isinstance(obj, dict) and obj:
+        return all(isinstance(value, pd.DataFrame) for value in obj.values())
+    return False
+
+
+def _to_frame(obj: Any):
+    """将结果整理为单个DataFrame，并返回用于还原结构的元数据"""
+    if isinstance(obj, pd.Series):
+        name = obj.name if obj.name is not None else SERIES_COLUMN
+        return obj.to_frame(name=str(name)), {_META_SHAPE: b'series'}
+    if isinstance(obj, pd.DataFrame):
+        return obj, {_META_SHAPE: b'frame'}
+    # 字典按键拼接为一张表，键作为最外层索引，避免逐只股票单独编码
+    keys = [str(key) for key in obj.keys()]
+    frame = pd.concat(list(obj.values()), keys=keys, names=[KEY_LEVEL])
+    meta = {
+        _META_SHAPE: b'dict',
+        _META_KEYS: json.dumps(keys, ensure_ascii=False).encode('utf-8'),
+    }
+    return frame, meta
+
+
+def encode_arrow(obj: Any) -> bytes:
+    """
+    将pandas结果编码为Arrow IPC流
+    Args:
+        obj: DataFrame、Series或值为DataFrame的字典
+    Returns:
+        bytes: Arrow IPC流数据
+    """
+    frame, meta = _to_frame(obj)
+    table = pa.Table.from_pandas(frame, preserve_index=True)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), **meta})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=ARROW_BATCH_SIZE):
+            writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def decode_arrow(payload: bytes) -> Any:
+    """
+    将Arrow IPC流解码为pandas结果，还原为编码前的结构
+    Args:
+        payload: Arrow IPC流数据
+    Returns:
+        DataFrame、Series或值为DataFrame的字典
+    """
+    table = pa.ipc.open_stream(payload).read_all()
+    meta = table.schema.metadata or {}
+    frame = table.to_pandas()
+    shape = meta.get(_META_SHAPE, b'frame')
+
+    if shape == b'series':
+        series = frame.iloc[:, 0]
+        return series.rename(None) if series.name == SERIES_COLUMN else series
+    if shape != b'dict':
+        return frame
+
+    # 拼接时各键的数据连续存放，按分组切片即可还原，无需逐行构造对象
+    keys = json.loads(meta[_META_KEYS].decode('utf-8'))
+    groups = {key: group.droplevel(0) for key, group in frame.groupby(level=0, sort=False)}
+    empty = frame.iloc[0:0].droplevel(0)
+    return {key: groups.get(key, empty) for key in keys}
+
+
+class ArrowStreamEncoder:
+    """增量Arrow IPC流编码器
+
+    用于流式响应：每只股票的数据编码为一个record batch，股票代码记录在batch的元数据中。
+    schema取自第一只有数据的股票，之后的数据都显式转换为该schema。
+    空数据无法确定列类型，在schema确定前暂存，之后按schema写出空batch。
+    每次写入后返回新产生的字节，编码器本身不保留已写出的数据。
+    """
+
+    def __init__(self):
+        self._sink = io.BytesIO()
+        self._writer = None
+        self._schema = None
+        self._pending: List[Tuple[str, pd.DataFrame]] = []  # schema确定前的空数据
+
+    def _drain(self) -> bytes:
+        """取出缓冲区中已编码的字节并清空缓冲区"""
+        chunk = self._sink.getvalue()
+        self._sink.seek(0)
+        self._sink.truncate()
+        return chunk
+
+    def _start(self, schema: pa.Schema):
+        """确定schema并写出暂存的空数据"""
+        self._schema = schema
+        self._writer = pa.ipc.new_stream(self._sink, schema)
+        for key, _ in self._pending:
+            self._write_empty(key)
+        self._pending = []
+
+    def _write_empty(self, key: str):
+        empty = pa.RecordBatch.from_pylist([], schema=self._schema)
+        self._writer.write_batch(empty, custom_metadata={_BATCH_KEY: key})
+
+    def write(self, frames: dict) -> bytes:
+        """
+        编码一批股票数据
+        Args:
+            frames: {股票代码: DataFrame}
+        Returns:
+            bytes: 本次新产生的流数据
+        """
+        for key, frame in frames.items():
+            key = str(key)
+            if frame.empty:
+                if self._writer is None:
+                    self._pending.append((key, frame))
+                else:
+                    self._write_empty(key)
+                continue
+            table = pa.Table.from_pandas(frame, preserve_index=True)
+            if self._writer is None:
+                self._start(table.schema)
+            elif not table.schema.equals(self._schema):
+                table = table.select(self._schema.names).cast(self._schema)
+            for batch in table.combine_chunks().to_batches():
+                self._writer.write_batch(batch, custom_metadata={_BATCH_KEY: key})
+        return self._drain()
+
+    def close(self, error: Optional[str] = None) -> bytes:
+        """
+        结束流
+        Args:
+            error: 可选的错误信息，写入最后一个空batch的元数据中，供客户端识别
+        Returns:
+            bytes: 剩余的流数据
+        """
+        if self._writer is None:
+            # 全部为空数据时以第一个空数据的列确定schema，没有任何数据时写出空schema，保证流格式完整
+            if self._pending:
+                self._start(pa.Schema.from_pandas(self._pending[0][1], preserve_index=True))
+            else:
+                self._start(pa.schema([]))
+        if error:
+            empty = pa.RecordBatch.from_pylist([], schema=self._schema)
+            self._writer.write_batch(empty, custom_metadata={_BATCH_ERROR: error})
+        self._writer.close()
+        return self._drain()
+
+
+def iter_arrow_stream(source) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """
+    逐个读取ArrowStreamEncoder产生的流
+    Args:
+        source: 可读的文件对象或字节
+    Returns:
+        迭代器，依次产生(股票代码, DataFrame)
+    """
+    reader = pa.ipc.open_stream(source)
+    while True:
+        try:
+            batch, metadata = reader.read_next_batch_with_custom_metadata()
+        except StopIteration:
+            return
+        metadata = metadata or {}
+        if _BATCH_ERROR.encode() in metadata:
+            raise RuntimeError(metadata[_BATCH_ERROR.encode()].decode('utf-8'))
+        yield metadata[_BATCH_KEY.encode()].decode('utf-8'), batch.to_pandas()
+
+
+def supported_encodings() -> List[str]:
+    """本机可用的压缩编码，按优先级排列"""
+    return ['zstd', 'gzip'] if zstandard is not None else ['gzip']
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    根据请求的Accept-Encoding头选择压缩编码
+    Args:
+        accept_encoding: 请求头中的Accept-Encoding值
+    Returns:
+        str: 'zstd'或'gzip'，客户端不接受压缩时返回None
+    """
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    candidates = [name for name in supported_encodings() if accepted.get(name, 0) > 0]
+    if not candidates:
+        return None
+    # q值相同时按本机优先级选择
+    return max(candidates, key=lambda name: accepted[name])
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """按指定编码压缩数据"""
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    raise ValueError(f"不支持的压缩编码: {encoding}")
+
+
+def decompress(body: bytes, encoding: Optional[str]) -> bytes:
+    """按Content-Encoding解压数据，未压缩时原样返回"""
+    if not encoding or encoding == 'identity':
+        return body
+    if encoding == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("响应使用zstd压缩，需要安装zstandard")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    if encoding == 'gzip':
+        return gzip.decompress(body)
+    raise ValueError(f"不支持的压缩编码: {encoding}")
+
+
+class StreamCompressor:
+    """流式响应的增量压缩器，每次压缩后立即刷新，客户端可以及时解压每个分片"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == 'zstd':
+            self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        elif encoding == 'gzip':
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        else:
+            raise ValueError(f"不支持的压缩编码: {encoding}")
+
+    def compress(self, chunk: bytes) -> bytes:
+        """压缩一个分片并刷新输出"""
+        if self.encoding == 'zstd':
+            return self._compressor.compress(chunk) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        """结束压缩流"""
+        return self._compressor.flush()
+
+
+class StreamDecompressor:
+    """流式响应的增量解压器，用于无法包装为文件对象的异步响应流"""
+
+    def __init__(self, encoding: Optional[str]):
+        self.encoding = encoding if encoding and encoding != 'identity' else None
+        if self.encoding == 'zstd':
+            if zstandard is None:
+                raise RuntimeError("响应使用zstd压缩，需要安装zstandard")
+            self._decompressor = zstandard.ZstdDecompressor().decompressobj()
+        elif self.encoding == 'gzip':
+            self._decompressor = zlib.decompressobj(31)
+        elif self.encoding is not None:
+            raise ValueError(f"不支持的压缩编码: {encoding}")
+
+    def decompress(self, chunk: bytes) -> bytes:
+        """解压收到的一块数据，返回目前可以解出的内容"""
+        if self.encoding is None:
+            return chunk
+        return self._decompressor.decompress(chunk)
+
+
+def open_decompressed(fileobj, encoding: Optional[str]):
+    """
+    包装可读的文件对象，读取时按Content-Encoding解压
+    Args:
+        fileobj: 原始(未解码)的响应流
+        encoding: 响应的Content-Encoding
+    Returns:
+        可读的文件对象
+    """
+    if not encoding or encoding == 'identity':
+        return fileobj
+    if encoding == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("响应使用zstd压缩，需要安装zstandard")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(fileobj))
+    if encoding == 'gzip':
+        return gzip.GzipFile(fileobj=fileobj, mode='rb')
+    raise ValueError(f"不支持的压缩编码: {encoding}")
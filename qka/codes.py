@@ -0,0 +1,191 @@
+"""
+股票代码工具模块
+不依赖xtquant，服务端和客户端都可以使用
+数组版本的函数按前缀查表批量处理，不逐个处理字符串；单个代码的函数直接处理字符串
+"""
+
+from typing import Any
+import numpy as np
+import pandas as pd
+
+# 交易所后缀，数组版本的结果以这些类别表示
+EXCHANGES = ['SH', 'SZ', 'BJ']
+
+# 市场类型
+MARKET_TYPES = ['主板', '创业板', '科创板', '北交所']
+
+
+def _build_exchange_table() -> np.ndarray:
+    """按代码前两位查交易所的表，值为EXCHANGES中的位置"""
+    table = np.zeros(100, dtype=np.int8)  # 默认为上海证券交易所
+    for prefix in (0, 30, 15, 16, 18, 12):
+        table[prefix] = EXCHANGES.index('SZ')
+    for prefix in (60, 68, 11):
+        table[prefix] = EXCHANGES.index('SH')
+    for prefix in (83, 43):
+        table[prefix] = EXCHANGES.index('BJ')
+    return table
+
+
+def _build_market_table() -> np.ndarray:
+    """按代码前三位查市场类型的表，值为MARKET_TYPES中的位置"""
+    table = np.zeros(1000, dtype=np.int8)  # 默认为主板
+    table[300:310] = MARKET_TYPES.index('创业板')
+    table[[688, 689]] = MARKET_TYPES.index('科创板')
+    table[830:840] = MARKET_TYPES.index('北交所')
+    return table
+
+
+_EXCHANGE_TABLE = _build_exchange_table()
+_MARKET_TABLE = _build_market_table()
+
+_DOT = ord('.')
+_ZERO = ord('0')
+
+
+def _parse_codes(stock_codes: Any):
+    """
+    把股票代码转换为字符矩阵并解析前缀
+    Returns:
+        tuple: (字符串数组, 码点矩阵, 是否带后缀, 前6位是否为数字, 前三位数字)
+    """
+    values = np.asarray(stock_codes, dtype=str).reshape(-1)
+    if values.dtype.itemsize < 6 * 4:
+        values = values.astype('U6')
+    width = values.dtype.itemsize // 4
+    # 定长Unicode数组可以直接视为每个字符一个uint32的矩阵，整列比较和计算
+    chars = np.ascontiguousarray(values).view(np.uint32).reshape(len(values), width)
+    has_suffix = (chars == _DOT).any(axis=1)
+    # 无符号减法中非数字字符会变成很大的值
+    digits = chars[:, :6] - np.uint32(_ZERO)
+    numeric = (digits <= 9).all(axis=1)
+    prefix = np.where(numeric, (digits[:, 0] * 100 + digits[:, 1] * 10 + digits[:, 2]).astype(np.int64), 0)
+    return values, chars, has_suffix, numeric, prefix
+
+
+def _check_bare_codes(values: np.ndarray, has_suffix: np.ndarray, numeric: np.ndarray):
+    """不带后缀的代码必须是6位数字，与add_stock_suffix一致"""
+    invalid = ~has_suffix & ~(numeric & (np.char.str_len(values) == 6))
+    if invalid.any():
+        raise ValueError(f"股票代码必须是6位数字: {values[invalid][0]}")
+
+
+def _like_input(result: Any, stock_codes: Any) -> Any:
+    """输入为Series时按原索引返回Series"""
+    if isinstance(stock_codes, pd.Series):
+        return pd.Series(result, index=stock_codes.index, name=stock_codes.name)
+    return result
+
+
+def add_stock_suffix_array(stock_codes: Any) -> Any:
+    """
+    批量为股票代码添加后缀
+    Args:
+        stock_codes: 股票代码的列表、ndarray或Series，可以带后缀如.SH/.SZ，也可以不带
+    Returns:
+        ndarray: 添加后缀的股票代码，输入为Series时返回相同索引的Series
+    Raises:
+        ValueError: 不带后缀的代码不是6位数字
+    """
+    values, chars, has_suffix, numeric, prefix = _parse_codes(stock_codes)
+    _check_bare_codes(values, has_suffix, numeric)
+    bare = ~has_suffix
+
+    # 在码点矩阵上拼接"代码.后缀"，再整体视为字符串
+    width = max(chars.shape[1], 9)
+    result = np.zeros((len(values), width), dtype=np.uint32)
+    result[:, :chars.shape[1]] = chars
+    suffix_chars = np.array([[ord(char) for char in exchange] for exchange in EXCHANGES], dtype=np.uint32)
+    result[bare, 6] = _DOT
+    result[bare, 7:9] = suffix_chars[_EXCHANGE_TABLE[prefix[bare] // 10]]
+    return _like_input(result.view(f'U{width}').reshape(-1), stock_codes)
+
+
+def get_stock_exchange_array(stock_codes: Any) -> Any:
+    """
+    批量判断股票代码所属的交易所
+    Args:
+        stock_codes: 股票代码的列表、ndarray或Series，已有后缀的代码以后缀为准
+    Returns:
+        pd.Categorical: 类别为EXCHANGES，输入为Series时返回相同索引的Series
+    """
+    suffixed = add_stock_suffix_array(np.asarray(stock_codes, dtype=str).reshape(-1))
+    exchange = pd.Categorical(np.char.partition(suffixed, '.')[:, 2], categories=EXCHANGES)
+    return _like_input(exchange, stock_codes)
+
+
+def get_stock_market_type_array(stock_codes: Any) -> Any:
+    """
+    批量判断股票所属的市场类型
+    Args:
+        stock_codes: 股票代码的列表、ndarray或Series，可以带后缀如.SH/.SZ，也可以不带
+    Returns:
+        pd.Categorical: 类别为MARKET_TYPES('主板'/'创业板'/'科创板'/'北交所')，
+            输入为Series时返回相同索引的Series
+    Raises:
+        ValueError: 不带后缀的代码不是6位数字
+    """
+    values, _, has_suffix, numeric, prefix = _parse_codes(stock_codes)
+    _check_bare_codes(values, has_suffix, numeric)
+    market = pd.Categorical.from_codes(_MARKET_TABLE[prefix], categories=MARKET_TYPES)
+    return _like_input(market, stock_codes)
+
+
+def add_stock_suffix(stock_code: str) -> str:
+    """
+    为给定的股票代码添加相应的后缀
+    Args:
+        stock_code: 股票代码，可以带后缀如.SH/.SZ，也可以不带
+    Returns:
+        str: 添加后缀的股票代码，如'000001.SH'
+    """
+    # 如果已经有后缀，直接返回
+    if '.' in stock_code:
+        return stock_code
+
+    # 检查股票代码是否为6位数字
+    if len(stock_code) != 6 or not stock_code.isdigit():
+        raise ValueError("股票代码必须是6位数字")
+
+    # 根据股票代码的前缀添加相应的后缀，与_EXCHANGE_TABLE一致
+    if stock_code.startswith(("00", "30", "15", "16", "18", "12")):
+        return f"{stock_code}.SZ"  # 深圳证券交易所
+    elif stock_code.startswith(("60", "68", "11")):
+        return f"{stock_code}.SH"  # 上海证券交易所
+    elif stock_code.startswith(("83", "43")):
+        return f"{stock_code}.BJ"  # 北京证券交易所
+
+    return f"{stock_code}.SH"  # 默认为上海证券交易所
+
+
+def add_stock_suffix_list(stock_list: list) -> list:
+    """
+    为给定的股票代码列表添加相应的后缀
+    Args:
+        stock_list: 股票代码列表
+    Returns:
+        list: 添加后缀的股票代码列表
+    """
+    # 列表输入、列表输出时逐个处理字符串比转换为数组更快，数组输入才批量查表
+    if isinstance(stock_list, (np.ndarray, pd.Series)):
+        return add_stock_suffix_array(stock_list).tolist()
+    return [add_stock_suffix(stock_code) for stock_code in stock_list]
+
+
+def get_stock_market_type(stock_code: str) -> str:
+    """
+    根据股票代码判断股票所属市场类型
+    Args:
+        stock_code: 股票代码，可以带后缀如.SH/.SZ，也可以不带
+    Returns:
+        str: 市场类型，'主板'/'创业板'/'科创板'/'北交所'
+    """
+    symbol = add_stock_suffix(stock_code).split('.')[0]
+    # 与_MARKET_TABLE一致
+    if symbol.startswith(('688', '689')):
+        return '科创板'
+    elif symbol.startswith('30'):
+        return '创业板'
+    elif symbol.startswith('83'):
+        return '北交所'
+    return '主板'
@@ -0,0 +1,182 @@
+"""
+下载覆盖范围索引模块
+记录每只股票每个周期已下载的交易日区间，与交易日历比较得到缺失的区间，
+增量下载时只请求缺失的部分
+"""
+
+import json
+import os
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+# 默认的本地索引文件
+DEFAULT_COVERAGE_PATH = os.path.join(os.path.expanduser('~'), '.qka', 'coverage.json')
+
+# 交易日区间，(开始日期, 结束日期)，均为YYYYMMDD整数且包含两端
+DayRange = Tuple[int, int]
+
+
+def find_missing(trading_days: np.ndarray, covered: Optional[DayRange]) -> List[DayRange]:
+    """
+    计算目标交易日中未被已下载区间覆盖的部分
+    Args:
+        trading_days: 排序后的目标交易日数组
+        covered: 已下载的区间，为None时全部缺失
+    Returns:
+        list: 缺失的区间，最多两段(已下载区间之前和之后)
+    """
+    if len(trading_days) == 0:
+        return []
+    if covered is None:
+        return [(int(trading_days[0]), int(trading_days[-1]))]
+    before = trading_days[trading_days < covered[0]]
+    after = trading_days[trading_days > covered[1]]
+    return [(int(days[0]), int(days[-1])) for days in (before, after) if len(days)]
+
+
+def group_missing(trading_days: np.ndarray, coverage: Dict[str, Optional[DayRange]],
+                  stock_list: Iterable[str]) -> Dict[DayRange, List[str]]:
+    """
+    按缺失区间分组，缺失区间相同的股票合并为一次下载
+    Returns:
+        dict: {缺失区间: 股票列表}，按区间排序
+    """
+    grouped = defaultdict(list)
+    for code in stock_list:
+        for missing in find_missing(trading_days, coverage.get(code)):
+            grouped[missing].append(code)
+    return dict(sorted(grouped.items()))
+
+
+@contextmanager
+def _file_lock(path: str):
+    """跨进程的文件锁，持有期间其他进程无法同时修改索引文件"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.lock", 'a+b') as handle:
+        if os.name == 'nt':
+            import msvcrt
+            handle.seek(0)
+            # LK_LOCK最多重试10次，锁被长时间占用时继续等待
+            while True:
+                try:
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+class CoverageIndex:
+    """已下载区间的索引
+
+    每只股票每个周期记录一个连续的交易日区间，保存在本地JSON文件中。
+    服务器和crontab.py等多个进程可能同时更新同一个文件，每次更新在文件锁内重新读取文件、
+    合并本次的区间后再保存，不会覆盖其他进程的更新；文件被其他进程修改后查询时重新读取。
+    可以在多个线程中同时使用。
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_COVERAGE_PATH):
+        """初始化索引
+        Args:
+            path: 本地索引文件路径，为None时只保存在内存中
+        """
+        self.path = path
+        self._index: Optional[Dict[str, Dict[str, List[int]]]] = None  # {周期: {股票代码: [开始, 结束]}}
+        self._mtime: Optional[int] = None  # 读取时文件的修改时间
+        self._lock = threading.Lock()
+
+    def _file_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _ensure_loaded(self, reload: bool = False):
+        """首次使用或文件被其他进程修改后读取本地文件，需在持有锁时调用
+        Args:
+            reload: 是否总是重新读取(修改索引前在文件锁内调用)
+        """
+        if not self.path:
+            if self._index is None:
+                self._index = {}
+            return
+        mtime = self._file_mtime()
+        if self._index is not None and not reload and mtime == self._mtime:
+            return
+        self._index = {}
+        if mtime is not None:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._index = json.load(f)
+        self._mtime = mtime
+
+    def get(self, period: str, stock_list: Iterable[str]) -> Dict[str, Optional[DayRange]]:
+        """
+        查询已下载的区间
+        Returns:
+            dict: {股票代码: (开始日期, 结束日期)}，没有记录的股票为None
+        """
+        with self._lock:
+            self._ensure_loaded()
+            entries = self._index.get(period, {})
+            return {code: tuple(entries[code]) if code in entries else None for code in stock_list}
+
+    @contextmanager
+    def _modify(self):
+        """在线程锁和文件锁内读取最新的索引，修改后保存"""
+        with self._lock:
+            if not self.path:
+                self._ensure_loaded()
+                yield self._index
+                return
+            with _file_lock(self.path):
+                self._ensure_loaded(reload=True)
+                yield self._index
+                self._save()
+
+    def update(self, period: str, ranges: Dict[str, DayRange]):
+        """
+        记录新下载的区间并与已有区间合并，然后保存到本地文件
+        新区间应与已有区间相连或重叠(由find_missing得到的区间总是如此)
+        Args:
+            period: 周期
+            ranges: {股票代码: (开始日期, 结束日期)}
+        """
+        if not ranges:
+            return
+        with self._modify() as index:
+            entries = index.setdefault(period, {})
+            for code, (start, end) in ranges.items():
+                if code in entries:
+                    start, end = min(start, entries[code][0]), max(end, entries[code][1])
+                entries[code] = [int(start), int(end)]
+
+    def _save(self):
+        """保存到本地文件，需在持有文件锁时调用"""
+        # 先写入临时文件再替换，中断时不会留下不完整的索引
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(temp_path, self.path)
+        self._mtime = self._file_mtime()
+
+    def clear(self, period: Optional[str] = None):
+        """清空索引，指定周期时只清空该周期"""
+        with self._modify() as index:
+            if period:
+                index.pop(period, None)
+            else:
+                index.clear()
@@ -3,10 +3,75 @@
 提供数据处理和获取功能
 """
 
+import hashlib
+import logging
+import threading
+import time
 import pandas as pd
-import akshare as ak
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time as dt_time, timedelta
 from xtquant import xtdata
 from tqdm import tqdm
+from qka import codes, frames
+from qka.metrics import phase
+from qka.store import BAR_COLUMNS, HistoryStore, HistoryStoreUnavailable, parse_time, from_local_ms, LOCAL_OFFSET_MS
+from qka.tradecalendar import get_calendar, format_dates, to_date_number
+from qka.universe import UniverseCache
+from qka.coverage import CoverageIndex, group_missing
+
+logger = logging.getLogger(__name__)
+
+# 本地历史行情库，设置后get_daily_bars的历史部分从库中读取
+_history_store = None
+
+def set_history_store(store: HistoryStore = None):
+    """
+    设置本地历史行情库
+    Args:
+        store: HistoryStore实例，为None时所有行情都从xtdata获取
+    """
+    global _history_store
+    _history_store = store
+
+# 按交易日缓存的股票池，首次使用时创建
+_universe_cache = None
+
+def set_universe_cache(cache: UniverseCache = None):
+    """
+    设置股票池缓存
+    Args:
+        cache: UniverseCache实例，为None时在首次使用时按默认配置创建
+    """
+    global _universe_cache
+    _universe_cache = cache
+
+def _universe() -> UniverseCache:
+    global _universe_cache
+    if _universe_cache is None:
+        _universe_cache = UniverseCache(xtdata.get_stock_list_in_sector)
+    return _universe_cache
+
+# 已下载区间的索引，首次使用时创建
+_coverage_index = None
+
+# 收盘时间，之前的当日数据不完整，不记为已下载
+MARKET_CLOSE = dt_time(15, 0)
+
+def set_coverage_index(index: CoverageIndex = None):
+    """
+    设置增量下载使用的已下载区间索引
+    Args:
+        index: CoverageIndex实例，为None时在首次使用时按默认配置创建
+    """
+    global _coverage_index
+    _coverage_index = index
+
+def _coverage() -> CoverageIndex:
+    global _coverage_index
+    if _coverage_index is None:
+        _coverage_index = CoverageIndex()
+    return _coverage_index
 
 def add_stock_suffix(stock_code):
     """
@@ -16,23 +81,7 @@ def add_stock_suffix(stock_code):
     Returns:
         str: 添加后缀的股票代码，如'000001.SH'
     """
-    # 如果已经有后缀，直接返回
-    if '.' in stock_code:
-        return stock_code
-        
-    # 检查股票代码是否为6位数字
-    if len(stock_code) != 6 or not stock_code.isdigit():
-        raise ValueError("股票代码必须是6位数字")
-
-    # 根据股票代码的前缀添加相应的后缀
-    if stock_code.startswith(("00", "30", "15", "16", "18", "12")):
-        return f"{stock_code}.SZ"  # 深圳证券交易所
-    elif stock_code.startswith(("60", "68", "11")):
-        return f"{stock_code}.SH"  # 上海证券交易所
-    elif stock_code.startswith(("83", "43")):
-        return f"{stock_code}.BJ"  # 北京证券交易所
-    
-    return f"{stock_code}.SH"  # 默认为上海证券交易所
+    return codes.add_stock_suffix(stock_code)
 
 def add_stock_suffix_list(stock_list: list) -> list:
     """
@@ -42,7 +91,7 @@ def add_stock_suffix_list(stock_list: list) -> list:
     Returns:
         list: 添加后缀的股票代码列表
     """
-    return [add_stock_suffix(stock_code) for stock_code in stock_list]
+    return codes.add_stock_suffix_list(stock_list)
 
 def get_stock_market_type(stock_code: str) -> str:
     """
@@ -52,17 +101,7 @@ def get_stock_market_type(stock_code: str) -> str:
     Returns:
         str: 市场类型，'主板'/'创业板'/'科创板'/'北交所'
     """
-    symbol = add_stock_suffix(stock_code)
-    if '.' in symbol:
-        symbol = symbol.split('.')[0]
-    if symbol.startswith('688') or symbol.startswith('689'):
-        return '科创板'
-    elif symbol.startswith('30'):
-        return '创业板'
-    elif symbol.startswith('83'):
-        return '北交所'
-    else:
-        return '主板'
+    return codes.get_stock_market_type(stock_code)
 
 # 获取交易日历
 def get_trade_calendar(start_time: str, end_time: str, format: str = 'number') -> list:
@@ -77,23 +116,8 @@ def get_trade_calendar(start_time: str, end_time: str, format: str = 'number') -
     Returns:
         list: 交易日历，格式为'number'或'str'
     """
-    start = pd.to_datetime(start_time)
-    end = pd.to_datetime(end_time)
-    
-    try:
-        dates = ak.tool_trade_date_hist_sina()['trade_date']
-    except Exception as e:
-        raise RuntimeError(f"调用akshare交易日历接口失败: {e}")
-
-    dates = pd.to_datetime(dates)
-    mask = (dates >= start) & (dates <= end)
-
-    if format == 'number':
-        return [dt.strftime('%Y%m%d') for dt in dates[mask]]
-    elif format == 'str':
-        return [dt.strftime('%Y-%m-%d') for dt in dates[mask]]
-    else:
-        raise ValueError(f"无效的格式: {format}")
+    # 本地缓存的交易日历，每天最多从akshare刷新一次
+    return format_dates(get_calendar().range(start_time, end_time), format)
 
 # 获取板块成分股
 def get_stock_list_in_sector(sector_name: str) -> list:
@@ -105,8 +129,8 @@ def get_stock_list_in_sector(sector_name: str) -> list:
         list: 板块成分股代码列表
     """
     try:
-        stock_list = xtdata.get_stock_list_in_sector(sector_name)
-        return stock_list
+        # 成分股按交易日缓存，新交易日的第一次调用时从xtdata刷新
+        return _universe().get(sector_name)
     except Exception as e:
         raise RuntimeError(f"获取板块成分股失败: {e}")
 
@@ -116,27 +140,90 @@ def get_stock_list_in_main_board() -> list:
     Returns:
         list: 沪深A股主板成分股代码列表
     """
+    return _get_derived_universe('主板')
+
+def get_stock_list_in_chinext() -> list:
+    """
+    获取沪深A股创业板成分股
+    Returns:
+        list: 创业板成分股代码列表
+    """
+    return _get_derived_universe('创业板')
+
+def get_stock_list_in_star_market() -> list:
+    """
+    获取沪深A股科创板成分股
+    Returns:
+        list: 科创板成分股代码列表
+    """
+    return _get_derived_universe('科创板')
+
+def _get_derived_universe(market_type: str) -> list:
+    """沪深A股中某一市场类型的成分股，与成分股一起按交易日缓存"""
+    sector_name = '沪深A股'
     try:
-        sector_name = '沪深A股'
-        stock_list = get_stock_list_in_sector(sector_name)
-        stock_list = [stock for stock in stock_list if get_stock_market_type(stock) == '主板']
-        return stock_list
+        return _universe().derived(sector_name, market_type)
     except Exception as e:
-        raise RuntimeError(f"获取{sector_name}主板成分股失败: {e}")
+        raise RuntimeError(f"获取{sector_name}{market_type}成分股失败: {e}")
 
 # 下载股票历史数据
-def download_stock_history_data(stock_list: list, start_time: str, end_time: str = '', period: str = '1d', process_bar: bool = True) -> bool:
+def _coverage_time(value) -> str:
+    """把下载状态中的时间统一转换为字符串"""
+    if isinstance(value, datetime):
+        return value.strftime('%Y%m%d%H%M%S')
+    if isinstance(value, (int, float)) and value > 0:
+        # xtdata的时间为UTC毫秒时间戳
+        return from_local_ms(int(value) + LOCAL_OFFSET_MS).strftime('%Y%m%d%H%M%S')
+    return str(value) if value else ''
+
+def _download_chunk(chunk: list, period: str, start_time: str, end_time: str, on_progress=None) -> dict:
+    """
+    用download_history_data2下载一个分块
+    Returns:
+        dict: {股票代码: (开始时间, 结束时间)}，时间无法解析时值为None；
+            xtdata未返回下载状态时返回None，各股票是否下载成功未知
+    """
+    status = xtdata.download_history_data2(chunk, period=period, start_time=start_time, end_time=end_time,
+                                           callback=on_progress, incrementally=True)
+    # 新版xtdata返回各股票的下载状态(即内部status[4])，没有出现在其中的股票下载失败；
+    # 行情服务未提供下载结果或下载失败但未抛出异常时为空字典，不能当作下载成功
+    if not isinstance(status, dict) or not status:
+        return None
+    coverage = {}
+    for code, item in status.items():
+        if isinstance(item, dict):
+            coverage[code] = (_coverage_time(item.get('start_time')), _coverage_time(item.get('end_time')))
+        elif isinstance(item, (list, tuple)) and len(item) >= 2:
+            coverage[code] = (_coverage_time(item[0]), _coverage_time(item[1]))
+        else:
+            coverage[code] = None
+    return coverage
+
+def download_stock_history_data(stock_list: list, start_time: str, end_time: str = '', period: str = '1d',
+                                process_bar: bool = True, chunk_size: int = 500, workers: int = 1,
+                                retries: int = 2, report: bool = False):
     """
     下载股票历史K线数据
+    股票列表按chunk_size分块，每块调用一次download_history_data2，明确失败的股票按块重试；
+    xtdata未返回下载状态时各股票记为状态未知，不重试。
+    xtdata每个客户端同一时间只支持一个下载任务的取消，多个分块并发下载尚未验证，默认逐块下载
     Args:
         stock_list: 股票代码列表
         start_time: 开始时间
+        end_time: 结束时间，默认为空(截至最新)
         period: 周期
             '1d': 日线(默认)
             '1m': 1分钟线
         process_bar: 进度条显示，默认显示
+        chunk_size: 每块的股票数量，默认500
+        workers: 同时下载的分块数，默认1
+        retries: 单个分块失败后的重试次数，默认2
+        report: 为True时返回各股票的下载报告而不是bool
     Returns:
-        bool: 是否成功
+        bool: 是否没有失败的股票(状态未知不计为失败)
+        report为True时返回dict: {股票代码: {'ok': 是否确认下载成功, 'status': 'ok'/'failed'/'unknown',
+            'start_time': 已下载的开始时间, 'end_time': 已下载的结束时间, 'attempts': 下载次数, 'error': 失败原因}}，
+            xtdata未返回下载状态时status为'unknown'，ok为False(未确认成功)
     """
     if not stock_list:
         raise ValueError(f"股票列表为空")
@@ -146,29 +233,154 @@ def download_stock_history_data(stock_list: list, start_time: str, end_time: str
     
     if not period:
         raise ValueError(f"周期不能为空")
-    
-    iterator = tqdm(stock_list, desc=f"下载历史数据", ncols=100, colour="green") if process_bar else stock_list
-    for code in iterator:
-        xtdata.download_history_data(code, period=period, start_time=start_time, end_time=end_time, incrementally=True)
-    return True
 
-# 获取行情数据
-def get_daily_bars(stock_list: list, period: str = '1d', start_time: str = '', end_time: str = '', count: int = -1) -> dict:
+    if chunk_size < 1:
+        raise ValueError(f"分块大小必须大于0")
+
+    stock_list = list(dict.fromkeys(stock_list))
+    results = {code: {'ok': False, 'status': 'failed', 'start_time': '', 'end_time': '', 'attempts': 0, 'error': ''}
+               for code in stock_list}
+    progress = tqdm(total=len(stock_list), desc=f"下载历史数据", ncols=100, colour="green") if process_bar else None
+    lock = threading.Lock()
+
+    def run_chunk(chunk: list):
+        shown = [0]
+
+        def advance(target: int):
+            # 各分块的进度累计到同一个进度条，只增不减
+            if progress is None:
+                return
+            with lock:
+                if target > shown[0]:
+                    progress.update(target - shown[0])
+                    shown[0] = target
+
+        pending = chunk
+        for attempt in range(retries + 1):
+            resolved = len(chunk) - len(pending)
+
+            def on_progress(data: dict):
+                advance(min(len(chunk), resolved + int(data.get('finished', 0))))
+
+            for code in pending:
+                results[code]['attempts'] += 1
+            try:
+                coverage = _download_chunk(pending, period, start_time, end_time, on_progress)
+                state, error = 'failed', '未返回该股票的下载状态'
+                if coverage is None:
+                    coverage, state, error = {}, 'unknown', '未返回下载状态'
+            except Exception as e:
+                coverage, state, error = {}, 'failed', str(e)
+            failed = []
+            for code in pending:
+                if code in coverage:
+                    covered = coverage[code] or ('', '')
+                    results[code].update(ok=True, status='ok', start_time=covered[0], end_time=covered[1], error='')
+                else:
+                    results[code].update(status=state, error=error)
+                    # 状态未知时下载调用本身已正常结束，重试只会重复下载，只重试明确失败的股票
+                    if state == 'failed':
+                        failed.append(code)
+            advance(len(chunk) - len(failed))
+            if not failed:
+                return
+            pending = failed
+            if attempt < retries:
+                time.sleep(0.5 * 2 ** attempt)
+        advance(len(chunk))
+
+    chunks = [stock_list[start:start + chunk_size] for start in range(0, len(stock_list), chunk_size)]
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as pool:
+            list(pool.map(run_chunk, chunks))
+    finally:
+        if progress is not None:
+            progress.close()
+
+    if report:
+        return results
+    return all(item['status'] != 'failed' for item in results.values())
+
+def _last_closed_day(calendar) -> int:
+    """数据已经完整的最后一个交易日：当日收盘后为当日，否则为前一个交易日"""
+    now = datetime.now()
+    if calendar.is_trading_day(now) and now.time() >= MARKET_CLOSE:
+        return to_date_number(now)
+    return calendar.prev_trading_day(now)
+
+def sync_stock_history_data(stock_list: list, start_time: str, end_time: str = '', period: str = '1d',
+                            process_bar: bool = True, chunk_size: int = 500, workers: int = 1,
+                            retries: int = 2) -> dict:
     """
-    获取行情数据
+    增量下载股票历史K线数据
+    按已下载区间的索引和交易日历计算每只股票缺失的交易日区间，只下载缺失的部分，
+    缺失区间相同的股票合并为一批。下载后按请求的区间(xtdata返回了下载状态时合并其覆盖范围)更新索引，
+    明确失败的股票不更新，下次调用时重新下载。
+    收盘前的当日数据不完整，不记为已下载，下次调用时会再次下载
     Args:
-        stock_list: 股票列表
-        period: 周期
-        start_time: 开始时间
-        end_time: 结束时间
-        count: 数量
+        stock_list: 股票代码列表
+        start_time: 需要覆盖的开始日期
+        end_time: 需要覆盖的结束日期，默认为当日
+        period: 周期，'1d'为日线(默认)，'1m'为1分钟线
+        process_bar: 进度条显示，默认显示
+        chunk_size, workers, retries: 每批下载的分块配置，说明见download_stock_history_data
     Returns:
-        dict: 行情数据
+        dict: {'ok': 是否没有失败的股票, 'batches': [{'start_time', 'end_time', 'count'}]每批下载的区间和股票数,
+            'report': {股票代码: 下载报告}}，没有缺失的股票不出现在report中
     """
-    try:
-        dict_data = xtdata.get_market_data_ex(
+    if not stock_list:
+        raise ValueError(f"股票列表为空")
+
+    if not start_time:
+        raise ValueError(f"开始时间不能为空")
+
+    stock_list = add_stock_suffix_list(list(dict.fromkeys(stock_list)))
+    calendar = get_calendar()
+    index = _coverage()
+    trading_days = calendar.range(start_time, end_time or datetime.now())
+    closed_day = _last_closed_day(calendar)
+    groups = group_missing(trading_days, index.get(period, stock_list), stock_list)
+
+    batches = []
+    report = {}
+    for (first_day, last_day), batch in groups.items():
+        # 分钟线的结束时间需要包含当日的全部K线
+        end = str(last_day) if period == '1d' else f"{last_day}235959"
+        result = download_stock_history_data(batch, start_time=str(first_day), end_time=end, period=period,
+                                             process_bar=process_bar, chunk_size=chunk_size, workers=workers,
+                                             retries=retries, report=True)
+        batches.append({'start_time': str(first_day), 'end_time': str(last_day), 'count': len(batch)})
+
+        ranges = {}
+        for code in batch:
+            item = result[code]
+            if code in report and report[code]['status'] == 'failed':
+                report[code] = {**item, 'ok': False, 'status': 'failed'}
+            else:
+                report[code] = {**item, 'ok': report[code]['ok'] and item['ok']} if code in report else item
+            # 明确失败的股票不记为已下载，下次调用时重新下载；
+            # 状态未知时下载调用已正常结束(xtdata未提供各股票的结果)，按请求的区间记录
+            if item['status'] == 'failed':
+                continue
+            # 请求的区间已全部下载(停牌或未上市的日期本来就没有K线)，xtdata返回的覆盖范围可能更大
+            start_day, end_day = first_day, min(last_day, closed_day)
+            if item['start_time']:
+                start_day = min(start_day, int(item['start_time'][:8]))
+            if item['end_time']:
+                end_day = max(end_day, min(int(item['end_time'][:8]), closed_day))
+            if start_day <= end_day:
+                ranges[code] = (start_day, end_day)
+        # 每批完成后立即保存，中断后重新运行不会重复下载
+        index.update(period, ranges)
+
+    return {'ok': all(item['status'] != 'failed' for item in report.values()), 'batches': batches, 'report': report}
+
+def _get_market_data(stock_list: list, period: str, start_time: str = '', end_time: str = '', count: int = -1) -> dict:
+    """从xtdata获取行情数据"""
+    with phase('xtdata'):
+        return xtdata.get_market_data_ex(
             field_list=[],
-            stock_list=add_stock_suffix_list(stock_list),
+            stock_list=stock_list,
             period=period,
             start_time=start_time,
             end_time=end_time,
@@ -177,11 +389,150 @@ def get_daily_bars(stock_list: list, period: str = '1d', start_time: str = '', e
             fill_data=True
         )
 
-        # 清洗数据，价格字段保留两位小数
-        for stock in dict_data:
-            for field in dict_data[stock]:
-                if field in ['open', 'high', 'low', 'close', 'preClose']:
-                    dict_data[stock][field] = dict_data[stock][field].astype(float).round(2)
-        return dict_data
+def _get_tiered_bars(stock_list: list, period: str, start_time: str, end_time: str) -> dict:
+    """
+    分层获取行情数据：历史部分从本地库读取，库中没有的最近部分从xtdata补齐
+    查询区间完全在库内时不调用xtdata，QMT终端不可用时历史查询仍然可用
+    库中只有BAR_COLUMNS字段，xtdata部分也只保留这些字段，拼接后每只股票的字段一致
+    """
+    start = parse_time(start_time)
+    end = parse_time(end_time, end=True) or datetime.now()
+
+    with phase('history'):
+        coverage, history = _history_store.query(stock_list, period, start, end)
+
+    # 每只股票从库中最新K线之后开始补齐，起点相同的股票合并为一次xtdata调用，
+    # 库中没有的股票从查询的开始时间获取，已完全覆盖的股票不调用xtdata
+    step, fmt = (timedelta(days=1), '%Y%m%d') if period == '1d' else (timedelta(seconds=1), '%Y%m%d%H%M%S')
+    tails = defaultdict(list)
+    for stock in stock_list:
+        covered_until = coverage.get(stock)
+        if covered_until is not None and covered_until >= end:
+            continue
+        tail_start = start if covered_until is None else max(start, covered_until + step)
+        tails[tail_start.strftime(fmt)].append(stock)
+
+    recent = {}
+    for tail_start, tail_stocks in tails.items():
+        recent.update(_get_market_data(tail_stocks, period, tail_start, end_time))
+    recent = {stock: frame.reindex(columns=BAR_COLUMNS) for stock, frame in recent.items()}
+
+    # 拼接两部分数据，同一时间以库中数据为准
+    dict_data = {}
+    for stock in stock_list:
+        parts = [frame for frame in (history.get(stock), recent.get(stock)) if frame is not None and not frame.empty]
+        if len(parts) == 2:
+            parts[1] = parts[1][parts[1].index > parts[0].index[-1]]
+        if parts:
+            dict_data[stock] = pd.concat(parts) if len(parts) == 2 else parts[0]
+        elif stock in recent:
+            dict_data[stock] = recent[stock]
+    return dict_data
+
+# 需要保留两位小数的价格字段
+PRICE_FIELDS = ['open', 'high', 'low', 'close', 'preClose']
+
+def _clean_bars(frame: pd.DataFrame) -> pd.DataFrame:
+    """在拼接后的行情数据上一次性清洗：价格字段保留两位小数"""
+    fields = [field for field in PRICE_FIELDS if field in frame.columns]
+    if fields and len(frame):
+        frame[fields] = frame[fields].astype(float).round(2)
+    return frame
+
+# 获取行情数据
+def get_daily_bars(stock_list: list, period: str = '1d', start_time: str = '', end_time: str = '', count: int = -1,
+                   layout: str = 'dict'):
+    """
+    获取行情数据
+    设置了本地历史行情库(set_history_store)且按时间区间查询时，历史部分从库中读取，
+    只有库中没有的最近部分从xtdata获取，此时返回的字段为库中的字段(store.BAR_COLUMNS)；
+    库正在被写入而无法打开时全部从xtdata获取
+    Args:
+        stock_list: 股票列表
+        period: 周期
+        start_time: 开始时间
+        end_time: 结束时间
+        count: 数量
+        layout: 输出结构
+            'dict': {股票代码: DataFrame}(默认)
+            'long': 长表，code和datetime为普通列
+            'multiindex': (code, datetime)索引的DataFrame
+            'panel': {'fields', 'codes', 'index', 'values'}，values为字段×股票×时间的NumPy数组
+    Returns:
+        行情数据，结构由layout决定
+    """
+    if layout not in frames.LAYOUTS:
+        raise ValueError(f"无效的输出结构: {layout}，可选 {', '.join(frames.LAYOUTS)}")
+    try:
+        stock_list = add_stock_suffix_list(stock_list)
+        if _history_store is not None and _history_store.supports(period) and start_time and count == -1:
+            try:
+                dict_data = _get_tiered_bars(stock_list, period, start_time, end_time)
+            except HistoryStoreUnavailable as e:
+                logger.warning(f"历史行情库不可用，从xtdata获取: {e}")
+                dict_data = _get_market_data(stock_list, period, start_time, end_time, count)
+                dict_data = {stock: frame.reindex(columns=BAR_COLUMNS) for stock, frame in dict_data.items()}
+        else:
+            dict_data = _get_market_data(stock_list, period, start_time, end_time, count)
+
+        # 拼接为一张表后统一清洗，再按需要的结构输出
+        with phase('clean'):
+            combined = _clean_bars(frames.concat_bars(dict_data))
+            if layout == 'dict':
+                return frames.split_bars(combined, dict_data)
+            if layout == 'panel':
+                return frames.to_panel(combined)
+            return combined.reset_index() if layout == 'long' else combined
     except Exception as e:
         raise RuntimeError(f"获取行情数据失败: {e}")
+
+def _bar_digest(dict_data: dict, bar_time: int) -> str:
+    """计算所有股票在某一时间的K线摘要，用于判断该K线是否被修订"""
+    digest = hashlib.blake2b(digest_size=8)
+    for stock in sorted(dict_data):
+        frame = dict_data[stock]
+        rows = frame[frame['time'] == bar_time]
+        if not rows.empty:
+            digest.update(stock.encode('utf-8'))
+            digest.update(pd.util.hash_pandas_object(rows, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+# 增量获取行情数据
+def get_daily_bars_since(stock_list: list, period: str = '1d', cursor: str = '', start_time: str = '', count: int = -1) -> dict:
+    """
+    增量获取行情数据，只返回游标之后的新K线，以及被修订过的游标处K线(如盘中仍在变化的最新一根)
+    Args:
+        stock_list: 股票列表
+        period: 周期
+        cursor: 上次调用返回的游标，为空时按start_time/count返回全部数据
+        start_time: 首次调用的开始时间
+        count: 首次调用的数量
+    Returns:
+        dict: {'cursor': 新的游标, 'data': {股票代码: 新增或修订的K线}}，没有变化时data为空
+    """
+    if not cursor:
+        dict_data = get_daily_bars(stock_list, period, start_time=start_time, count=count)
+        since, since_digest = None, ''
+    else:
+        try:
+            since, since_digest = str(cursor).split(':', 1)
+            since = int(since)
+        except ValueError:
+            raise ValueError(f"无效的游标: {cursor}")
+        # 游标为UTC毫秒时间戳，按北京时间换算为xtdata的开始时间
+        fmt = '%Y%m%d' if period == '1d' else '%Y%m%d%H%M%S'
+        dict_data = get_daily_bars(stock_list, period, start_time=from_local_ms(since + LOCAL_OFFSET_MS).strftime(fmt))
+
+    last_times = [int(frame['time'].iloc[-1]) for frame in dict_data.values() if not frame.empty]
+    if not last_times:
+        return {'cursor': cursor, 'data': {}}
+    last_time = max(last_times)
+    next_cursor = f'{last_time}:{_bar_digest(dict_data, last_time)}'
+
+    if since is not None:
+        # 游标处的K线没有变化时不再返回
+        revised = _bar_digest(dict_data, since) != since_digest
+        dict_data = {stock: frame[(frame['time'] > since) | ((frame['time'] == since) & revised)]
+                     for stock, frame in dict_data.items()}
+        dict_data = {stock: frame for stock, frame in dict_data.items() if not frame.empty}
+    return {'cursor': next_cursor, 'data': dict_data}
@@ -0,0 +1,92 @@
+"""
+接口执行器模块
+为每个接口函数提供独立的有界线程池，避免阻塞调用占用事件循环
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+class ExecutorBusyError(Exception):
+    """执行器排队已满时抛出的异常"""
+
+
+class FunctionExecutor:
+    """单个接口函数的有界执行器
+
+    每个函数独占一个线程池，最多同时执行 max_concurrency 个调用，
+    另有最多 max_queue 个调用排队等待，超出时直接拒绝。
+    不同函数之间互不影响，耗时的下载任务不会占用查询接口的线程。
+    """
+
+    def __init__(self, name: str, max_concurrency: int = 4, max_queue: int = 64):
+        """初始化执行器
+        Args:
+            name: 接口函数名称，用于线程命名
+            max_concurrency: 最大并发执行数
+            max_queue: 最大排队数
+        """
+        if max_concurrency < 1:
+            raise ValueError("最大并发数必须大于0")
+        if max_queue < 0:
+            raise ValueError("最大排队数不能小于0")
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f'qka-{name}')
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        """正在执行和排队中的调用数"""
+        return self._pending
+
+    def _release(self, future):
+        """调用结束(包括被取消)时释放占用的名额"""
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn: Callable, *args, queue_timeout: Optional[float] = None, **kwargs) -> Any:
+        """在线程池中执行阻塞调用
+        Args:
+            fn: 要执行的函数
+            *args, **kwargs: 函数参数
+            queue_timeout: 最长排队时间(秒)，超时仍未开始执行的调用被取消，为None时不限制
+        Returns:
+            函数返回值
+        Raises:
+            ExecutorBusyError: 执行和排队的调用数已达上限，或排队超时
+        """
+        with self._lock:
+            if self._pending >= self.max_concurrency + self.max_queue:
+                raise ExecutorBusyError(f"{self.name} 排队已满，请稍后重试")
+            self._pending += 1
+        loop = asyncio.get_running_loop()
+        started = loop.create_future()
+
+        def call():
+            # 开始执行时通知事件循环，排队等待到此结束
+            loop.call_soon_threadsafe(lambda: started.done() or started.set_result(None))
+            return fn(*args, **kwargs)
+
+        try:
+            future = self.pool.submit(call)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        if queue_timeout is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(started), queue_timeout)
+            except asyncio.TimeoutError:
+                # 仍在排队时取消；恰好已开始执行时继续等待结果
+                if future.cancel():
+                    raise ExecutorBusyError(f"{self.name} 排队超时，请稍后重试")
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self, wait: bool = False):
+        """关闭线程池"""
+        self.pool.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,216 @@
+"""
+行情数据类型化模块
+把接口返回的{股票代码: DataFrame}转换为时间索引、指定精度的DataFrame或NumPy结构化数组，
+或者整理为长表、(股票代码, 时间)索引的DataFrame、字段×股票×时间的NumPy面板
+"""
+
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+# xtdata的time列为UTC毫秒时间戳，转换为北京时间需要加上的偏移
+BEIJING_OFFSET = pd.Timedelta(hours=8)
+
+# 类型化后时间索引的名称
+INDEX_NAME = 'datetime'
+
+# 合并后股票代码所在的列名或索引层名
+CODE_LEVEL = 'code'
+
+# 行情数据的输出结构
+LAYOUTS = ('dict', 'long', 'multiindex', 'panel')
+
+# 字符串索引的时间格式，按长度区分
+_INDEX_FORMATS = {8: '%Y%m%d', 14: '%Y%m%d%H%M%S'}
+
+
+class BarFormat:
+    """行情数据的类型化选项
+
+    所有转换都按列进行，不逐行构造对象。
+    """
+
+    def __init__(self, datetime_index: bool = True, float_dtype: Optional[str] = None,
+                 downcast: bool = False, structured: bool = False):
+        """初始化类型化选项
+        Args:
+            datetime_index: 是否把索引转换为datetime64(北京时间)
+            float_dtype: 浮点列的类型，如'float32'，为None时保持float64
+            downcast: 是否把数值列压缩为能容纳数据的最小类型(整数列和浮点列都会压缩)
+            structured: 为True时返回NumPy结构化数组而不是DataFrame，索引作为第一个字段
+        """
+        if float_dtype is not None and np.dtype(float_dtype).kind != 'f':
+            raise ValueError(f"无效的浮点类型: {float_dtype}")
+        self.datetime_index = datetime_index
+        self.float_dtype = float_dtype
+        self.downcast = downcast
+        self.structured = structured
+
+
+def to_datetime_index(frame: pd.DataFrame) -> pd.DatetimeIndex:
+    """
+    生成行情数据的datetime64索引(北京时间)
+    有time列时按UTC毫秒时间戳换算，否则解析xtdata格式的字符串索引
+    """
+    if 'time' in frame.columns:
+        index = pd.to_datetime(frame['time'].to_numpy(), unit='ms') + BEIJING_OFFSET
+    elif isinstance(frame.index, pd.DatetimeIndex):
+        index = frame.index
+    else:
+        values = frame.index.astype(str)
+        fmt = _INDEX_FORMATS.get(len(values[0])) if len(values) else None
+        index = pd.to_datetime(values, format=fmt)
+    return pd.DatetimeIndex(index, name=INDEX_NAME)
+
+
+def type_frame(frame: pd.DataFrame, bar_format: BarFormat) -> Any:
+    """
+    按类型化选项转换单只股票的行情数据
+    Args:
+        frame: 行情数据
+        bar_format: 类型化选项
+    Returns:
+        DataFrame或NumPy结构化数组
+    """
+    columns = {}
+    for name in frame.columns:
+        values = frame[name]
+        kind = values.dtype.kind
+        # time列是索引的来源，保持int64
+        if name != 'time':
+            if kind == 'f' and bar_format.float_dtype is not None:
+                values = values.astype(bar_format.float_dtype)
+            if bar_format.downcast and kind in 'fiu':
+                values = pd.to_numeric(values, downcast='float' if kind == 'f' else 'integer')
+        columns[name] = values.to_numpy()
+    index = to_datetime_index(frame) if bar_format.datetime_index else frame.index
+
+    if bar_format.structured:
+        index_values = index.to_numpy() if bar_format.datetime_index else np.asarray(index.astype(str))
+        arrays = [index_values] + list(columns.values())
+        return np.rec.fromarrays(arrays, names=[INDEX_NAME if bar_format.datetime_index else 'index']
+                                 + [str(name) for name in columns])
+    return pd.DataFrame(columns, index=index)
+
+
+def materialize(data: Dict[str, Any], bar_format: Optional[BarFormat]) -> Dict[str, Any]:
+    """
+    按类型化选项转换{股票代码: DataFrame}，非DataFrame的值原样保留
+    Args:
+        data: 接口返回的行情数据
+        bar_format: 类型化选项，为None时原样返回
+    Returns:
+        dict: 转换后的行情数据
+    """
+    if bar_format is None or not isinstance(data, dict):
+        return data
+    return {code: type_frame(frame, bar_format) if isinstance(frame, pd.DataFrame) else frame
+            for code, frame in data.items()}
+
+
+def concat_bars(data: Dict[str, Any]) -> pd.DataFrame:
+    """
+    把{股票代码: DataFrame}按原有顺序拼接为(股票代码, 时间)索引的DataFrame
+    Args:
+        data: 行情数据，非DataFrame的值被忽略
+    Returns:
+        DataFrame: 索引层名为('code', 'datetime')
+    """
+    frames = {code: frame for code, frame in data.items() if isinstance(frame, pd.DataFrame)}
+    if not frames:
+        index = pd.MultiIndex.from_arrays([[], []], names=[CODE_LEVEL, INDEX_NAME])
+        return pd.DataFrame(index=index)
+    return pd.concat(list(frames.values()), keys=list(frames), names=[CODE_LEVEL, INDEX_NAME], sort=False)
+
+
+def _widened_columns(frame: pd.DataFrame, originals: List[pd.DataFrame]) -> set:
+    """拼接后可能由整数或布尔类型变为其他类型的列"""
+    candidates = {column for column, dtype in frame.dtypes.items() if dtype.kind not in 'iub'}
+    if not candidates or not originals:
+        return set()
+    # 各股票的列相同且都有数据时，拼接结果与第一只股票的类型一致说明没有列被转换
+    first = originals[0]
+    if all(len(item) and item.columns.equals(first.columns) for item in originals):
+        first_dtypes = first.dtypes
+        if all(first_dtypes[column] == frame[column].dtype for column in candidates):
+            return set()
+    return candidates
+
+
+def split_bars(frame: pd.DataFrame, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    把concat_bars拼接的DataFrame按原有的股票、索引和列拆分回{股票代码: DataFrame}
+    各股票的列不完全相同时，拼接会把缺少该列的位置填为NaN，整数和布尔列随之变为float或object，
+    拆分后恢复为原来的类型
+    Args:
+        frame: concat_bars的结果(可以修改过列的值)
+        data: 拼接前的行情数据
+    Returns:
+        dict: 与data结构相同的行情数据
+    """
+    widened = _widened_columns(frame, [item for item in data.values() if isinstance(item, pd.DataFrame)])
+    result = {}
+    offset = 0
+    for code, original in data.items():
+        if not isinstance(original, pd.DataFrame):
+            result[code] = original
+            continue
+        end = offset + len(original)
+        # 按行切片共享整块数据，浅拷贝后作为独立的DataFrame返回
+        part = frame.iloc[offset:end].copy(deep=False)
+        part.index = original.index
+        if not part.columns.equals(original.columns):
+            part = part[original.columns]
+        if widened:
+            restore = {column: dtype for column, dtype in original.dtypes.items()
+                       if column in widened and dtype.kind in 'iub' and not part[column].isna().any()}
+            if restore:
+                part = part.astype(restore)
+        result[code] = part
+        offset = end
+    return result
+
+
+def to_panel(frame: pd.DataFrame, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    把concat_bars拼接的行情数据整理为字段×股票×时间的NumPy面板，缺失的位置为NaN
+    Args:
+        frame: (股票代码, 时间)索引的DataFrame
+        fields: 面板包含的字段，默认为除time外的全部数值列
+    Returns:
+        dict: {'fields': 字段列表, 'codes': 股票代码列表, 'index': 排序后的时间数组,
+            'values': 形状为(字段数, 股票数, 时间数)的float64数组}
+    """
+    if fields is None:
+        fields = [column for column in frame.columns
+                  if column != 'time' and frame[column].dtype.kind in 'fiub']
+    # 股票位置直接取自索引的层编码，没有数据的股票也保留在面板中
+    codes = frame.index.levels[0].tolist()
+    index, time_positions = np.unique(frame.index.get_level_values(1).to_numpy(), return_inverse=True)
+    values = np.full((len(fields), len(codes), len(index)), np.nan)
+    if len(frame):
+        values[:, frame.index.codes[0], time_positions] = frame[fields].to_numpy(dtype=np.float64).T
+    return {'fields': list(fields), 'codes': codes, 'index': index, 'values': values}
+
+
+def to_layout(data: Dict[str, Any], layout: str = 'dict') -> Any:
+    """
+    按输出结构整理行情数据
+    Args:
+        data: {股票代码: DataFrame}
+        layout: 输出结构
+            'dict': 原样返回{股票代码: DataFrame}(默认)
+            'long': 长表，code和datetime为普通列
+            'multiindex': (code, datetime)索引的DataFrame
+            'panel': 字段×股票×时间的NumPy面板，结构见to_panel
+    Returns:
+        整理后的行情数据
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"无效的输出结构: {layout}，可选 {', '.join(LAYOUTS)}")
+    if layout == 'dict':
+        return data
+    frame = concat_bars(data)
+    if layout == 'panel':
+        return to_panel(frame)
+    return frame.reset_index() if layout == 'long' else frame
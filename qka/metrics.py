@@ -0,0 +1,183 @@
+"""
+服务指标模块
+按接口和阶段统计耗时、响应大小、并发数和错误数，以Prometheus文本格式输出
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# 耗时直方图的分桶上限(秒)
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# 响应大小直方图的分桶上限(字节)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864, 268435456)
+
+# 当前线程正在统计的请求，供data模块中的phase()使用
+_local = threading.local()
+
+
+class RequestTiming:
+    """单个请求各阶段的耗时"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: 'OrderedDict[str, float]' = OrderedDict()
+        self.notes: List[str] = []
+
+    def add(self, name: str, seconds: float):
+        """累加一个阶段的耗时"""
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextmanager
+    def measure(self, name: str):
+        """统计with语句块的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def elapsed(self) -> float:
+        """请求开始至今的耗时(秒)"""
+        return time.perf_counter() - self.start
+
+    def server_timing(self) -> str:
+        """生成Server-Timing响应头，耗时单位为毫秒"""
+        items = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in self.phases.items()]
+        items.extend(self.notes)
+        items.append(f'total;dur={self.elapsed() * 1000:.2f}')
+        return ', '.join(items)
+
+
+@contextmanager
+def activate(timing: RequestTiming):
+    """在当前线程中启用请求耗时统计"""
+    previous = getattr(_local, 'timing', None)
+    _local.timing = timing
+    try:
+        yield timing
+    finally:
+        _local.timing = previous
+
+
+@contextmanager
+def phase(name: str):
+    """
+    统计当前请求中一个阶段的耗时
+    没有启用统计时(如直接调用data模块)不做任何事
+    """
+    timing = getattr(_local, 'timing', None)
+    if timing is None:
+        yield
+        return
+    with timing.measure(name):
+        yield
+
+
+class Histogram:
+    """累计分桶直方图"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> List[str]:
+        """输出Prometheus文本格式的各行"""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+def _escape(value: str) -> str:
+    """转义Prometheus标签值"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """服务指标统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations: Dict[Tuple[str, str], Histogram] = {}
+        self.sizes: Dict[str, Histogram] = {}
+        self.in_flight: Dict[str, int] = {}
+        self.requests: Dict[Tuple[str, int], int] = {}
+        self.errors: Dict[Tuple[str, int], int] = {}
+
+    def begin(self, endpoint: str):
+        """请求开始"""
+        with self._lock:
+            self.in_flight[endpoint] = self.in_flight.get(endpoint, 0) + 1
+
+    def end(self, endpoint: str, status: int, timing: RequestTiming, size: Optional[int] = None):
+        """
+        请求结束，记录各阶段耗时、响应大小和状态
+        Args:
+            endpoint: 接口名称
+            status: HTTP状态码
+            timing: 请求耗时
+            size: 响应字节数，流式响应等无法确定时为None
+        """
+        total = timing.elapsed()
+        with self._lock:
+            self.in_flight[endpoint] -= 1
+            for name, seconds in list(timing.phases.items()) + [('total', total)]:
+                key = (endpoint, name)
+                if key not in self.durations:
+                    self.durations[key] = Histogram(DURATION_BUCKETS)
+                self.durations[key].observe(seconds)
+            if size is not None:
+                if endpoint not in self.sizes:
+                    self.sizes[endpoint] = Histogram(SIZE_BUCKETS)
+                self.sizes[endpoint].observe(size)
+            key = (endpoint, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            if status >= 400:
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+    def render(self) -> str:
+        """以Prometheus文本格式输出全部指标"""
+        lines = []
+        with self._lock:
+            lines.append('# HELP qka_request_duration_seconds 请求各阶段耗时')
+            lines.append('# TYPE qka_request_duration_seconds histogram')
+            for (endpoint, name), histogram in sorted(self.durations.items()):
+                labels = f'endpoint="{_escape(endpoint)}",phase="{_escape(name)}"'
+                lines.extend(histogram.render('qka_request_duration_seconds', labels))
+
+            lines.append('# HELP qka_response_size_bytes 响应大小')
+            lines.append('# TYPE qka_response_size_bytes histogram')
+            for endpoint, histogram in sorted(self.sizes.items()):
+                lines.extend(histogram.render('qka_response_size_bytes', f'endpoint="{_escape(endpoint)}"'))
+
+            lines.append('# HELP qka_requests_in_flight 正在处理的请求数')
+            lines.append('# TYPE qka_requests_in_flight gauge')
+            for endpoint, count in sorted(self.in_flight.items()):
+                lines.append(f'qka_requests_in_flight{{endpoint="{_escape(endpoint)}"}} {count}')
+
+            lines.append('# HELP qka_requests_total 请求总数')
+            lines.append('# TYPE qka_requests_total counter')
+            for (endpoint, status), count in sorted(self.requests.items()):
+                lines.append(f'qka_requests_total{{endpoint="{_escape(endpoint)}",status="{status}"}} {count}')
+
+            lines.append('# HELP qka_request_errors_total 错误请求数')
+            lines.append('# TYPE qka_request_errors_total counter')
+            for (endpoint, status), count in sorted(self.errors.items()):
+                lines.append(f'qka_request_errors_total{{endpoint="{_escape(endpoint)}",status="{status}"}} {count}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,142 @@
+"""
+行情推送模块
+将xtdata的行情订阅通过WebSocket分发给远程客户端
+"""
+
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, Set, Tuple
+from xtquant import xtdata
+from qka.codes import EXCHANGES, add_stock_suffix
+
+# 订阅全推行情(subscribe_whole_quote)时使用的周期名称
+WHOLE_QUOTE_PERIOD = 'whole'
+
+
+def normalize_quote_code(code: str, period: str) -> str:
+    """
+    将订阅的代码统一为带后缀的格式
+    全推行情还可以按市场订阅，市场代码(如'SH'/'SZ')表示订阅该市场的全部股票
+    Args:
+        code: 股票代码或市场代码
+        period: 周期
+    Returns:
+        str: 带后缀的股票代码，或大写的市场代码
+    Raises:
+        ValueError: 代码无效
+    """
+    if period == WHOLE_QUOTE_PERIOD and code.upper() in EXCHANGES:
+        return code.upper()
+    return add_stock_suffix(code)
+
+
+class QuoteSubscriber:
+    """单个下游客户端的发送队列
+
+    队列按(股票代码, 周期)合并：客户端处理不及时、同一代码有未发送的数据时，
+    用最新数据覆盖旧数据，而不是无限堆积或阻塞行情回调。
+    """
+
+    def __init__(self):
+        self.subscriptions: Set[Tuple[str, str]] = set()
+        self.pending: 'OrderedDict[Tuple[str, str], Any]' = OrderedDict()
+        self.dropped = 0
+        self._ready = asyncio.Event()
+
+    def push(self, code: str, period: str, data: Any):
+        """放入一条行情，只在事件循环线程中调用"""
+        key = (code, period)
+        if key in self.pending:
+            self.dropped += 1
+        self.pending[key] = data
+        self._ready.set()
+
+    async def get(self) -> Tuple[str, str, Any]:
+        """取出最早放入的一条行情，队列为空时等待
+        Returns:
+            tuple: (股票代码, 周期, 行情数据)
+        """
+        while not self.pending:
+            self._ready.clear()
+            await self._ready.wait()
+        (code, period), data = self.pending.popitem(last=False)
+        return code, period, data
+
+
+class QuoteHub:
+    """行情订阅中心
+
+    每个(股票代码, 周期)只向xtdata订阅一次，由所有下游客户端共享，
+    最后一个客户端退订时取消上游订阅。
+    xtdata的回调在其自身线程中执行，只负责把数据转交给事件循环，不做任何阻塞操作。
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.upstream: Dict[Tuple[str, str], int] = {}
+        self.subscribers: Dict[Tuple[str, str], Set[QuoteSubscriber]] = {}
+        self._lock = None
+
+    def _callback(self, period: str):
+        """创建xtdata回调，在回调线程中把数据转交给事件循环"""
+        def on_data(datas):
+            self.loop.call_soon_threadsafe(self._dispatch, period, datas)
+        return on_data
+
+    def _dispatch(self, period: str, datas: dict):
+        """在事件循环中把行情分发给订阅了该代码或该代码所在市场的客户端"""
+        for code, data in datas.items():
+            for subscriber in self.subscribers.get((code, period), ()):
+                subscriber.push(code, period, data)
+            if period == WHOLE_QUOTE_PERIOD:
+                market = code.rpartition('.')[2]
+                for subscriber in self.subscribers.get((market, period), ()):
+                    subscriber.push(code, period, data)
+
+    def _subscribe_upstream(self, code: str, period: str) -> int:
+        """向xtdata订阅行情，返回订阅号"""
+        if period == WHOLE_QUOTE_PERIOD:
+            return xtdata.subscribe_whole_quote([code], callback=self._callback(period))
+        return xtdata.subscribe_quote(code, period=period, count=0, callback=self._callback(period))
+
+    async def subscribe(self, subscriber: QuoteSubscriber, code: str, period: str):
+        """为客户端订阅行情，必要时建立上游订阅
+        Args:
+            subscriber: 客户端发送队列
+            code: 股票代码，全推行情还可以是市场代码如'SH'/'SZ'
+            period: 周期，如'tick'/'1m'/'1d'，或'whole'表示全推行情
+        """
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+            self._lock = asyncio.Lock()
+        key = (code, period)
+        async with self._lock:
+            if key not in self.upstream:
+                seq = await self.loop.run_in_executor(None, self._subscribe_upstream, code, period)
+                if seq is None or seq < 0:
+                    raise RuntimeError(f"订阅行情失败: {code} {period}")
+                self.upstream[key] = seq
+                self.subscribers[key] = set()
+            self.subscribers[key].add(subscriber)
+            subscriber.subscriptions.add(key)
+
+    async def unsubscribe(self, subscriber: QuoteSubscriber, code: str, period: str):
+        """取消客户端的订阅，没有客户端订阅时取消上游订阅"""
+        if self._lock is None:
+            return
+        key = (code, period)
+        async with self._lock:
+            subscriber.subscriptions.discard(key)
+            subscribers = self.subscribers.get(key)
+            if subscribers is None:
+                return
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.subscribers[key]
+                seq = self.upstream.pop(key)
+                await self.loop.run_in_executor(None, xtdata.unsubscribe_quote, seq)
+
+    async def remove(self, subscriber: QuoteSubscriber):
+        """客户端断开时取消其全部订阅"""
+        for code, period in list(subscriber.subscriptions):
+            await self.unsubscribe(subscriber, code, period)
@@ -1,27 +1,106 @@
-from fastapi import FastAPI, HTTPException, Header, Depends
+from fastapi import FastAPI, HTTPException, Header, Depends, Response, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
+import asyncio
 import inspect
-from typing import Any, Optional, List
+from typing import Any, Optional, List, Dict, Tuple
 import uvicorn
 import uuid
 import hashlib
-import pandas as pd
-from qka import data
+from qka import data, codec
+from qka.executor import FunctionExecutor, ExecutorBusyError
+from qka.cache import ResultCache, make_key, touches_today
+from qka.quote import QuoteHub, QuoteSubscriber, normalize_quote_code
+from qka.metrics import Metrics, RequestTiming, activate
+from qka.store import HistoryStore
+from qka.singleflight import SingleFlight
+from qka.admission import AdmissionController, AdmissionRejected, Lane
+
+# 接口默认的(最大并发数, 最大排队数)
+DEFAULT_LIMIT = (4, 64)
+# 耗时较长的接口单独限流，避免占满线程
+DEFAULT_LIMITS = {
+    'download_stock_history_data': (1, 4),
+    'sync_stock_history_data': (1, 4),
+}
+
+# 启用结果缓存的接口
+CACHED_FUNCTIONS = {'get_daily_bars'}
+# 调用后需要使对应缓存失效的接口
+INVALIDATING_FUNCTIONS = {'download_stock_history_data', 'sync_stock_history_data'}
+# 提供分片流式端点的接口，需接收stock_list参数并返回{股票代码: DataFrame}
+STREAMED_FUNCTIONS = {'get_daily_bars'}
+# 流式端点默认每个分片的股票数量
+DEFAULT_SHARD_SIZE = 100
+# 批量调用端点单次最多包含的调用数
+MAX_BATCH_SIZE = 100
+
+# 默认的优先级通道，{通道名: (最大并发数, 最大排队数, 最长排队时间(秒))}
+# trading通道服务盘中查询，排队时间短；bulk通道服务批量回补，并发少、允许长时间排队
+DEFAULT_LANES = {
+    'trading': (16, 64, 2.0),
+    'bulk': (2, 16, 60.0),
+}
+# 未指定通道时使用的通道
+DEFAULT_LANE = 'trading'
+# 默认进入bulk通道的接口
+FUNCTION_LANES = {
+    'download_stock_history_data': 'bulk',
+    'sync_stock_history_data': 'bulk',
+}
+
+
+class BatchCall(BaseModel):
+    """批量调用中的单个调用"""
+    method: str
+    params: Dict[str, Any] = {}
 
 
 class QMTDataServer:
     """QMT数据服务服务器，提供数据获取和处理功能的API接口"""
     
-    def __init__(self, host: str = "0.0.0.0", port: int = 8000, token: str = None):
+    def __init__(self, host: str = "0.0.0.0", port: int = 8000, token: str = None,
+                 limits: Optional[Dict[str, Tuple[int, int]]] = None,
+                 cache_size: int = 256 * 1024 * 1024, cache_ttl: float = 5.0,
+                 compress_min_size: Optional[int] = 4096, history_db: Optional[str] = None,
+                 lanes: Optional[Dict[str, Tuple[int, int, float]]] = None,
+                 lane_tokens: Optional[Dict[str, str]] = None,
+                 history_tables: Optional[Dict[str, str]] = None,
+                 cache_history_ttl: Optional[float] = 600.0):
         """初始化数据服务器
         Args:
             host: 服务器地址，默认0.0.0.0
             port: 服务器端口，默认8000
             token: 可选的自定义token
+            limits: 可选的接口限流配置，{接口名: (最大并发数, 最大排队数)}，
+                未配置的接口使用DEFAULT_LIMIT
+            cache_size: 行情结果缓存的最大字节数，为0时不启用缓存
+            cache_ttl: 包含当日数据的缓存条目有效期(秒)
+            compress_min_size: 响应压缩的最小字节数，小于该值的响应不压缩，为None时不压缩
+            history_db: 可选的DuckDB历史行情库路径，设置后历史行情从库中读取，只有最近部分从xtdata获取
+            lanes: 可选的优先级通道配置，{通道名: (最大并发数, 最大排队数, 最长排队时间)}，
+                与DEFAULT_LANES合并
+            lane_tokens: 可选的额外token，{token: 通道名}，使用这些token的请求固定进入对应通道
+            history_tables: 历史行情库中周期与表名的对应关系，如{'1m': 'daily_1min', '1d': 'daily_1d'}，
+                默认为store.DEFAULT_TABLES
+            cache_history_ttl: 历史区间缓存条目的有效期(秒)，其他进程写入的数据最迟在此时间后可见，
+                为None时永不过期
         """
         self.host = host
         self.port = port
         self.app = FastAPI()
+        self.limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.executors: Dict[str, FunctionExecutor] = {}
+        self.functions: Dict[str, Tuple[Any, Any]] = {}  # {接口名: (函数, 请求模型)}
+        self.cache = ResultCache(cache_size, cache_ttl, cache_history_ttl) if cache_size > 0 else None
+        self.quote_hub = QuoteHub()
+        self.metrics = Metrics()
+        self.singleflight = SingleFlight()
+        self.admission = AdmissionController({**DEFAULT_LANES, **(lanes or {})}, DEFAULT_LANE,
+                                             FUNCTION_LANES, lane_tokens)
+        self.compress_min_size = compress_min_size
+        if history_db:
+            data.set_history_store(HistoryStore(history_db, history_tables))
         self.token = token if token else self.generate_token()  # 使用自定义token或生成固定token
         print(f"\n授权Token: {self.token}\n")  # 打印token供客户端使用
 
@@ -37,42 +116,149 @@ class QMTDataServer:
 
     async def verify_token(self, x_token: str = Header(...)):
         """验证token的依赖函数"""
-        if x_token != self.token:
+        if x_token != self.token and x_token not in self.admission.token_lanes:
             raise HTTPException(status_code=401, detail="无效的Token")
         return x_token
 
+    def select_lane(self, func_name: str, token: str, x_lane: Optional[str]) -> Lane:
+        """确定请求所属的优先级通道，请求头X-Lane指定的通道不存在时返回400"""
+        try:
+            return self.admission.select(func_name, token, x_lane)
+        except KeyError as e:
+            raise HTTPException(status_code=400, detail=str(e.args[0]))
+
+    def rejected(self, error: AdmissionRejected) -> HTTPException:
+        """通道过载时返回429，附带建议的重试间隔"""
+        return HTTPException(status_code=429, detail=str(error),
+                             headers={'Retry-After': str(int(error.retry_after))})
+
+    async def run_admitted(self, lane: Lane, executor: FunctionExecutor, fn, *args):
+        """在通道中占用名额后，在接口执行器中执行调用
+        在执行器中排队的时间同样受通道最长排队时间限制，执行器排队已满或超时与通道过载一样返回429
+        """
+        async with self.admission.admit(lane):
+            try:
+                return await executor.run(fn, *args, queue_timeout=lane.queue_timeout)
+            except ExecutorBusyError as e:
+                lane.rejected += 1
+                raise AdmissionRejected(str(e), retry_after=max(lane.queue_timeout, 1.0))
+
     def convert_to_dict(self, obj):
-        """将结果转换为可序列化的字典"""
-        # 如果是基本类型，直接返回
-        if isinstance(obj, (int, float, str, bool, type(None))):
-            return obj
-        # 如果已经是字典类型，递归转换值
-        elif isinstance(obj, dict):
-            return {k: self.convert_to_dict(v) for k, v in obj.items()}
-        # 如果是列表或元组，递归转换每个元素
-        elif isinstance(obj, (list, tuple)):
-            return [self.convert_to_dict(item) for item in obj]
-        # 如果是pandas Series，转换为列表
-        elif isinstance(obj, pd.Series):
-            return obj.tolist()
-        # 如果是pandas DataFrame，转换为字典列表
-        elif isinstance(obj, pd.DataFrame):
-            return obj.to_dict('records')
-        # 如果是自定义对象，获取所有公开属性
-        elif hasattr(obj, '__dir__'):
-            attrs = obj.__dir__()
-            # 过滤掉内部属性和方法
-            public_attrs = {attr: self.convert_to_dict(getattr(obj, attr)) 
-                           for attr in attrs 
-                           if not attr.startswith('_') and not callable(getattr(obj, attr))}
-            return public_attrs
-        # 其他类型直接返回字符串
-        return str(obj)
+        """将结果转换为可序列化的结构，pandas/numpy对象按列编码，详见codec.to_jsonable"""
+        return codec.to_jsonable(obj)
 
-    def convert_function_to_endpoint(self, func_name: str, func):
-        """将 data 模块中的函数转换为 FastAPI 端点"""
+    def build_response(self, result, accept: Optional[str] = None, timing: Optional[RequestTiming] = None):
+        """根据Accept头协商响应格式
+        Args:
+            result: 接口函数的返回值
+            accept: 请求头中的Accept值
+            timing: 可选的请求耗时统计，记录序列化(serialize)和编码(encode)阶段
+        Returns:
+            客户端接受Arrow且结果为pandas对象时返回Arrow IPC流，否则返回JSON
+        """
+        timing = timing or RequestTiming()
+        if codec.accepts_arrow(accept) and codec.is_arrow_encodable(result):
+            try:
+                with timing.measure('encode'):
+                    return Response(content=codec.encode_arrow(result),
+                                    media_type=codec.ARROW_STREAM_MEDIA_TYPE)
+            except Exception:
+                # 无法转换为Arrow的数据(如混合类型列)回退为JSON
+                pass
+        # 在构造响应时完成编码，使序列化与接口函数在同一工作线程中执行
+        with timing.measure('serialize'):
+            content = {'success': True, 'data': self.convert_to_dict(result)}
+        with timing.measure('encode'):
+            return self.json_response(content)
+
+    def json_response(self, content) -> Response:
+        """使用codec.dumps编码JSON响应，数值列直接从numpy数组写出"""
+        return Response(content=codec.dumps(content), media_type='application/json')
+
+    def negotiate_encoding(self, accept_encoding: Optional[str]) -> Optional[str]:
+        """根据Accept-Encoding选择压缩编码，未启用压缩时返回None"""
+        if self.compress_min_size is None:
+            return None
+        return codec.negotiate_encoding(accept_encoding)
+
+    def compress_response(self, response: Response, encoding: Optional[str],
+                          timing: Optional[RequestTiming] = None) -> Response:
+        """按协商的编码压缩响应，应在工作线程中调用
+        Args:
+            response: 未压缩的响应
+            encoding: negotiate_encoding选择的编码
+            timing: 可选的请求耗时统计，记录压缩(compress)阶段
+        Returns:
+            压缩后的响应，不需要压缩时原样返回
+        """
+        if encoding is None or len(response.body) < self.compress_min_size:
+            return response
+        timing = timing or RequestTiming()
+        with timing.measure('compress'):
+            body = codec.compress(response.body, encoding)
+        return Response(content=body, status_code=response.status_code, media_type=response.media_type,
+                        headers={'Content-Encoding': encoding, 'Vary': 'Accept-Encoding'})
+
+    def get_executor(self, func_name: str) -> FunctionExecutor:
+        """获取接口对应的执行器，不存在时按限流配置创建"""
+        if func_name not in self.executors:
+            max_concurrency, max_queue = self.limits.get(func_name, DEFAULT_LIMIT)
+            self.executors[func_name] = FunctionExecutor(func_name, max_concurrency, max_queue)
+        return self.executors[func_name]
+
+    def normalize_codes(self, stock_list) -> List[str]:
+        """将参数中的股票代码统一为带后缀的格式，用于缓存标记"""
+        try:
+            return data.add_stock_suffix_list(list(stock_list or []))
+        except Exception:
+            return list(stock_list or [])
+
+    def cache_response(self, cache_key: str, params: dict, response: Response):
+        """将行情查询的响应写入缓存"""
+        headers = {name: response.headers[name] for name in ('Content-Encoding', 'Vary', 'ETag') if name in response.headers}
+        self.cache.put(
+            cache_key,
+            response.body,
+            response.media_type,
+            volatile=touches_today(params.get('start_time', ''), params.get('end_time', '')),
+            period=params.get('period', ''),
+            codes=self.normalize_codes(params.get('stock_list')),
+            headers=headers,
+        )
+
+    def make_etag(self, body: bytes) -> str:
+        """根据响应内容(压缩后)生成ETag，不同编码的响应各自对应不同的ETag"""
+        return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+    def etag_matches(self, if_none_match: Optional[str], etag: Optional[str]) -> bool:
+        """判断请求的If-None-Match是否与响应的ETag一致"""
+        if not if_none_match or not etag:
+            return False
+        if if_none_match.strip() == '*':
+            return True
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return etag in tags or f'W/{etag}' in tags
+
+    def not_modified(self, response: Response) -> Response:
+        """返回304，只保留缓存相关的响应头"""
+        headers = {name: response.headers[name] for name in ('ETag', 'Vary') if name in response.headers}
+        return Response(status_code=304, headers=headers)
+
+    def copy_response(self, response: Response) -> Response:
+        """复制合并请求共享的响应，每个请求单独设置Server-Timing等响应头"""
+        headers = {name: response.headers[name] for name in ('Content-Encoding', 'Vary', 'ETag') if name in response.headers}
+        return Response(content=response.body, status_code=response.status_code,
+                        media_type=response.media_type, headers=headers)
+
+    def invalidate_cache(self, params: dict) -> int:
+        """下载数据后使相关股票的缓存失效"""
+        if self.cache is None:
+            return 0
+        return self.cache.invalidate(params.get('period', '1d'), self.normalize_codes(params.get('stock_list')))
+
+    def build_request_model(self, func_name: str, func):
+        """根据函数签名创建动态的请求模型"""
         sig = inspect.signature(func)
-        param_names = list(sig.parameters.keys())
         
         # 创建动态的请求模型
         class_fields = {
@@ -91,19 +277,329 @@ class QMTDataServer:
             else:
                 class_fields[param_name] = None
 
-        RequestModel = type(f'{func_name}Request', (BaseModel,), class_fields)
+        return type(f'{func_name}Request', (BaseModel,), class_fields)
+
+    def convert_function_to_endpoint(self, func_name: str, func):
+        """将 data 模块中的函数转换为 FastAPI 端点"""
+        RequestModel = self.build_request_model(func_name, func)
+        self.functions[func_name] = (func, RequestModel)
+        executor = self.get_executor(func_name)
+        cacheable = func_name in CACHED_FUNCTIONS and self.cache is not None
+
+        def handle(params: dict, full_params: dict, accept: Optional[str], encoding: Optional[str],
+                   cache_key: Optional[str], timing: RequestTiming):
+            # 在工作线程中执行接口函数、序列化和压缩，不占用事件循环
+            timing.add('queue', timing.elapsed())
+            with activate(timing):
+                with timing.measure('call'):
+                    result = func(**params)
+                response = self.build_response(result, accept, timing)
+            response = self.compress_response(response, encoding, timing)
+            with timing.measure('etag'):
+                response.headers['ETag'] = self.make_etag(response.body)
+            # 缓存标记和失效使用包含默认值的完整参数
+            if cache_key is not None:
+                self.cache_response(cache_key, full_params, response)
+            if func_name in INVALIDATING_FUNCTIONS:
+                self.invalidate_cache(full_params)
+            return response
 
-        async def endpoint(request: RequestModel, token: str = Depends(self.verify_token)):
+        async def endpoint(request: RequestModel, token: str = Depends(self.verify_token),
+                           accept: Optional[str] = Header(None),
+                           accept_encoding: Optional[str] = Header(None),
+                           x_lane: Optional[str] = Header(None),
+                           if_none_match: Optional[str] = Header(None)):
+            lane = self.select_lane(func_name, token, x_lane)
+            timing = RequestTiming()
+            self.metrics.begin(func_name)
+            status, size = 500, None
             try:
                 params = request.dict(exclude_unset=True)
-                result = func(**params)
-                converted_result = self.convert_to_dict(result)
-                return {'success': True, 'data': converted_result}
+                full_params = request.dict()
+                encoding = self.negotiate_encoding(accept_encoding)
+                # 调用键包含默认参数、响应格式和压缩编码，同一个键对应完全相同的响应内容
+                variant = f"{'arrow' if codec.accepts_arrow(accept) else 'json'}:{encoding or 'identity'}"
+                call_key = make_key(func_name, full_params, variant)
+                cache_key = call_key if cacheable else None
+                response = None
+                if cacheable:
+                    # 命中时直接返回序列化和压缩好的内容
+                    entry = self.cache.get(cache_key)
+                    if entry is not None:
+                        timing.notes.append('cache;desc="hit"')
+                        response = Response(content=entry.body, media_type=entry.media_type, headers=entry.headers)
+                if response is None:
+                    # 通道已满时尽早拒绝
+                    lane.check()
+                    # 相同的调用正在执行时等待其结果，不再重复调用xtdata，也不再占用通道名额
+                    response, shared = await self.singleflight.do(
+                        func_name, call_key,
+                        lambda: self.run_admitted(lane, executor, handle, params, full_params, accept,
+                                                  encoding, cache_key, timing))
+                    if shared:
+                        timing.notes.append('coalesced;desc="shared"')
+                        response = self.copy_response(response)
+                # 内容与客户端已有的版本一致时只返回304
+                if self.etag_matches(if_none_match, response.headers.get('ETag')):
+                    response = self.not_modified(response)
+                status, size = response.status_code, len(response.body)
+                response.headers['Server-Timing'] = timing.server_timing()
+                return response
+            except AdmissionRejected as e:
+                status = 429
+                raise self.rejected(e)
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
+            finally:
+                self.metrics.end(func_name, status, timing, size)
 
         self.app.post(f'/api/{func_name}')(endpoint)
 
+    def convert_function_to_stream_endpoint(self, func_name: str, func):
+        """将按股票返回数据的函数转换为分片流式端点
+
+        股票列表按分片依次获取，每个分片编码后立即发送并释放，
+        服务器内存占用只与分片大小有关，与股票总数无关。
+        客户端接受Arrow时返回Arrow IPC流(每只股票一个record batch)，否则返回NDJSON，每行一只股票。
+        """
+        RequestModel = self.build_request_model(func_name, func)
+        executor = self.get_executor(func_name)
+
+        def encode_shard(params: dict, encoder: Optional[codec.ArrowStreamEncoder],
+                         compressor: Optional[codec.StreamCompressor]) -> bytes:
+            # 在工作线程中获取、编码并压缩一个分片，返回后分片数据即可释放
+            result = func(**params)
+            if encoder is not None:
+                chunk = encoder.write(result)
+            else:
+                chunk = b''.join(codec.dumps({'code': code, 'data': self.convert_to_dict(frame)}) + b'\n'
+                                 for code, frame in result.items())
+            return compressor.compress(chunk) if compressor is not None else chunk
+
+        def finish_stream(encoder: Optional[codec.ArrowStreamEncoder],
+                          compressor: Optional[codec.StreamCompressor], error: Optional[str] = None) -> bytes:
+            # 输出流的结尾，有错误时附带错误信息
+            if encoder is not None:
+                chunk = encoder.close(error)
+            else:
+                chunk = codec.dumps({'error': error}) + b'\n' if error else b''
+            return compressor.compress(chunk) + compressor.finish() if compressor is not None else chunk
+
+        async def endpoint(request: RequestModel, token: str = Depends(self.verify_token),
+                           accept: Optional[str] = Header(None),
+                           accept_encoding: Optional[str] = Header(None),
+                           x_lane: Optional[str] = Header(None),
+                           shard_size: int = Query(DEFAULT_SHARD_SIZE, ge=1)):
+            params = request.dict(exclude_unset=True)
+            stock_list = list(params.get('stock_list') or [])
+            if not stock_list:
+                raise HTTPException(status_code=400, detail="股票列表为空")
+            # 流按股票逐只输出，其他输出结构需要全部股票的数据，只能通过普通端点获取
+            if params.get('layout', 'dict') != 'dict':
+                raise HTTPException(status_code=400, detail="流式接口只支持按股票输出(layout='dict')")
+            # 响应开始前检查通道，之后每个分片单独占用名额，分片之间让出给其他请求
+            lane = self.select_lane(func_name, token, x_lane)
+            try:
+                lane.check()
+            except AdmissionRejected as e:
+                raise self.rejected(e)
+            encoder = codec.ArrowStreamEncoder() if codec.accepts_arrow(accept) else None
+            # 流式响应大小未知，客户端接受压缩时总是压缩
+            encoding = self.negotiate_encoding(accept_encoding)
+            compressor = codec.StreamCompressor(encoding) if encoding else None
+            endpoint_name = f'stream/{func_name}'
+
+            async def generate():
+                # 流式响应的状态码在开始时已发出，错误只计入指标
+                timing = RequestTiming()
+                self.metrics.begin(endpoint_name)
+                status, size = 200, 0
+                try:
+                    for start in range(0, len(stock_list), shard_size):
+                        shard_params = {**params, 'stock_list': stock_list[start:start + shard_size]}
+                        chunk = await self.run_admitted(lane, executor, encode_shard, shard_params, encoder, compressor)
+                        size += len(chunk)
+                        yield chunk
+                    yield finish_stream(encoder, compressor)
+                except Exception as e:
+                    status = 429 if isinstance(e, AdmissionRejected) else 500
+                    # 响应头已发出，错误信息写入流的末尾
+                    yield finish_stream(encoder, compressor, str(e))
+                finally:
+                    self.metrics.end(endpoint_name, status, timing, size)
+
+            media_type = codec.ARROW_STREAM_MEDIA_TYPE if encoder is not None else codec.NDJSON_MEDIA_TYPE
+            headers = {'Content-Encoding': encoding, 'Vary': 'Accept-Encoding'} if encoding else None
+            return StreamingResponse(generate(), media_type=media_type, headers=headers)
+
+        self.app.post(f'/api/stream/{func_name}')(endpoint)
+
+    async def run_batch_call(self, call: BatchCall, token: str, x_lane: Optional[str] = None) -> dict:
+        """执行批量调用中的单个调用，错误(包括通道过载)只影响该调用自身的结果"""
+        if call.method not in self.functions:
+            return {'success': False, 'detail': f"接口不存在: {call.method}"}
+        func, RequestModel = self.functions[call.method]
+
+        def handle(params: dict, full_params: dict):
+            result = self.convert_to_dict(func(**params))
+            if call.method in INVALIDATING_FUNCTIONS:
+                self.invalidate_cache(full_params)
+            return result
+
+        try:
+            lane = self.admission.select(call.method, token, x_lane)
+            lane.check()
+            request = RequestModel(**call.params)
+            params, full_params = request.dict(exclude_unset=True), request.dict()
+            # 与其他批量请求中的相同调用合并，共享转换后的结果
+            result, _ = await self.singleflight.do(
+                call.method, make_key(call.method, full_params, 'batch'),
+                lambda: self.run_admitted(lane, self.get_executor(call.method), handle, params, full_params))
+            return {'success': True, 'data': result}
+        except KeyError as e:
+            return {'success': False, 'detail': str(e.args[0])}
+        except Exception as e:
+            return {'success': False, 'detail': str(e)}
+
+    def setup_batch_route(self):
+        """设置批量调用端点，一次请求执行多个接口调用"""
+
+        def encode_batch(content: dict, encoding: Optional[str], timing: RequestTiming) -> Response:
+            with timing.measure('encode'):
+                response = self.json_response(content)
+            return self.compress_response(response, encoding, timing)
+
+        async def batch_endpoint(calls: List[BatchCall], token: str = Depends(self.verify_token),
+                                 accept_encoding: Optional[str] = Header(None),
+                                 x_lane: Optional[str] = Header(None)):
+            if len(calls) > MAX_BATCH_SIZE:
+                raise HTTPException(status_code=400, detail=f"单次批量调用不能超过{MAX_BATCH_SIZE}个")
+            timing = RequestTiming()
+            self.metrics.begin('_batch')
+            status, size = 500, None
+            try:
+                # 各调用相互独立，分别在各自接口的执行器中并发执行，结果按请求顺序返回
+                with timing.measure('call'):
+                    results = await asyncio.gather(*(self.run_batch_call(call, token, x_lane) for call in calls))
+                response = await self.get_executor('_batch').run(
+                    encode_batch, {'success': True, 'data': list(results)},
+                    self.negotiate_encoding(accept_encoding), timing)
+                status, size = response.status_code, len(response.body)
+                response.headers['Server-Timing'] = timing.server_timing()
+                return response
+            except ExecutorBusyError as e:
+                status = 429
+                raise self.rejected(AdmissionRejected(str(e)))
+            finally:
+                self.metrics.end('_batch', status, timing, size)
+
+        self.app.post('/api/_batch')(batch_endpoint)
+
+    def render_metrics(self) -> str:
+        """输出Prometheus文本格式的服务指标，包括缓存和执行器状态"""
+        lines = [self.metrics.render().rstrip('\n')]
+        lines.append('# HELP qka_executor_pending 执行器中正在执行和排队的调用数')
+        lines.append('# TYPE qka_executor_pending gauge')
+        for func_name, executor in sorted(self.executors.items()):
+            lines.append(f'qka_executor_pending{{endpoint="{func_name}"}} {executor.pending}')
+        if self.cache is not None:
+            stats = self.cache.stats()
+            lines.append('# TYPE qka_cache_hits_total counter')
+            lines.append(f"qka_cache_hits_total {stats['hits']}")
+            lines.append('# TYPE qka_cache_misses_total counter')
+            lines.append(f"qka_cache_misses_total {stats['misses']}")
+            lines.append('# TYPE qka_cache_bytes gauge')
+            lines.append(f"qka_cache_bytes {stats['bytes']}")
+        lines.append('# HELP qka_lane_active 优先级通道中正在执行的请求数')
+        lines.append('# TYPE qka_lane_active gauge')
+        for name, lane in sorted(self.admission.lanes.items()):
+            lines.append(f'qka_lane_active{{lane="{name}"}} {lane.active}')
+        lines.append('# HELP qka_lane_waiting 优先级通道中排队的请求数')
+        lines.append('# TYPE qka_lane_waiting gauge')
+        for name, lane in sorted(self.admission.lanes.items()):
+            lines.append(f'qka_lane_waiting{{lane="{name}"}} {len(lane.waiters)}')
+        lines.append('# HELP qka_lane_rejected_total 优先级通道拒绝的请求数')
+        lines.append('# TYPE qka_lane_rejected_total counter')
+        for name, lane in sorted(self.admission.lanes.items()):
+            lines.append(f'qka_lane_rejected_total{{lane="{name}"}} {lane.rejected}')
+        stats = self.singleflight.stats()
+        lines.append('# HELP qka_singleflight_calls_total 参与请求合并的调用数')
+        lines.append('# TYPE qka_singleflight_calls_total counter')
+        for func_name, count in sorted(stats['calls'].items()):
+            lines.append(f'qka_singleflight_calls_total{{endpoint="{func_name}"}} {count}')
+        lines.append('# HELP qka_singleflight_deduplicated_total 因相同调用正在执行而被合并的调用数')
+        lines.append('# TYPE qka_singleflight_deduplicated_total counter')
+        for func_name, count in sorted(stats['deduplicated'].items()):
+            lines.append(f'qka_singleflight_deduplicated_total{{endpoint="{func_name}"}} {count}')
+        lines.append('# TYPE qka_singleflight_inflight gauge')
+        lines.append(f"qka_singleflight_inflight {stats['inflight']}")
+        return '\n'.join(lines) + '\n'
+
+    def setup_metrics_route(self):
+        """设置 /metrics 端点，以Prometheus文本格式输出服务指标
+        token通过X-Token请求头或token查询参数传递，便于Prometheus抓取配置
+        """
+
+        async def metrics_endpoint(x_token: Optional[str] = Header(None), token: Optional[str] = Query(None)):
+            if (x_token or token) != self.token:
+                raise HTTPException(status_code=401, detail="无效的Token")
+            return PlainTextResponse(self.render_metrics(), media_type='text/plain; version=0.0.4')
+
+        self.app.get('/metrics')(metrics_endpoint)
+
+    async def send_quotes(self, websocket: WebSocket, subscriber: QuoteSubscriber):
+        """持续把客户端队列中的行情发送出去"""
+        while True:
+            code, period, quote = await subscriber.get()
+            message = {'event': 'quote', 'code': code, 'period': period, 'data': self.convert_to_dict(quote)}
+            await websocket.send_text(codec.dumps(message).decode('utf-8'))
+
+    async def handle_quote_message(self, websocket: WebSocket, subscriber: QuoteSubscriber, message: dict):
+        """处理客户端的订阅/退订请求
+        消息格式: {"action": "subscribe"/"unsubscribe", "codes": [...], "period": "tick"}
+        """
+        action = message.get('action')
+        codes = message.get('codes') or []
+        period = message.get('period', 'tick')
+        try:
+            if action not in ('subscribe', 'unsubscribe'):
+                raise ValueError(f"无效的操作: {action}")
+            codes = [normalize_quote_code(code, period) for code in codes]
+            for code in codes:
+                if action == 'subscribe':
+                    await self.quote_hub.subscribe(subscriber, code, period)
+                else:
+                    await self.quote_hub.unsubscribe(subscriber, code, period)
+            reply = {'event': f'{action}d', 'codes': codes, 'period': period}
+        except Exception as e:
+            reply = {'event': 'error', 'detail': str(e)}
+        await websocket.send_text(codec.dumps(reply).decode('utf-8'))
+
+    def setup_quote_route(self):
+        """设置行情推送的WebSocket端点
+        token通过X-Token请求头或token查询参数传递
+        """
+
+        async def quote_endpoint(websocket: WebSocket):
+            token = websocket.headers.get('x-token') or websocket.query_params.get('token')
+            if token != self.token:
+                await websocket.close(code=1008)
+                return
+            await websocket.accept()
+            subscriber = QuoteSubscriber()
+            sender = asyncio.create_task(self.send_quotes(websocket, subscriber))
+            try:
+                while True:
+                    message = await websocket.receive_json()
+                    await self.handle_quote_message(websocket, subscriber, message)
+            except WebSocketDisconnect:
+                pass
+            finally:
+                sender.cancel()
+                await self.quote_hub.remove(subscriber)
+
+        self.app.websocket('/ws/quote')(quote_endpoint)
+
     def setup_routes(self):
         """设置所有路由"""
         # 获取 data 模块中的所有函数
@@ -113,11 +609,16 @@ class QMTDataServer:
         )
         
         # 排除私有函数和特殊函数
-        excluded_functions = set()
+        excluded_functions = {'set_history_store', 'set_universe_cache', 'set_coverage_index'}
         
         for func_name, func in data_functions:
             if not func_name.startswith('_') and func_name not in excluded_functions:
                 self.convert_function_to_endpoint(func_name, func)
+                if func_name in STREAMED_FUNCTIONS:
+                    self.convert_function_to_stream_endpoint(func_name, func)
+        self.setup_batch_route()
+        self.setup_quote_route()
+        self.setup_metrics_route()
 
     def start(self):
         """启动服务器"""
@@ -125,12 +626,27 @@ class QMTDataServer:
         uvicorn.run(self.app, host=self.host, port=self.port)
 
 
-def qmt_data_server(host: str = "0.0.0.0", port: int = 8000, token: str = None):
+def qmt_data_server(host: str = "0.0.0.0", port: int = 8000, token: str = None,
+                    limits: Optional[Dict[str, Tuple[int, int]]] = None,
+                    cache_size: int = 256 * 1024 * 1024, compress_min_size: Optional[int] = 4096,
+                    history_db: Optional[str] = None,
+                    lanes: Optional[Dict[str, Tuple[int, int, float]]] = None,
+                    lane_tokens: Optional[Dict[str, str]] = None,
+                    history_tables: Optional[Dict[str, str]] = None):
     """快速创建并启动数据服务器的便捷函数
     Args:
         host: 服务器地址，默认0.0.0.0
         port: 服务器端口，默认8000
         token: 可选的自定义token
+        limits: 可选的接口限流配置，{接口名: (最大并发数, 最大排队数)}
+        cache_size: 行情结果缓存的最大字节数，为0时不启用缓存
+        compress_min_size: 响应压缩的最小字节数，为None时不压缩
+        history_db: 可选的DuckDB历史行情库路径
+        lanes: 可选的优先级通道配置，{通道名: (最大并发数, 最大排队数, 最长排队时间)}
+        lane_tokens: 可选的额外token，{token: 通道名}
+        history_tables: 历史行情库中周期与表名的对应关系
     """
-    server = QMTDataServer(host, port, token)
+    server = QMTDataServer(host, port, token, limits, cache_size, compress_min_size=compress_min_size,
+                           history_db=history_db, lanes=lanes, lane_tokens=lane_tokens,
+                           history_tables=history_tables)
     server.start()
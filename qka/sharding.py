@@ -0,0 +1,101 @@
+"""
+股票列表分片模块
+客户端把较大的股票列表拆分为多个分片并发请求，分片大小根据观测到的延迟自动调整
+"""
+
+import threading
+from typing import Any, List
+
+
+def split_shards(stock_list: list, shard_size: int) -> List[list]:
+    """
+    按分片大小拆分股票列表
+    Args:
+        stock_list: 股票列表
+        shard_size: 每个分片的股票数量
+    Returns:
+        list: 分片列表，保持原有顺序
+    """
+    if shard_size < 1:
+        raise ValueError("分片大小必须大于0")
+    return [stock_list[start:start + shard_size] for start in range(0, len(stock_list), shard_size)]
+
+
+def merge_results(results: List[Any]) -> Any:
+    """
+    合并各分片的结果
+    Args:
+        results: 按分片顺序排列的结果
+    Returns:
+        字典结果合并为一个字典，布尔结果在全部成功时为True，列表结果依次拼接
+    """
+    if all(isinstance(result, dict) for result in results):
+        merged = {}
+        for result in results:
+            merged.update(result)
+        return merged
+    if all(isinstance(result, bool) for result in results):
+        return all(results)
+    if all(isinstance(result, list) for result in results):
+        return [item for result in results for item in result]
+    raise TypeError(f"无法合并的分片结果类型: {sorted({type(result).__name__ for result in results})}")
+
+
+class AdaptiveShardSizer:
+    """根据请求延迟自动调整分片大小
+
+    以指数移动平均估计每只股票的平均耗时，使单个分片的耗时接近目标延迟：
+    服务器较快时增大分片以减少请求数，较慢或接近超时时减小分片。
+    可以在多个线程中同时使用。
+    """
+
+    def __init__(self, initial: int = 200, min_size: int = 20, max_size: int = 1000,
+                 target_latency: float = 2.0, smoothing: float = 0.3):
+        """初始化分片大小调整器
+        Args:
+            initial: 初始分片大小
+            min_size: 最小分片大小
+            max_size: 最大分片大小
+            target_latency: 单个分片的目标耗时(秒)
+            smoothing: 移动平均中新观测值的权重，0~1之间
+        """
+        if not 1 <= min_size <= initial <= max_size:
+            raise ValueError("分片大小需满足 1 <= min_size <= initial <= max_size")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_latency = target_latency
+        self.smoothing = smoothing
+        self._size = initial
+        self._per_stock = None
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        """当前的分片大小"""
+        return self._size
+
+    def observe(self, stock_count: int, seconds: float):
+        """
+        记录一个分片的耗时并更新分片大小
+        Args:
+            stock_count: 分片中的股票数量
+            seconds: 请求耗时(秒)
+        """
+        if stock_count <= 0:
+            return
+        per_stock = seconds / stock_count
+        with self._lock:
+            if self._per_stock is None:
+                self._per_stock = per_stock
+            else:
+                self._per_stock += self.smoothing * (per_stock - self._per_stock)
+            if self._per_stock > 0:
+                ideal = int(self.target_latency / self._per_stock)
+                # 每次最多调整一倍，避免个别慢请求造成剧烈波动
+                ideal = max(self._size // 2, min(self._size * 2, ideal))
+                self._size = max(self.min_size, min(self.max_size, ideal))
+
+    def failed(self):
+        """分片请求失败(如超时)时减半分片大小"""
+        with self._lock:
+            self._size = max(self.min_size, self._size // 2)
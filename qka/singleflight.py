@@ -0,0 +1,47 @@
+"""
+请求合并模块
+相同参数的请求同时到达时只执行一次，其余请求等待并共享同一结果
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    """合并进行中的相同调用
+
+    同一个键的调用正在执行时，后到的调用不再执行，而是等待同一个任务的结果(或异常)。
+    任务完成后立即移除，之后的调用重新执行，因此不会返回过期数据。
+    只在事件循环线程中使用。
+    """
+
+    def __init__(self):
+        self.inflight: Dict[str, asyncio.Task] = {}
+        self.calls: Dict[str, int] = {}
+        self.deduplicated: Dict[str, int] = {}
+
+    async def do(self, name: str, key: str, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        执行调用，相同键的调用正在执行时共享其结果
+        Args:
+            name: 接口名称，用于统计
+            key: 规范化的调用键
+            func: 无参数的协程函数，只在没有相同调用执行时被调用
+        Returns:
+            tuple: (结果, 是否为共享的结果)
+        """
+        self.calls[name] = self.calls.get(name, 0) + 1
+        task = self.inflight.get(key)
+        shared = task is not None
+        if shared:
+            self.deduplicated[name] = self.deduplicated.get(name, 0) + 1
+        else:
+            task = asyncio.ensure_future(func())
+            self.inflight[key] = task
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        # 单个请求被取消(如客户端断开)时不影响正在共享结果的其他请求
+        return await asyncio.shield(task), shared
+
+    def stats(self) -> dict:
+        """返回各接口的调用数和被合并的调用数"""
+        return {'inflight': len(self.inflight), 'calls': dict(self.calls), 'deduplicated': dict(self.deduplicated)}
@@ -0,0 +1,139 @@
+"""
+本地历史行情库模块
+读取importdb.py导入的DuckDB历史K线表，按xtdata相同的结构返回数据
+"""
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import duckdb
+import pandas as pd
+
+# 默认的周期与表名对应关系，与config.ini中[TARGET]的配置一致
+DEFAULT_TABLES = {'1m': 'daily_1min', '1d': 'daily_1d'}
+
+# 与xtdata一致的索引时间格式
+INDEX_FORMATS = {'1m': '%Y%m%d%H%M%S', '1d': '%Y%m%d'}
+
+# 库表中的时间为北京时间的"本地毫秒数"(utils.clean把本地时间直接按UTC换算)，
+# 与xtdata的UTC毫秒时间戳相差8小时
+LOCAL_OFFSET_MS = 8 * 3600 * 1000
+
+# 库表中与xtdata同名的行情字段
+BAR_COLUMNS = ['time', 'open', 'high', 'low', 'close', 'volume', 'amount']
+
+
+def parse_time(value: str, end: bool = False) -> Optional[datetime]:
+    """
+    解析xtdata格式的时间参数
+    Args:
+        value: 'YYYYMMDD'或'YYYYMMDDhhmmss'，为空时返回None
+        end: 是否为结束时间，只有日期时取当日最后一秒
+    Returns:
+        datetime: 北京时间
+    """
+    if not value:
+        return None
+    value = str(value)
+    if len(value) == 8:
+        moment = datetime.strptime(value, '%Y%m%d')
+        return moment + timedelta(days=1, seconds=-1) if end else moment
+    return datetime.strptime(value[:14], '%Y%m%d%H%M%S')
+
+
+def to_local_ms(moment: datetime) -> int:
+    """把北京时间转换为库表中使用的本地毫秒数"""
+    return int((moment - datetime(1970, 1, 1)).total_seconds() * 1000)
+
+
+def from_local_ms(value: int) -> datetime:
+    """把库表中的本地毫秒数转换为北京时间"""
+    return datetime(1970, 1, 1) + timedelta(milliseconds=int(value))
+
+
+class HistoryStoreUnavailable(Exception):
+    """历史行情库暂时无法打开(如导入程序正在写入)"""
+
+
+class HistoryStore:
+    """DuckDB历史K线库
+
+    每次查询时以只读方式短暂打开数据库，查询结束即关闭，不长期持有文件锁，
+    服务器运行期间importdb.py等写入程序仍可以打开数据库写入。
+    写入程序持有数据库时查询抛出HistoryStoreUnavailable，调用方改为从xtdata获取。
+    查询条件(股票代码、时间范围)下推到DuckDB执行，只读取需要的行。
+    """
+
+    def __init__(self, db_path: str, tables: Optional[Dict[str, str]] = None):
+        """初始化历史行情库
+        Args:
+            db_path: DuckDB数据库路径
+            tables: 周期与表名的对应关系，默认为DEFAULT_TABLES
+        """
+        self.db_path = db_path
+        self.tables = dict(tables or DEFAULT_TABLES)
+        try:
+            with self._connect() as conn:
+                existing = {row[0] for row in conn.execute(
+                    "SELECT table_name FROM information_schema.tables").fetchall()}
+            # 只保留数据库中实际存在的表
+            self.tables = {period: table for period, table in self.tables.items() if table in existing}
+        except HistoryStoreUnavailable:
+            # 启动时数据库正在写入，保留配置的表，查询时再确认
+            pass
+
+    @contextmanager
+    def _connect(self):
+        """打开一个只读连接，用完立即关闭以释放文件锁"""
+        try:
+            conn = duckdb.connect(self.db_path, read_only=True)
+        except duckdb.Error as e:
+            raise HistoryStoreUnavailable(f"无法打开历史行情库 {self.db_path}: {e}") from e
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def supports(self, period: str) -> bool:
+        """是否存有该周期的数据"""
+        return period in self.tables and period in INDEX_FORMATS
+
+    def query(self, stock_list: List[str], period: str, start: datetime,
+              end: datetime) -> Tuple[Dict[str, datetime], Dict[str, pd.DataFrame]]:
+        """
+        查询历史K线，返回与xtdata.get_market_data_ex相同结构的数据
+        Args:
+            stock_list: 股票代码列表
+            period: 周期
+            start: 开始时间(北京时间)
+            end: 结束时间(北京时间)
+        Returns:
+            tuple: (覆盖范围, 行情数据)
+                覆盖范围为{股票代码: 最新K线的北京时间}，库中没有的股票不包含在内
+                行情数据为{股票代码: DataFrame}，只有BAR_COLUMNS字段，索引为xtdata格式的时间字符串，
+                time列为UTC毫秒时间戳
+        Raises:
+            HistoryStoreUnavailable: 数据库无法打开或查询失败
+        """
+        table = self.tables[period]
+        with self._connect() as conn:
+            try:
+                rows = conn.execute(
+                    f"SELECT code, MAX(time) FROM {table} "
+                    f"WHERE code IN (SELECT UNNEST(?)) GROUP BY code",
+                    [list(stock_list)]
+                ).fetchall()
+                frame = conn.execute(
+                    f"SELECT code, {', '.join(BAR_COLUMNS)} FROM {table} "
+                    f"WHERE code IN (SELECT UNNEST(?)) AND time BETWEEN ? AND ? ORDER BY code, time",
+                    [list(stock_list), to_local_ms(start), to_local_ms(end)]
+                ).df()
+            except duckdb.Error as e:
+                raise HistoryStoreUnavailable(f"查询历史行情库失败: {e}") from e
+        coverage = {code: from_local_ms(last) for code, last in rows}
+
+        # 整表一次性生成索引和UTC时间戳，再按股票切分
+        local_time = pd.to_datetime(frame['time'], unit='ms')
+        frame.index = pd.Index(local_time.dt.strftime(INDEX_FORMATS[period]).to_numpy())
+        frame['time'] = frame['time'] - LOCAL_OFFSET_MS
+        return coverage, {code: group.drop(columns='code') for code, group in frame.groupby('code', sort=False)}
@@ -0,0 +1,199 @@
+"""
+交易日历模块
+把akshare的交易日历保存在本地，每天最多刷新一次，网络不可用时使用本地的日历，
+区间和偏移查询在排序后的NumPy数组上二分查找
+"""
+
+import os
+import threading
+from datetime import date, datetime
+from typing import List, Optional, Union
+import akshare as ak
+import numpy as np
+import pandas as pd
+
+# 默认的本地日历文件
+DEFAULT_CALENDAR_PATH = os.path.join(os.path.expanduser('~'), '.qka', 'trade_calendar.npy')
+
+DateLike = Union[str, int, date, datetime]
+
+
+def to_date_number(value: DateLike) -> int:
+    """
+    把日期转换为YYYYMMDD格式的整数
+    Args:
+        value: 'YYYYMMDD'、'YYYY-MM-DD'、'YYYYMMDDhhmmss'、整数20240101或date/datetime
+    Returns:
+        int: 如20240101
+    """
+    if isinstance(value, (datetime, date)):
+        return value.year * 10000 + value.month * 100 + value.day
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    text = str(value).strip().replace('-', '').replace('/', '')
+    if len(text) < 8 or not text[:8].isdigit():
+        raise ValueError(f"无效的日期: {value}")
+    return int(text[:8])
+
+
+def _fetch_calendar() -> np.ndarray:
+    """从akshare获取交易日历"""
+    dates = pd.DatetimeIndex(pd.to_datetime(ak.tool_trade_date_hist_sina()['trade_date']))
+    return (dates.year * 10000 + dates.month * 100 + dates.day).to_numpy(dtype=np.int64)
+
+
+class TradeCalendar:
+    """交易日历
+
+    日历以YYYYMMDD整数的排序数组保存在内存和本地文件中，首次使用时加载。
+    本地文件不是当天刷新的才从akshare重新获取，获取失败时继续使用本地文件。
+    可以在多个线程中同时使用。
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_CALENDAR_PATH, fetch=_fetch_calendar):
+        """初始化交易日历
+        Args:
+            path: 本地日历文件路径，为None时不保存到本地
+            fetch: 获取交易日历的函数，返回YYYYMMDD整数数组，默认从akshare获取
+        """
+        self.path = path
+        self.fetch = fetch
+        self._dates: Optional[np.ndarray] = None
+        self._refreshed: Optional[date] = None
+        self._lock = threading.Lock()
+
+    def _load_local(self) -> bool:
+        """读取本地日历文件，文件不存在或损坏时返回False"""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            self._dates = np.load(self.path)
+        except (OSError, ValueError):
+            return False
+        self._refreshed = datetime.fromtimestamp(os.path.getmtime(self.path)).date()
+        return True
+
+    def _save_local(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # 先写入临时文件再替换，避免其他进程读到不完整的文件
+        temp_path = f"{self.path}.tmp.npy"
+        np.save(temp_path, self._dates)
+        os.replace(temp_path, self.path)
+
+    def refresh(self, force: bool = False) -> np.ndarray:
+        """
+        按需刷新日历：内存和本地文件都不是当天刷新的才重新获取
+        Args:
+            force: 是否忽略本地文件强制重新获取
+        Returns:
+            np.ndarray: 排序后的交易日数组
+        Raises:
+            RuntimeError: 获取失败且本地没有可用的日历
+        """
+        today = date.today()
+        with self._lock:
+            if not force and self._refreshed == today:
+                return self._dates
+            if not force and self._dates is None and self._load_local() and self._refreshed == today:
+                return self._dates
+            try:
+                dates = np.unique(np.asarray(self.fetch(), dtype=np.int64))
+            except Exception as e:
+                if self._dates is None:
+                    raise RuntimeError(f"调用akshare交易日历接口失败且本地没有可用的日历: {e}")
+                # 离线时继续使用已有的日历，当天不再重试
+                self._refreshed = today
+                return self._dates
+            self._dates = dates
+            self._refreshed = today
+            self._save_local()
+            return self._dates
+
+    @property
+    def dates(self) -> np.ndarray:
+        """排序后的交易日数组(YYYYMMDD整数)"""
+        return self.refresh()
+
+    def range(self, start: DateLike, end: DateLike) -> np.ndarray:
+        """
+        查询区间内的交易日
+        Args:
+            start: 开始日期(包含)
+            end: 结束日期(包含)
+        Returns:
+            np.ndarray: YYYYMMDD整数数组
+        """
+        dates = self.dates
+        left = np.searchsorted(dates, to_date_number(start), side='left')
+        right = np.searchsorted(dates, to_date_number(end), side='right')
+        return dates[left:right]
+
+    def is_trading_day(self, day: DateLike) -> bool:
+        """是否为交易日"""
+        dates = self.dates
+        number = to_date_number(day)
+        index = np.searchsorted(dates, number)
+        return bool(index < len(dates) and dates[index] == number)
+
+    def shift(self, day: DateLike, n: int) -> int:
+        """
+        偏移n个交易日
+        day为交易日时从day开始计数；不是交易日时，向后偏移从前一个交易日开始计数，向前偏移从后一个交易日开始计数，
+        因此shift(day, 1)总是day之后的第一个交易日，shift(day, -1)总是day之前的第一个交易日
+        Args:
+            day: 日期
+            n: 偏移的交易日数，正数向后，负数向前，0表示day当天或之后的第一个交易日
+        Returns:
+            int: YYYYMMDD格式的交易日
+        Raises:
+            IndexError: 超出日历范围
+        """
+        dates = self.dates
+        number = to_date_number(day)
+        if n > 0:
+            index = np.searchsorted(dates, number, side='right') + n - 1
+        elif n < 0:
+            index = np.searchsorted(dates, number, side='left') + n
+        else:
+            index = np.searchsorted(dates, number, side='left')
+        if index < 0 or index >= len(dates):
+            raise IndexError(f"超出交易日历范围: {day} 偏移 {n}")
+        return int(dates[index])
+
+    def next_trading_day(self, day: DateLike) -> int:
+        """day之后的第一个交易日"""
+        return self.shift(day, 1)
+
+    def prev_trading_day(self, day: DateLike) -> int:
+        """day之前的第一个交易日"""
+        return self.shift(day, -1)
+
+
+_default_calendar: Optional[TradeCalendar] = None
+_default_lock = threading.Lock()
+
+
+def get_calendar() -> TradeCalendar:
+    """进程内共享的交易日历，使用默认的本地文件"""
+    global _default_calendar
+    with _default_lock:
+        if _default_calendar is None:
+            _default_calendar = TradeCalendar()
+        return _default_calendar
+
+
+def format_dates(dates: np.ndarray, format: str = 'number') -> List[str]:
+    """
+    把YYYYMMDD整数数组转换为字符串列表
+    Args:
+        dates: 交易日数组
+        format: 'number'为'20240101'，'str'为'2024-01-01'
+    """
+    if format == 'number':
+        return dates.astype(str).tolist()
+    elif format == 'str':
+        return [f"{text[:4]}-{text[4:6]}-{text[6:]}" for text in dates.astype(str)]
+    else:
+        raise ValueError(f"无效的格式: {format}")
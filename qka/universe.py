@@ -0,0 +1,140 @@
+"""
+股票池缓存模块
+板块成分股每个交易日最多变化一次，按(板块, 交易日)缓存成分股和按市场类型划分的子股票池，
+保存在内存和本地文件中，新交易日的第一次调用时自动刷新
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from qka import codes
+from qka.tradecalendar import TradeCalendar, get_calendar, to_date_number
+
+logger = logging.getLogger(__name__)
+
+# 默认的本地股票池文件
+DEFAULT_UNIVERSE_PATH = os.path.join(os.path.expanduser('~'), '.qka', 'universe.json')
+
+
+class UniverseCache:
+    """按交易日缓存的股票池
+
+    每个板块保存成分股以及按codes.MARKET_TYPES划分的子股票池(主板、创业板、科创板、北交所)，
+    子股票池在刷新时一次性计算。非交易日使用最近一个交易日的股票池。
+    刷新失败时继续使用已有的股票池；xtdata返回空列表时不缓存。
+    可以在多个线程中同时使用。
+    """
+
+    def __init__(self, fetch: Callable[[str], List[str]], path: Optional[str] = DEFAULT_UNIVERSE_PATH,
+                 calendar: Optional[TradeCalendar] = None):
+        """初始化股票池缓存
+        Args:
+            fetch: 获取板块成分股的函数，如xtdata.get_stock_list_in_sector
+            path: 本地股票池文件路径，为None时只缓存在内存中
+            calendar: 交易日历，默认为进程内共享的日历
+        """
+        self.fetch = fetch
+        self.path = path
+        self.calendar = calendar
+        self._entries: Optional[Dict[str, dict]] = None  # {板块: {'day', 'codes', 'derived'}}
+        self._lock = threading.Lock()
+
+    def trading_day(self) -> int:
+        """当前股票池所属的交易日，非交易日为前一个交易日"""
+        today = datetime.now()
+        try:
+            calendar = self.calendar or get_calendar()
+            if calendar.is_trading_day(today):
+                return to_date_number(today)
+            return calendar.prev_trading_day(today)
+        except (RuntimeError, IndexError) as e:
+            # 交易日历不可用时按自然日刷新
+            logger.warning(f"交易日历不可用，股票池按自然日刷新: {e}")
+            return to_date_number(today)
+
+    def _load_local(self) -> Dict[str, dict]:
+        """读取本地股票池文件，文件不存在或损坏时返回空字典"""
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取股票池文件失败: {e}")
+            return {}
+
+    def _save_local(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # 先写入临时文件再替换，避免其他进程读到不完整的文件
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+    @staticmethod
+    def _build_entry(day: int, stock_list: List[str]) -> dict:
+        """计算成分股按市场类型划分的子股票池"""
+        stock_list = list(stock_list)
+        market = codes.get_stock_market_type_array(stock_list) if stock_list else []
+        derived = {market_type: [] for market_type in codes.MARKET_TYPES}
+        for stock, market_type in zip(stock_list, market):
+            derived[market_type].append(stock)
+        return {'day': day, 'codes': stock_list, 'derived': derived}
+
+    def _entry(self, sector_name: str) -> dict:
+        """板块在当前交易日的股票池，需要时刷新"""
+        day = self.trading_day()
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load_local()
+            entry = self._entries.get(sector_name)
+            if entry is not None and entry['day'] == day:
+                return entry
+            try:
+                stock_list = self.fetch(sector_name)
+            except Exception as e:
+                if entry is None:
+                    raise
+                logger.warning(f"刷新 {sector_name} 成分股失败，使用 {entry['day']} 的股票池: {e}")
+                return entry
+            if not stock_list:
+                # 板块数据尚未下载时xtdata返回空列表，不缓存，下次调用时重试
+                return entry if entry is not None else self._build_entry(day, [])
+            entry = self._build_entry(day, stock_list)
+            self._entries[sector_name] = entry
+            self._save_local()
+            return entry
+
+    def get(self, sector_name: str) -> List[str]:
+        """
+        获取板块成分股
+        Args:
+            sector_name: 板块名称(如: '沪深A股')
+        Returns:
+            list: 成分股代码列表
+        """
+        return list(self._entry(sector_name)['codes'])
+
+    def derived(self, sector_name: str, market_type: str) -> List[str]:
+        """
+        获取板块中某一市场类型的成分股
+        Args:
+            sector_name: 板块名称(如: '沪深A股')
+            market_type: 市场类型，'主板'/'创业板'/'科创板'/'北交所'
+        Returns:
+            list: 成分股代码列表
+        """
+        if market_type not in codes.MARKET_TYPES:
+            raise ValueError(f"无效的市场类型: {market_type}")
+        return list(self._entry(sector_name)['derived'][market_type])
+
+    def clear(self):
+        """清空内存和本地文件中的股票池"""
+        with self._lock:
+            self._entries = {}
+            self._save_local()
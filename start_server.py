@@ -13,5 +13,20 @@ sys.path.insert(0, project_root)
 from qka.server import QMTDataServer
 
 if __name__ == "__main__":
-    server = QMTDataServer(host='0.0.0.0', port=8000)
+    # 配置了目标库时，历史行情从DuckDB读取
+    config = configparser.ConfigParser()
+    config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.ini')
+    if os.path.exists(config_path):
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config.read_file(f)
+    history_db = config.get('TARGET', 'path', fallback=None)
+    if history_db and not os.path.exists(history_db):
+        history_db = None
+    # 表名与config.ini中importdb.py写入的表一致
+    history_tables = {
+        '1m': config.get('TARGET', 'min_table', fallback='daily_1min'),
+        '1d': config.get('TARGET', 'day_table', fallback='daily_1d'),
+    }
+
+    server = QMTDataServer(host='0.0.0.0', port=8000, history_db=history_db, history_tables=history_tables)
     server.start()
\ No newline at end of file
@@ -0,0 +1,91 @@
+"""
+股票代码处理性能对比
+以全市场规模的代码数组(ndarray)，对比逐个处理字符串与按前缀查表批量处理的耗时。
+批量查表只对ndarray/Series输入有加速；列表输入的add_stock_suffix_list仍逐个处理，
+这里确认它和单个代码的函数没有变慢
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from qka import codes
+
+
+def legacy_add_stock_suffix(stock_code: str) -> str:
+    """原有的逐个处理方式"""
+    if '.' in stock_code:
+        return stock_code
+    if len(stock_code) != 6 or not stock_code.isdigit():
+        raise ValueError("股票代码必须是6位数字")
+    if stock_code.startswith(("00", "30", "15", "16", "18", "12")):
+        return f"{stock_code}.SZ"
+    elif stock_code.startswith(("60", "68", "11")):
+        return f"{stock_code}.SH"
+    elif stock_code.startswith(("83", "43")):
+        return f"{stock_code}.BJ"
+    return f"{stock_code}.SH"
+
+
+def legacy_market_type(stock_code: str) -> str:
+    """原有的逐个判断方式"""
+    symbol = legacy_add_stock_suffix(stock_code).split('.')[0]
+    if symbol.startswith('688') or symbol.startswith('689'):
+        return '科创板'
+    elif symbol.startswith('30'):
+        return '创业板'
+    elif symbol.startswith('83'):
+        return '北交所'
+    return '主板'
+
+
+def make_codes(count: int) -> list:
+    """生成与沪深A股比例接近的代码列表，约一半带后缀"""
+    rng = np.random.default_rng(0)
+    prefixes = rng.choice(['000', '002', '300', '600', '601', '603', '688', '830'], size=count,
+                          p=[0.1, 0.2, 0.25, 0.15, 0.05, 0.1, 0.1, 0.05])
+    numbers = rng.integers(0, 1000, size=count)
+    result = [f'{prefix}{number:03d}' for prefix, number in zip(prefixes, numbers)]
+    return [legacy_add_stock_suffix(code) if i % 2 else code for i, code in enumerate(result)]
+
+
+def measure(func, repeat: int = 5) -> float:
+    """返回多次执行的最短耗时"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    for count in [5000, 50000]:
+        stock_list = make_codes(count)
+        stock_array = np.asarray(stock_list)
+        assert codes.add_stock_suffix_list(stock_list) == [legacy_add_stock_suffix(code) for code in stock_list]
+        assert list(codes.get_stock_market_type_array(stock_array)) == [legacy_market_type(code) for code in stock_list]
+
+        print(f"{count}只股票:")
+        for name, legacy, vectorized in [
+            # 列表输入时add_stock_suffix_list逐个处理，应与原有方式持平
+            ('添加后缀(列表输入)', lambda: [legacy_add_stock_suffix(code) for code in stock_list],
+             lambda: codes.add_stock_suffix_list(stock_list)),
+            ('单个代码市场类型', lambda: [legacy_market_type(code) for code in stock_list],
+             lambda: [codes.get_stock_market_type(code) for code in stock_list]),
+            ('添加后缀(ndarray输入)', lambda: [legacy_add_stock_suffix(code) for code in stock_array],
+             lambda: codes.add_stock_suffix_array(stock_array)),
+            ('市场类型(ndarray输入)', lambda: [legacy_market_type(code) for code in stock_array],
+             lambda: codes.get_stock_market_type_array(stock_array)),
+            ('筛选主板(ndarray输入)', lambda: [code for code in stock_array if legacy_market_type(code) == '主板'],
+             lambda: stock_array[codes.get_stock_market_type_array(stock_array) == '主板']),
+        ]:
+            legacy_time = measure(legacy)
+            vectorized_time = measure(vectorized)
+            print(f"  {name}: 逐个处理 {legacy_time * 1000:7.2f} ms  批量查表 {vectorized_time * 1000:7.2f} ms"
+                  f"  (加速 {legacy_time / vectorized_time:.1f}x)")
@@ -0,0 +1,78 @@
+"""
+序列化性能对比
+模拟get_market_data_ex的返回结果，对比逐行转换(to_dict('records') + json)与按列编码(codec)的耗时和体积
+"""
+
+import os
+import sys
+import json
+import time
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from qka import codec
+
+
+def make_market_data(stock_count: int, bar_count: int) -> dict:
+    """生成与get_market_data_ex(period='1m')结构一致的模拟数据"""
+    rng = np.random.default_rng(0)
+    times = pd.date_range('2025-11-03 09:31', periods=bar_count, freq='min')
+    index = times.strftime('%Y%m%d%H%M%S')
+    millis = times.asi8 // 10**6
+    result = {}
+    for i in range(stock_count):
+        close = np.round(10 + rng.standard_normal(bar_count).cumsum() * 0.01, 2)
+        result[f'{i:06d}.SZ'] = pd.DataFrame({
+            'time': millis,
+            'open': close,
+            'high': close + 0.01,
+            'low': close - 0.01,
+            'close': close,
+            'volume': rng.integers(100, 10000, bar_count),
+            'amount': close * 1000,
+            'settelementPrice': 0.0,
+            'openInterest': 15,
+            'preClose': close,
+            'suspendFlag': 0,
+        }, index=index)
+    return result
+
+
+def legacy_convert(obj):
+    """原有的逐行转换方式"""
+    if isinstance(obj, dict):
+        return {k: legacy_convert(v) for k, v in obj.items()}
+    if isinstance(obj, pd.DataFrame):
+        return obj.to_dict('records')
+    return obj
+
+
+def measure(func, repeat: int = 3) -> float:
+    """返回多次执行的最短耗时"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    for stock_count, bar_count in [(100, 240), (500, 240), (50, 240 * 20)]:
+        market_data = make_market_data(stock_count, bar_count)
+        legacy_payload = json.dumps(legacy_convert(market_data)).encode('utf-8')
+        codec_payload = codec.dumps(codec.to_jsonable(market_data))
+
+        legacy_time = measure(lambda: json.dumps(legacy_convert(market_data)))
+        codec_time = measure(lambda: codec.dumps(codec.to_jsonable(market_data)))
+        decode_time = measure(lambda: codec.from_jsonable(codec.loads(codec_payload)))
+
+        print(f"{stock_count}只股票 x {bar_count}根K线:")
+        print(f"  逐行转换: {legacy_time * 1000:8.1f} ms  {len(legacy_payload) / 1024 / 1024:6.2f} MB")
+        print(f"  按列编码: {codec_time * 1000:8.1f} ms  {len(codec_payload) / 1024 / 1024:6.2f} MB"
+              f"  (加速 {legacy_time / codec_time:.1f}x)")
+        print(f"  客户端解码为DataFrame: {decode_time * 1000:8.1f} ms")
@@ -0,0 +1,83 @@
+"""
+测试优先级通道的准入控制
+通道并发和排队占满后直接拒绝，排队超时的请求被拒绝，执行器排队超时的调用被取消
+"""
+import asyncio
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from qka.admission import AdmissionController, AdmissionRejected, Lane
+from qka.executor import ExecutorBusyError, FunctionExecutor
+
+
+async def hold(controller: AdmissionController, lane: Lane, seconds: float):
+    """占用通道名额一段时间"""
+    async with controller.admit(lane):
+        await asyncio.sleep(seconds)
+
+
+async def test_queue_full():
+    """并发和排队都占满后，新的请求立即被拒绝(429)"""
+    controller = AdmissionController({'bulk': (1, 1, 5.0)}, 'bulk')
+    lane = controller.select('download_stock_history_data')
+    tasks = [asyncio.ensure_future(hold(controller, lane, 0.2)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    assert lane.saturated
+    start = time.perf_counter()
+    try:
+        await hold(controller, lane, 0)
+        raise AssertionError("通道已满时应拒绝请求")
+    except AdmissionRejected as e:
+        assert time.perf_counter() - start < 0.05, "排队已满时应立即拒绝"
+        assert e.retry_after >= 1.0
+        print(f"排队已满: {e} (Retry-After {e.retry_after})")
+    await asyncio.gather(*tasks)
+    assert lane.active == 0 and lane.admitted == 2 and lane.rejected == 1
+
+
+async def test_queue_timeout():
+    """排队超过queue_timeout的请求被拒绝，名额不泄漏"""
+    controller = AdmissionController({'trading': (1, 4, 0.05)}, 'trading')
+    lane = controller.select('get_daily_bars')
+    running = asyncio.ensure_future(hold(controller, lane, 0.2))
+    await asyncio.sleep(0.01)
+    try:
+        await hold(controller, lane, 0)
+        raise AssertionError("排队超时的请求应被拒绝")
+    except AdmissionRejected as e:
+        print(f"排队超时: {e}")
+    await running
+    assert lane.active == 0 and not lane.waiters
+    # 名额释放后可以正常执行
+    await hold(controller, lane, 0)
+    assert lane.admitted == 2
+
+
+async def test_executor_queue_timeout():
+    """执行器中排队超时的调用被取消，不会在之后执行"""
+    executor = FunctionExecutor('test', 1, 4)
+    calls = []
+    running = asyncio.ensure_future(executor.run(time.sleep, 0.2, queue_timeout=0.05))
+    await asyncio.sleep(0.01)
+    try:
+        await executor.run(calls.append, 1, queue_timeout=0.05)
+        raise AssertionError("执行器排队超时的调用应被拒绝")
+    except ExecutorBusyError as e:
+        print(f"执行器排队超时: {e}")
+    await running
+    await asyncio.sleep(0.05)
+    assert calls == [], "已取消的调用不应执行"
+    assert await executor.run(len, [1, 2], queue_timeout=0.05) == 2
+    executor.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(test_queue_full())
+    asyncio.run(test_queue_timeout())
+    asyncio.run(test_executor_queue_timeout())
+    print("准入控制测试通过")
@@ -0,0 +1,105 @@
+"""
+测试客户端行情缓存
+缺失区间的计算、返回数据裁剪到缺失区间、按返回的数据记录已缓存区间，以及当日数据不写入缓存
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from qka.barcache import BarCache
+from qka.tradecalendar import TradeCalendar
+
+# 固定的当前时间，之前的数据不再变化
+NOW = datetime(2025, 3, 3, 10, 0, 0)
+
+
+def make_calendar() -> TradeCalendar:
+    """以工作日作为交易日的日历，不保存到本地"""
+    days = pd.bdate_range('20240101', '20251231')
+    return TradeCalendar(None, fetch=lambda: np.array([int(day.strftime('%Y%m%d')) for day in days]))
+
+
+def make_bars(start: str, end: str) -> pd.DataFrame:
+    """生成[start, end]内每个工作日一根的日K线"""
+    days = pd.bdate_range(start, end)
+    return pd.DataFrame({'close': np.arange(len(days), dtype=float)}, index=days.strftime('%Y%m%d'))
+
+
+def gaps(cache: BarCache, codes: list, start_time: str, end_time: str) -> list:
+    """缺失区间的(开始, 结束, 股票列表)"""
+    plan = cache.plan(codes, '1d', start_time, end_time, now=NOW)
+    return [(gap.start_time, gap.end_time, gap.codes) for gap in plan.gaps]
+
+
+def test_fill_clips_and_covers(cache: BarCache):
+    """服务器多返回的数据不写入缓存；同一请求中停牌的股票也记录为已缓存"""
+    plan = cache.plan(['000001', '600000'], '1d', '20250106', '20250110', now=NOW)
+    assert len(plan.gaps) == 1
+    cache.fill(plan, plan.gaps[0], {'000001.SZ': make_bars('20250101', '20250117'), '600000.SH': pd.DataFrame()})
+    result = cache.load(plan)
+    assert list(result) == ['000001.SZ']
+    assert list(result['000001.SZ'].index) == ['20250106', '20250107', '20250108', '20250109', '20250110']
+    assert gaps(cache, ['000001', '600000'], '20250106', '20250110') == []
+
+    # 与已缓存区间相邻的查询不产生重复行
+    plan = cache.plan(['000001'], '1d', '20250106', '20250117', now=NOW)
+    assert [(gap.start_time, gap.end_time) for gap in plan.gaps] == [('20250111', '20250117')]
+    cache.fill(plan, plan.gaps[0], {'000001.SZ': make_bars('20250101', '20250117')})
+    frame = cache.load(plan)['000001.SZ']
+    assert len(frame) == 10 and frame.index.is_unique
+    print(f"裁剪后的缓存: {len(frame)} 行")
+
+
+def test_partial_data(cache: BarCache):
+    """服务器只返回部分区间时，只记录到返回的最新交易日，之后的部分下次重新请求"""
+    plan = cache.plan(['000002'], '1d', '20250120', '20250131', now=NOW)
+    cache.fill(plan, plan.gaps[0], {'000002.SZ': make_bars('20250120', '20250122')})
+    assert gaps(cache, ['000002'], '20250120', '20250131') == [('20250123', '20250131', ['000002.SZ'])]
+
+    # 返回的数据之后到区间结束没有交易日时，整个区间记录为已缓存
+    plan = cache.plan(['000002'], '1d', '20250123', '20250202', now=NOW)
+    cache.fill(plan, plan.gaps[0], {'000002.SZ': make_bars('20250123', '20250131')})
+    assert gaps(cache, ['000002'], '20250120', '20250202') == []
+    print("部分数据只记录到返回的最新交易日")
+
+
+def test_empty_result(cache: BarCache):
+    """没有返回任何数据的区间不记录，除非区间内没有交易日"""
+    plan = cache.plan(['000003'], '1d', '20250203', '20250207', now=NOW)
+    cache.fill(plan, plan.gaps[0], {})
+    assert len(gaps(cache, ['000003'], '20250203', '20250207')) == 1
+
+    plan = cache.plan(['000003'], '1d', '20250208', '20250209', now=NOW)
+    cache.fill(plan, plan.gaps[0], {})
+    assert gaps(cache, ['000003'], '20250208', '20250209') == []
+    print("没有数据的交易日区间下次重新请求，非交易日区间记录为已缓存")
+
+
+def test_today_not_cached(cache: BarCache):
+    """当日数据只保留在本次查询结果中，不写入缓存"""
+    plan = cache.plan(['000004'], '1d', '20250224', '', now=NOW)
+    cache.fill(plan, plan.gaps[0], {'000004.SZ': make_bars('20250224', '20250303')})
+    assert cache.load(plan)['000004.SZ'].index[-1] == '20250303'
+    remaining = gaps(cache, ['000004'], '20250224', '')
+    assert remaining == [('20250303', '', ['000004.SZ'])], remaining
+    print("当日数据不写入缓存")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = BarCache(os.path.join(temp_dir, 'bars.duckdb'), make_calendar())
+        try:
+            test_fill_clips_and_covers(cache)
+            test_partial_data(cache)
+            test_empty_result(cache)
+            test_today_not_cached(cache)
+        finally:
+            cache.close()
+    print("行情缓存测试通过")
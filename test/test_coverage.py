@@ -0,0 +1,65 @@
+"""
+测试下载覆盖范围索引
+缺失区间的计算，以及多个进程同时更新同一个索引文件时互不覆盖
+"""
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import numpy as np
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from qka.coverage import CoverageIndex, find_missing, group_missing
+
+TRADING_DAYS = np.array([20250102, 20250103, 20250106, 20250107, 20250108])
+
+
+def test_find_missing():
+    """缺失区间为已下载区间之前和之后的交易日"""
+    assert find_missing(TRADING_DAYS, None) == [(20250102, 20250108)]
+    assert find_missing(TRADING_DAYS, (20250103, 20250106)) == [(20250102, 20250102), (20250107, 20250108)]
+    assert find_missing(TRADING_DAYS, (20250101, 20250110)) == []
+    grouped = group_missing(TRADING_DAYS, {'000001.SZ': (20250102, 20250106), '600000.SH': (20250102, 20250106)},
+                            ['000001.SZ', '600000.SH', '000002.SZ'])
+    assert grouped == {(20250102, 20250108): ['000002.SZ'], (20250107, 20250108): ['000001.SZ', '600000.SH']}
+    print(f"缺失区间分组: {grouped}")
+
+
+def update_worker(path: str, worker: int, rounds: int):
+    """每个进程用自己的索引对象反复更新各自的股票"""
+    index = CoverageIndex(path)
+    for i in range(rounds):
+        index.update('1d', {f'{worker:03d}{i:03d}.SZ': (20250102, 20250108)})
+        # 同一股票的区间在多个进程之间合并
+        index.update('1m', {'000001.SZ': (20250102 + worker, 20250108 + worker)})
+
+
+def test_multiprocess_update(workers: int = 4, rounds: int = 20):
+    """多个进程同时更新，所有进程写入的区间都保留"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'coverage.json')
+        index = CoverageIndex(path)
+        index.update('1d', {'600000.SH': (20250102, 20250103)})
+        processes = [mp.Process(target=update_worker, args=(path, worker, rounds)) for worker in range(workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            assert process.exitcode == 0
+
+        # 文件被其他进程修改后，已有的索引对象重新读取
+        codes = ['600000.SH'] + [f'{worker:03d}{i:03d}.SZ' for worker in range(workers) for i in range(rounds)]
+        coverage = index.get('1d', codes)
+        missing = [code for code, covered in coverage.items() if covered is None]
+        assert not missing, f"被覆盖的更新: {missing[:5]}"
+        assert index.get('1m', ['000001.SZ']) == {'000001.SZ': (20250102, 20250108 + workers - 1)}
+        print(f"{workers}个进程共写入 {len(codes) - 1} 只股票，全部保留")
+
+
+if __name__ == "__main__":
+    test_find_missing()
+    test_multiprocess_update()
+    print("覆盖范围索引测试通过")
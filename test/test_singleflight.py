@@ -0,0 +1,82 @@
+"""
+测试相同请求的合并
+同时到达的相同请求只执行一次并共享结果(或异常)，完成后的请求重新执行
+"""
+import asyncio
+import os
+import sys
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from qka.singleflight import SingleFlight
+
+
+async def test_coalesce():
+    """10个相同请求只执行一次，不同键的请求各自执行"""
+    flight = SingleFlight()
+    executed = []
+
+    def make_call(key: str):
+        async def call():
+            executed.append(key)
+            await asyncio.sleep(0.05)
+            return {'key': key}
+        return call
+
+    results = await asyncio.gather(*(flight.do('get_daily_bars', 'a', make_call('a')) for _ in range(10)),
+                                   flight.do('get_daily_bars', 'b', make_call('b')))
+    assert executed == ['a', 'b'], executed
+    assert [shared for _, shared in results[:10]].count(False) == 1
+    assert all(result is results[0][0] for result, _ in results[:10]), "相同请求应共享同一结果"
+    assert results[10][0] == {'key': 'b'}
+    stats = flight.stats()
+    assert stats['inflight'] == 0
+    assert stats['calls']['get_daily_bars'] == 11 and stats['deduplicated']['get_daily_bars'] == 9
+    print(f"合并请求: {stats}")
+
+    # 已完成的请求不再共享，再次调用重新执行
+    await flight.do('get_daily_bars', 'a', make_call('a'))
+    assert executed == ['a', 'b', 'a']
+
+
+async def test_shared_error():
+    """执行出错时所有等待的请求都收到同一异常"""
+    flight = SingleFlight()
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        raise RuntimeError("获取行情数据失败")
+
+    results = await asyncio.gather(*(flight.do('get_daily_bars', 'a', failing) for _ in range(5)),
+                                   return_exceptions=True)
+    assert calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    print(f"共享异常: {results[0]}")
+
+
+async def test_cancel_one():
+    """单个请求被取消不影响共享结果的其他请求"""
+    flight = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return 1
+
+    first = asyncio.ensure_future(flight.do('get_daily_bars', 'a', slow))
+    second = asyncio.ensure_future(flight.do('get_daily_bars', 'a', slow))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    assert await second == (1, True)
+    print("取消单个请求后其他请求正常完成")
+
+
+if __name__ == "__main__":
+    asyncio.run(test_coalesce())
+    asyncio.run(test_shared_error())
+    asyncio.run(test_cancel_one())
+    print("请求合并测试通过")
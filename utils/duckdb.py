@@ -66,6 +66,35 @@ class DuckDBHelper:
                 pass
             raise e
 
+    def insert_arrow_to_duckdb(self, table, table_name: str) -> bool:
+        """
+        将Arrow表插入到DuckDB中
+
+        DuckDB直接扫描Arrow内存，不需要先转换为DataFrame
+        """
+        if table is None or table.num_rows == 0:
+            return False
+
+        try:
+            self.conn.register('arrow_batch', table)
+            table_exists = self.conn.execute(
+                f"SELECT COUNT(*) FROM information_schema.tables WHERE table_name='{table_name}'"
+            ).fetchone()[0] > 0
+
+            if not table_exists:
+                self.conn.execute(f"CREATE TABLE {table_name} AS SELECT * FROM arrow_batch")
+            else:
+                self.conn.execute(f"INSERT INTO {table_name} SELECT * FROM arrow_batch")
+
+            self.conn.unregister('arrow_batch')
+            return True
+        except Exception as e:
+            try:
+                self.conn.unregister('arrow_batch')
+            except:
+                pass
+            raise e
+
     def read_duckdb_table(self, table_name, limit=100):
         """
         读取DuckDB中的表, limit为读取的行数，默认读取100行